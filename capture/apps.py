@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+class CaptureConfig(AppConfig):
+    name = 'capture'
+
+    def ready(self):
+        # Keep the MediaItem catalog in sync with every media row save/delete
+        from . import catalog
+        catalog.connect_signals()
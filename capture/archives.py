@@ -0,0 +1,146 @@
+"""
+Per-UHID "download all" archives cached under MEDIA_ROOT/<ARCHIVE_CACHE_DIR>.
+
+An archive is keyed by a version stamp of the live entry set (source path +
+name in the ZIP), so adding, soft-deleting or restoring a row changes the
+key without any signal wiring. On a miss the ZIP is streamed to the client
+as it is built (filesys/archive.stream_zip) and written to the cache at the
+same time; it is published under its key only once complete. A hit is
+served from disk. Cached archives are evicted by age and by total size,
+least recently used first.
+
+Other generated per-UHID files (the dossier PDF) use the same keying,
+streaming and eviction through cached_stream_response().
+
+Layout:
+    archives/<service>/UHID_<uhid>/<kind>-<version>.zip
+    archives/<service>/UHID_<uhid>/<kind>-<version>.pdf
+"""
+import glob
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+from filesys.archive import stream_zip
+from . import media
+
+
+ARCHIVE_CACHE_DIR = getattr(settings, 'ARCHIVE_CACHE_DIR', 'archives')
+ARCHIVE_CACHE_MAX_BYTES = getattr(settings, 'ARCHIVE_CACHE_MAX_BYTES', 5 * 1024 * 1024 * 1024)
+ARCHIVE_CACHE_MAX_AGE_HOURS = getattr(settings, 'ARCHIVE_CACHE_MAX_AGE_HOURS', 72)
+
+CACHED_EXTENSIONS = ('.zip', '.pdf')
+
+
+def cache_root():
+    return os.path.join(settings.MEDIA_ROOT, ARCHIVE_CACHE_DIR)
+
+
+def archive_folder(service, uhid):
+    return os.path.join(cache_root(), service, f"UHID_{uhid}")
+
+
+def version_stamp(entries):
+    """Stable hash of the (path, arcname) set; independent of query order."""
+    payload = json.dumps(sorted(entries)).encode()
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def remove_archive(archive_path):
+    # Also drops the entry manifest that older versions kept next to each ZIP
+    for path in (archive_path, os.path.splitext(archive_path)[0] + '.json'):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def evict_archives(max_bytes=None, max_age_hours=None, keep=None):
+    """
+    Drop archives unused for max_age_hours, then the least recently used until under max_bytes.
+    `keep` (the archive about to be served) is never removed.
+    """
+    max_bytes = ARCHIVE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_age_hours = ARCHIVE_CACHE_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+
+    archives = []
+    for archive_path in glob.glob(os.path.join(cache_root(), '*', '*', '*')):
+        if not archive_path.endswith(CACHED_EXTENSIONS):
+            continue
+        try:
+            stat = os.stat(archive_path)
+        except FileNotFoundError:
+            continue
+        archives.append((stat.st_mtime, stat.st_size, archive_path))
+
+    cutoff = time.time() - max_age_hours * 3600
+    total = 0
+    kept = []
+    for mtime, size, archive_path in sorted(archives, reverse=True):
+        if archive_path != keep and (mtime < cutoff or total + size > max_bytes):
+            remove_archive(archive_path)
+            continue
+        total += size
+        kept.append(archive_path)
+
+    return kept
+
+
+def cached_zip_response(request, service, uhid, kind, entries, zip_filename):
+    """Serve the per-UHID ZIP of `entries`: from the cache (Range / ETag aware, or through the proxy), else streamed while it is cached."""
+    return cached_stream_response(request, service, uhid, kind, entries, stream_zip, zip_filename, "application/zip")
+
+
+def _tee_to_cache(chunks, target, kind):
+    """Pass `chunks` through while writing them to a temp file that replaces `target` once complete."""
+    folder, ext = os.path.dirname(target), os.path.splitext(target)[1]
+    tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+    except BaseException:
+        # Client went away or the build failed: never publish a partial file
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, target)
+    for old_path in glob.glob(os.path.join(folder, f"{kind}-*{ext}")):
+        if old_path != target:
+            remove_archive(old_path)
+    evict_archives(keep=target)
+
+
+def cached_stream_response(request, service, uhid, kind, entries, build, filename, content_type, use_cache=True):
+    """
+    Serve a file generated from `entries` by `build(entries)` (a generator of bytes).
+    A cached copy for the same entry set is served like any media file; otherwise
+    the generated bytes are streamed and saved for the next request.
+    """
+    entries = [tuple(entry) for entry in entries]
+    ext = os.path.splitext(filename)[1]
+    folder = archive_folder(service, uhid)
+    target = os.path.join(folder, f"{kind}-{version_stamp(entries)}{ext}")
+
+    if use_cache and os.path.exists(target):
+        os.utime(target)
+        print(f"📦 Cache hit: {target}")
+        name = os.path.relpath(target, settings.MEDIA_ROOT).replace("\\", "/")
+        response = media.media_response(request, name, target)
+    else:
+        chunks = build(entries)
+        if use_cache:
+            print(f"📦 Cache miss: {target} (building from {len(entries)} files)")
+            os.makedirs(folder, exist_ok=True)
+            chunks = _tee_to_cache(chunks, target, kind)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
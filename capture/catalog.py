@@ -0,0 +1,145 @@
+"""
+The MediaItem catalog: one row per captured image, uploaded image, PDF and
+ECHS patient file, across both apps.
+
+post_save / post_delete receivers (connected in CaptureConfig.ready) keep it
+in step with every .save() and .delete(). Code that changes media rows with
+queryset .update() or bulk_update() calls sync_rows() afterwards. Rows stored
+before the catalog existed are filled in by `python manage.py backfill_media_catalog`.
+Both paths go through tracked(), which also adjusts the usage counters
+(capture/usage.py) and patient summaries (capture/summaries.py).
+"""
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from . import summaries, usage
+from .models import MediaItem
+
+
+CATALOG_PAGE_SIZE = getattr(settings, 'CATALOG_PAGE_SIZE', 60)
+
+# (model label, service, kind, file field, size field)
+CATALOG_SOURCES = [
+    ('capture.CapturedImage', 'capture', 'captured_image', 'image_path', 'image_size'),
+    ('capture.UploadedImage', 'capture', 'uploaded_image', 'image_path', 'image_size'),
+    ('capture.UploadedFile', 'capture', 'uploaded_file', 'file_path', 'file_size'),
+    ('echs.CapturedImage', 'echs', 'captured_image', 'image_path', 'image_size'),
+    ('echs.UploadedImage', 'echs', 'uploaded_image', 'image_path', 'image_size'),
+    ('echs.UploadedFile', 'echs', 'uploaded_file', 'file_path', 'file_size'),
+    ('echs.OtherUploadedFile', 'echs', 'other_file', 'file_path', 'file_size'),
+]
+
+# Catalog columns copied on every sync
+SYNC_FIELDS = [
+    'service', 'kind', 'uhid', 'user', 'custom_tag', 'name', 'file_type',
+    'size', 'latitude', 'longitude', 'timestamp', 'is_deleted', 'deleted_by',
+]
+
+# Catalog columns the usage counters and patient summaries are derived from
+TRACKED_FIELDS = ['service', 'kind', 'uhid', 'user_id', 'custom_tag_id', 'size', 'timestamp', 'is_deleted', 'deleted_by_id']
+
+
+def source_for(model):
+    for source in CATALOG_SOURCES:
+        if apps.get_model(source[0]) is model:
+            return source
+    return None
+
+
+def source_columns(model, file_field, size_field):
+    """Catalog field -> source column (as accepted by .values()) for one source model."""
+    names = {field.name for field in model._meta.get_fields()}
+    columns = {
+        'object_id': 'id',
+        'uhid': 'uhid' if 'uhid' in names else 'patient__uhid',
+        'user_id': 'user_id',
+        'custom_tag_id': 'custom_tag_id',
+        'name': file_field,
+        'size': size_field,
+        'timestamp': 'timestamp',
+        'is_deleted': 'is_deleted',
+        'deleted_by_id': 'deleted_by_id',
+    }
+    if 'file_type' in names:
+        columns['file_type'] = 'file_type'
+    if 'latitude' in names:
+        columns['latitude'] = 'latitude'
+        columns['longitude'] = 'longitude'
+    return columns
+
+
+def build_items(source, queryset, chunk_size=1000):
+    """Yield an unsaved MediaItem for every row of `queryset` (a queryset of the source model)."""
+    label, service, kind, file_field, size_field = source
+    columns = source_columns(queryset.model, file_field, size_field)
+    content_type = ContentType.objects.get_for_model(queryset.model)
+
+    for row in queryset.values(*columns.values()).iterator(chunk_size=chunk_size):
+        values = {field: row[column] for field, column in columns.items()}
+        if kind.endswith('_image') and not values.get('file_type') and '.' in (values['name'] or ''):
+            # Images have no stored MIME type; the exports have always shown image/<ext>
+            values['file_type'] = f"image/{values['name'].rsplit('.', 1)[-1].lower()}"
+        yield MediaItem(content_type=content_type, service=service, kind=kind, **values)
+
+
+def upsert(items):
+    """Insert or refresh catalog rows in one statement."""
+    return MediaItem.objects.bulk_create(
+        items,
+        update_conflicts=True,
+        unique_fields=['content_type', 'object_id'],
+        update_fields=SYNC_FIELDS,
+    )
+
+
+@contextmanager
+def tracked(catalogued):
+    """Update the usage counters and patient summaries for the catalog writes inside the block (`catalogued`: the MediaItems written)."""
+    with transaction.atomic():
+        before = list(catalogued.values(*TRACKED_FIELDS))
+        yield
+        after = list(catalogued.values(*TRACKED_FIELDS))
+        usage.apply(before, after)
+        summaries.apply(before, after)
+
+
+def sync_rows(model, pks):
+    """Refresh the catalog rows of `pks` after a queryset update that bypassed the signals."""
+    source = source_for(model)
+    if source and pks:
+        pks = list(pks)
+        items = list(build_items(source, model.objects.filter(pk__in=pks)))
+        catalogued = MediaItem.objects.filter(content_type=ContentType.objects.get_for_model(model), object_id__in=pks)
+        with tracked(catalogued):
+            upsert(items)
+
+
+def sync_instance(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    sync_rows(sender, [instance.pk])
+
+
+def remove_instance(sender, instance, **kwargs):
+    catalogued = MediaItem.objects.filter(content_type=ContentType.objects.get_for_model(sender), object_id=instance.pk)
+    with tracked(catalogued):
+        catalogued.delete()
+
+
+def connect_signals():
+    for label, *_ in CATALOG_SOURCES:
+        model = apps.get_model(label)
+        post_save.connect(sync_instance, sender=model, dispatch_uid=f"media_catalog_save_{label}")
+        post_delete.connect(remove_instance, sender=model, dispatch_uid=f"media_catalog_delete_{label}")
+
+
+def image_listing(service, uhid):
+    """Live captured + uploaded images of one UHID, newest first: one indexed query."""
+    return MediaItem.objects.filter(
+        service=service, uhid=uhid, kind__in=['captured_image', 'uploaded_image'], is_deleted=False
+    ).select_related('user__designation', 'user__department', 'custom_tag').order_by('-timestamp', '-id')
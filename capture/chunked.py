@@ -0,0 +1,232 @@
+"""
+Resumable chunked uploads shared by the capture and echs apps.
+
+Protocol (each app exposes the same four endpoints):
+  1. POST  chunked-upload/start/                        -> {"session_id", "chunk_size", "total_chunks"}
+  2. POST  chunked-upload/<session_id>/part/<index>/    raw part bytes, X-Chunk-SHA256 header
+  3. GET   chunked-upload/<session_id>/status/          -> {"received": [0, 1, ...]}
+  4. POST  chunked-upload/<session_id>/commit/          assembles the file and creates the row
+
+Parts are written under CHUNKED_UPLOAD_DIR/<session_id>/ and never held in memory whole.
+"""
+import hashlib
+import os
+import shutil
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from members import refdata
+from members.models import CustomTag
+from .models import ChunkedUploadSession
+
+
+CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 1024 * 1024)
+EXPIRY_HOURS = getattr(settings, 'CHUNKED_UPLOAD_EXPIRY_HOURS', 24)
+READ_SIZE = 64 * 1024
+
+ALLOWED_TYPES = {
+    "pdf": ['application/pdf'],
+    "image": ['image/jpeg', 'image/jpg', 'image/png'],
+}
+
+
+class AssembledFile(File):
+    """Assembled upload on disk; exposing temporary_file_path lets FileSystemStorage move it instead of copying."""
+
+    def __init__(self, file, name, content_type, content_hash=None):
+        super().__init__(file, name=name)
+        self.content_type = content_type
+        self.content_hash = content_hash  # SHA-256 taken while assembling, reused by ingest
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def staging_dir(session):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, str(session.session_id))
+
+
+def purge_expired_sessions():
+    """Drop sessions (and their staged parts) untouched for EXPIRY_HOURS."""
+    cutoff = timezone.now() - timedelta(hours=EXPIRY_HOURS)
+    for session in ChunkedUploadSession.objects.filter(updated_on__lt=cutoff):
+        shutil.rmtree(staging_dir(session), ignore_errors=True)
+        session.delete()
+
+
+def validate_start(data, max_file_size):
+    """
+    Run the same UHID, tag, size and type checks as the single-POST upload views.
+    Returns (uhid_int, tag_obj, kind, file_name, file_type, file_size).
+    """
+    custom_tag_id = data.get("custom-tag-select")
+    kind = data.get("kind", "pdf")
+    file_name = data.get("file_name", "")
+    file_type = data.get("file_type", "")
+
+    if not custom_tag_id:
+        raise ValidationError("Custom tag is required!")
+
+    try:
+        uhid_int = int(data.get("uhid"))
+    except (TypeError, ValueError):
+        raise ValidationError("UHID must be a valid number!")
+    if uhid_int > 2147483647 or uhid_int < 0:
+        raise ValidationError("UHID is out of valid range!")
+
+    try:
+        file_size = int(data.get("file_size"))
+    except (TypeError, ValueError):
+        raise ValidationError("File size must be a valid number!")
+
+    if kind not in ALLOWED_TYPES:
+        raise ValidationError("Unsupported upload kind!")
+    if not file_name or file_size <= 0:
+        raise ValidationError("No file uploaded!")
+    if file_size > max_file_size:
+        raise ValidationError(f"\"{file_name}\" exceeds the {max_file_size // (1024 * 1024)}MB limit!")
+    if file_type not in ALLOWED_TYPES[kind]:
+        raise ValidationError(f"\"{file_name}\" unsupported type!")
+
+    try:
+        tag_obj = refdata.get(CustomTag, custom_tag_id)
+    except (CustomTag.DoesNotExist, ValueError):
+        raise ValidationError("Invalid custom tag selected.")
+
+    return uhid_int, tag_obj, kind, file_name, file_type, file_size
+
+
+def start_session(user, service, kind, uhid_int, tag_obj, file_name, file_size, file_type, sha256=""):
+    """Create a session once the caller has validated UHID, tag, size and type."""
+    purge_expired_sessions()
+
+    total_chunks = max(1, -(-file_size // CHUNK_SIZE))
+    session = ChunkedUploadSession.objects.create(
+        user=user,
+        service=service,
+        kind=kind,
+        uhid=uhid_int,
+        custom_tag=tag_obj,
+        file_name=os.path.basename(file_name),
+        file_type=file_type,
+        file_size=file_size,
+        chunk_size=CHUNK_SIZE,
+        total_chunks=total_chunks,
+        sha256=(sha256 or "").lower(),
+    )
+    os.makedirs(staging_dir(session), exist_ok=True)
+    return session
+
+
+def get_open_session(user, service, session_id, lock=False):
+    sessions = ChunkedUploadSession.objects.select_for_update() if lock else ChunkedUploadSession.objects
+    try:
+        return sessions.get(session_id=session_id, user=user, service=service, status="open")
+    except ChunkedUploadSession.DoesNotExist:
+        raise ValidationError("Upload session not found or already completed.")
+
+
+@contextmanager
+def committing(user, service, session_id):
+    """
+    Claim an open session for commit. The block runs in one transaction with
+    the session row locked, so a second commit of the same session waits and
+    then finds it committed instead of creating the row again. An error rolls
+    back and leaves the session open for the client to resume.
+    """
+    with transaction.atomic():
+        session = get_open_session(user, service, session_id, lock=True)
+        yield session
+        finish_session(session)
+
+
+def expected_part_size(session, index):
+    if index == session.total_chunks - 1:
+        return session.file_size - session.chunk_size * (session.total_chunks - 1)
+    return session.chunk_size
+
+
+def write_part(session, index, stream, checksum):
+    """Stream one part from `stream` to disk, verifying its size and SHA-256 before keeping it."""
+    if index < 0 or index >= session.total_chunks:
+        raise ValidationError(f"Part {index} is out of range (0-{session.total_chunks - 1}).")
+    if not checksum:
+        raise ValidationError("Missing X-Chunk-SHA256 header.")
+
+    part_path = os.path.join(staging_dir(session), f"{index}.part")
+    tmp_path = f"{part_path}.tmp"
+    expected = expected_part_size(session, index)
+
+    sha = hashlib.sha256()
+    size = 0
+    os.makedirs(staging_dir(session), exist_ok=True)
+    with open(tmp_path, 'wb') as out:
+        while True:
+            block = stream.read(READ_SIZE)
+            if not block:
+                break
+            size += len(block)
+            if size > expected:
+                break
+            sha.update(block)
+            out.write(block)
+
+    if size != expected:
+        os.remove(tmp_path)
+        raise ValidationError(f"Part {index} should be {expected} bytes.")
+    if sha.hexdigest() != checksum.lower():
+        os.remove(tmp_path)
+        raise ValidationError(f"Checksum mismatch for part {index}.")
+
+    # Only complete, verified parts are ever visible under their final name
+    os.replace(tmp_path, part_path)
+    session.save(update_fields=['updated_on'])
+
+
+def received_parts(session):
+    folder = staging_dir(session)
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        int(name.split('.')[0]) for name in os.listdir(folder)
+        if name.endswith('.part')
+    )
+
+
+def assemble(session):
+    """Concatenate the staged parts into one file and return it as an AssembledFile."""
+    missing = sorted(set(range(session.total_chunks)) - set(received_parts(session)))
+    if missing:
+        raise ValidationError(f"Missing parts: {missing[:20]}")
+
+    folder = staging_dir(session)
+    assembled_path = os.path.join(folder, "assembled")
+    sha = hashlib.sha256()
+    with open(assembled_path, 'wb') as out:
+        for index in range(session.total_chunks):
+            with open(os.path.join(folder, f"{index}.part"), 'rb') as part:
+                while True:
+                    block = part.read(READ_SIZE)
+                    if not block:
+                        break
+                    sha.update(block)
+                    out.write(block)
+
+    if session.sha256 and sha.hexdigest() != session.sha256:
+        os.remove(assembled_path)
+        raise ValidationError("Checksum mismatch for the assembled file.")
+
+    return AssembledFile(open(assembled_path, 'rb'), session.file_name, session.file_type, sha.hexdigest())
+
+
+def finish_session(session):
+    session.status = "committed"
+    session.save(update_fields=['status', 'updated_on'])
+    folder = staging_dir(session)
+    transaction.on_commit(lambda: shutil.rmtree(folder, ignore_errors=True))
@@ -0,0 +1,185 @@
+"""
+Superuser exports built by the job worker instead of a web request.
+
+An export is submitted as a spec (type, table filters, format) and stored as
+an ExportJob with a BackgroundJob pointing at it. `python manage.py run_jobs`
+writes the file under MEDIA_ROOT/<EXPORT_DIR>, recording the rows written
+every PROGRESS_EVERY_ROWS rows so the page can show progress. The finished
+file is served to superusers until EXPORT_EXPIRY_HOURS after it was built;
+expired files are removed by the next export the worker runs.
+
+Types: "media:<table>" (the tables of capture/listing.py, with their
+filters) and "members:<list>" (the lists of members/exports.py).
+JOB_TASK_LIMITS caps how many exports run at once across all workers, so
+that cover PDFs and other jobs are never stuck behind them.
+"""
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from members import exports as member_exports
+from . import exports, jobs, listing
+from .forms import MediaFilterForm
+from .models import BackgroundJob, ExportJob
+
+
+EXPORT_TASK = "capture.export_jobs.run_export_job"
+EXPORT_DIR = getattr(settings, 'EXPORT_DIR', 'exports')
+EXPORT_EXPIRY_HOURS = getattr(settings, 'EXPORT_EXPIRY_HOURS', 24)
+EXPORT_MAX_PENDING_PER_USER = getattr(settings, 'EXPORT_MAX_PENDING_PER_USER', 3)
+PROGRESS_EVERY_ROWS = 1000
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def export_types():
+    """{export type: title} of everything that can be exported in the background."""
+    types = {f"media:{table}": config['title'] for table, config in listing.MEDIA_TABLES.items()}
+    types.update({f"members:{name}": config['title'] for name, config in member_exports.LIST_EXPORTS.items()})
+    return types
+
+
+def export_source(export_type, filters, base_url):
+    """(title, file name stem, headers, queryset, rows) of an export spec; ValueError when the spec is not valid."""
+    group, _, name = export_type.partition(':')
+    if group == 'media' and name in listing.MEDIA_TABLES:
+        form = MediaFilterForm(filters)
+        if not form.is_valid():
+            raise ValueError(" ".join(e for errors in form.errors.values() for e in errors))
+        return exports.media_export(name, form.cleaned_data, base_url)
+    if group == 'members' and name in member_exports.LIST_EXPORTS:
+        return member_exports.list_export(name)
+    raise ValueError("Unknown export type.")
+
+
+def submit_export(user, export_type, fmt, filters, base_url):
+    """Check the spec and queue it for the worker. Returns the ExportJob; ValueError with a message for the user."""
+    if fmt not in exports.EXPORT_FORMATS:
+        raise ValueError("Unknown export format.")
+    export_source(export_type, filters, base_url)  # Only validates; nothing is read yet
+
+    fail_abandoned()
+    if ExportJob.objects.filter(user=user, status__in=ACTIVE_STATUSES).count() >= EXPORT_MAX_PENDING_PER_USER:
+        raise ValueError(f"You already have {EXPORT_MAX_PENDING_PER_USER} exports waiting. Please wait for one to finish.")
+
+    with transaction.atomic():
+        export = ExportJob.objects.create(user=user, export_type=export_type, format=fmt, filters=filters, base_url=base_url)
+        jobs.enqueue(EXPORT_TASK, export, max_attempts=2)
+    return export
+
+
+def fail_abandoned():
+    """
+    Mark failed the pending exports whose job the queue gave up on without
+    running them to the end (e.g. the worker was killed on its last attempt).
+    """
+    given_up = BackgroundJob.objects.filter(
+        task=EXPORT_TASK, content_type=ContentType.objects.get_for_model(ExportJob), status="failed",
+    ).values('object_id')
+    return ExportJob.objects.filter(status__in=ACTIVE_STATUSES, id__in=given_up).update(
+        status="failed", error="The export worker stopped before the file was finished.",
+    )
+
+
+def export_path(export):
+    return os.path.join(settings.MEDIA_ROOT, export.file_name)
+
+
+def remove_file(export):
+    if not export.file_name:
+        return
+    try:
+        os.remove(export_path(export))
+    except FileNotFoundError:
+        pass
+
+
+def purge_expired():
+    """Delete the files of exports past their expiry and mark them expired. Returns how many."""
+    expired = list(ExportJob.objects.filter(status="done", expires_on__lt=timezone.now()))
+    for export in expired:
+        remove_file(export)
+    return ExportJob.objects.filter(id__in=[export.id for export in expired]).update(status="expired")
+
+
+def counted(rows, export, job):
+    """Pass `rows` through, counting them into export.rows_done and saving the count now and then."""
+    export.rows_done = 0
+    for row in rows:
+        yield row
+        export.rows_done += 1
+        if export.rows_done % PROGRESS_EVERY_ROWS == 0:
+            ExportJob.objects.filter(id=export.id).update(rows_done=export.rows_done)
+            jobs.heartbeat(job)
+
+
+def run_export_job(job):
+    """Worker side of submit_export(): write the file, then publish it with its expiry."""
+    export = job.target
+    if export is None or export.status not in ACTIVE_STATUSES:
+        return {"skipped": "export no longer pending"}
+
+    purged = purge_expired()
+    if purged:
+        print(f"🧹 Removed {purged} expired export(s)")
+
+    ExportJob.objects.filter(id=export.id).update(status="running", rows_done=0, error="")
+    tmp_path = None
+    try:
+        title, export_name, headers, items, rows = export_source(export.export_type, export.filters, export.base_url)
+        ExportJob.objects.filter(id=export.id).update(rows_total=items.count())
+
+        download_name = exports.export_filename(export_name, export.format)
+        file_name = f"{EXPORT_DIR}/{export.id}-{uuid.uuid4().hex[:8]}-{download_name}"
+        path = os.path.join(settings.MEDIA_ROOT, file_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Written under a temporary name so a half-built file is never offered
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for chunk in exports.render(export.format, title, headers, counted(rows, export, job)):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        final = job.attempts >= job.max_attempts
+        ExportJob.objects.filter(id=export.id).update(status="failed" if final else "queued", error=str(e))
+        raise
+
+    now = timezone.now()
+    ExportJob.objects.filter(id=export.id).update(
+        status="done", rows_done=export.rows_done, file_name=file_name, download_name=download_name,
+        file_size=os.path.getsize(path), finished_on=now, expires_on=now + timedelta(hours=EXPORT_EXPIRY_HOURS),
+    )
+    print(f"📤 Export {export.id} ({export.export_type}) written: {export.rows_done} rows")
+    return {"export_id": export.id, "rows": export.rows_done}
+
+
+def export_status(export):
+    """JSON shape of one export for the exports page."""
+    percent = None
+    if export.status == "done":
+        percent = 100
+    elif export.rows_total:
+        percent = min(99, int(export.rows_done * 100 / export.rows_total))
+    return {
+        "id": export.id,
+        "type": export.export_type,
+        "title": export_types().get(export.export_type, export.export_type),
+        "format": export.format,
+        "status": export.status,
+        "rows_done": export.rows_done,
+        "rows_total": export.rows_total,
+        "percent": percent,
+        "created_on": timezone.localtime(export.created_on).strftime('%d-%b-%Y %I:%M %p'),
+        "expires_on": timezone.localtime(export.expires_on).strftime('%d-%b-%Y %I:%M %p') if export.expires_on else "",
+        "download_url": reverse('capture:download_export_job', args=[export.id]) if export.status == "done" else "",
+        "error": export.error.strip().splitlines()[-1] if export.error else "",
+    }
@@ -0,0 +1,102 @@
+"""
+Exports of the superuser media tables as streamed XLSX or CSV.
+
+Rows come from the MediaItem catalog as one .values() projection read with
+.iterator(chunk_size=EXPORT_CHUNK_SIZE) and are written straight into the
+output by filesys/spreadsheet.py, so memory stays flat however many rows
+match. The table filters (date range, tag, UHID, user, department) narrow
+the export the same way they narrow the table.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from filesys import spreadsheet
+from . import listing
+from .models import MediaItem
+
+
+EXPORT_CHUNK_SIZE = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+EXPORT_FORMATS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+HEADERS = ['Sl.', 'IP', 'Tag', 'Name', 'Username', 'Designation', 'Department', 'Phone', 'Date-Time', 'File Type', 'File Size (MB)', 'File Link']
+
+# Catalog columns read for one row (user details through joins, no model instances)
+EXPORT_FIELDS = [
+    'kind', 'uhid', 'name', 'file_type', 'size', 'timestamp', 'custom_tag__name',
+    'user__full_name', 'user__email', 'user__phone',
+    'user__designation__title', 'user__designation_other',
+    'user__department__name', 'user__department_other',
+]
+
+
+def site_base_url(request):
+    """Scheme and host prefixed to file links (settings.SITE_URL when set)."""
+    return getattr(settings, 'SITE_URL', None) or f"{request.scheme}://{request.get_host()}"
+
+
+def with_other(main, other):
+    text = main or 'N/A'
+    if other:
+        text += f" ({other})"
+    return text
+
+
+def media_rows(items, base_url, show_type):
+    """Export rows for a catalog queryset, newest first."""
+    kinds = dict(MediaItem.KIND_CHOICES)
+    rows = items.order_by('-timestamp', '-id').values(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    for idx, row in enumerate(rows, start=1):
+        uhid_str = str(row['uhid'])
+        file_url = f"{base_url}{default_storage.url(row['name'])}" if row['name'] else ''
+
+        values = [idx]
+        if show_type:
+            values.append(kinds.get(row['kind'], row['kind']))
+        values += [
+            f"{uhid_str[:2]}/{uhid_str[2:]}" if len(uhid_str) > 2 else uhid_str,  # IP like 25/1678
+            row['custom_tag__name'] or '—',
+            row['user__full_name'],
+            row['user__email'],
+            with_other(row['user__designation__title'], row['user__designation_other']),
+            with_other(row['user__department__name'], row['user__department_other']),
+            row['user__phone'] or 'N/A',
+            timezone.localtime(row['timestamp']).strftime('%d-%b-%Y %I:%M %p'),
+            row['file_type'] or 'Unknown',
+            f"{row['size'] / (1024 * 1024):.2f} MB" if row['size'] else 'N/A',
+            spreadsheet.Link(file_url, "Click Here") if file_url else 'No Link',
+        ]
+        yield values
+
+
+def media_export(table, filters, base_url):
+    """(title, file name stem, headers, queryset, rows) of one table export; `filters` is MediaFilterForm.cleaned_data."""
+    config = listing.MEDIA_TABLES[table]
+    show_type = config['kind'] is None
+    headers = HEADERS[:1] + ['Type'] + HEADERS[1:] if show_type else HEADERS
+    items = listing.media_items(table, filters)
+    return config['title'], config['export_name'], headers, items, media_rows(items, base_url, show_type)
+
+
+def export_filename(export_name, fmt):
+    return f"{export_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+
+
+def render(fmt, title, headers, rows):
+    """Byte chunks of `rows` as an .xlsx workbook or a CSV file."""
+    if fmt == 'csv':
+        return spreadsheet.stream_csv(headers, rows)
+    return spreadsheet.stream_xlsx(title, headers, rows)
+
+
+def export_media(table, filters, fmt, base_url):
+    """(filename, content type, byte chunks) of one table export; `filters` is MediaFilterForm.cleaned_data."""
+    title, export_name, headers, _, rows = media_export(table, filters, base_url)
+    return export_filename(export_name, fmt), EXPORT_FORMATS[fmt], render(fmt, title, headers, rows)
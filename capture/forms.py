@@ -1,5 +1,7 @@
 from django import forms
 from .models import IssueReport
+from members.models import CustomTag, Department
+from members.forms import ReferenceChoiceField
 
 class IssueReportForm(forms.ModelForm):
     description = forms.CharField(
@@ -61,3 +63,48 @@ class IssueAdminUpdateForm(forms.ModelForm):
 
     
 
+
+
+class ListingFilterForm(forms.Form):
+    """Server-side filters shared by the superuser tables (see capture/listing.py)."""
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control form-control-sm'}))
+    user = forms.CharField(required=False, widget=forms.TextInput(attrs={
+        'class': 'form-control form-control-sm', 'placeholder': 'Name or email'
+    }))
+    department = forms.ModelChoiceField(
+        queryset=Department.objects.order_by('name'), required=False, empty_label="All departments",
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get('date_from') and cleaned.get('date_to') and cleaned['date_from'] > cleaned['date_to']:
+            raise forms.ValidationError("The start date is after the end date.")
+        return cleaned
+
+
+class MediaFilterForm(ListingFilterForm):
+    tag = ReferenceChoiceField(
+        queryset=CustomTag.objects.filter(is_deleted=False).order_by('name'), required=False, empty_label="All tags",
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
+    uhid = forms.CharField(required=False, widget=forms.TextInput(attrs={
+        'class': 'form-control form-control-sm', 'placeholder': 'IP e.g. 25/1678'
+    }))
+
+    def clean_uhid(self):
+        # Accept the "25/1678" form the tables display
+        value = self.cleaned_data.get('uhid', '').replace('/', '').strip()
+        if not value:
+            return None
+        if not value.isdigit():
+            raise forms.ValidationError("IP must be a number like 25/1678.")
+        return int(value)
+
+
+class IssueFilterForm(ListingFilterForm):
+    status = forms.ChoiceField(
+        choices=[("", "All statuses")] + IssueReport.STATUS_CHOICES, required=False,
+        widget=forms.Select(attrs={'class': 'form-select form-select-sm'})
+    )
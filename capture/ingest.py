@@ -0,0 +1,285 @@
+import hashlib
+import uuid
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils import timezone
+from PIL import Image
+
+from filesys.image_pdf import ImagePdfWriter
+from . import renditions, transcode
+
+
+# Content types accepted as a raw capture body, mapped to the stored extension
+RAW_IMAGE_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+}
+
+READ_SIZE = 64 * 1024
+
+# Images the image2pdf endpoints combine into one PDF
+IMAGE_PDF_TYPES = ['image/jpeg', 'image/jpg', 'image/png']
+
+# Images accepted by the image upload pages
+IMAGE_UPLOAD_TYPES = ['image/jpeg', 'image/jpg', 'image/png']
+
+# Renditions written at ingest from the already-decoded image (the rest are built on first view)
+INGEST_RENDITIONS = getattr(settings, 'INGEST_RENDITIONS', ['thumb'])
+
+# Extension a stored image gets for its sniffed type (when the uploaded name disagrees)
+TYPE_EXTENSIONS = {'image/jpeg': 'jpg', 'image/png': 'png', 'image/webp': 'webp', 'image/avif': 'avif'}
+
+EXIF_IFD = 0x8769
+EXIF_GPS_IFD = 0x8825
+EXIF_DATETIME = 0x0132
+EXIF_DATETIME_ORIGINAL = 0x9003
+EXIF_ORIENTATION = 0x0112
+
+
+def read_raw_image(request, max_size):
+    """
+    Stream a raw image request body into a temporary file.
+
+    The body is copied in READ_SIZE blocks, so the image is never held in memory
+    whole, and FileSystemStorage can move the temp file into MEDIA_ROOT instead of
+    copying it again. The SHA-256 is taken on the way and kept as `content_hash`.
+    """
+    content_type = request.content_type
+    if content_type not in RAW_IMAGE_TYPES:
+        raise ValidationError("Unsupported image type! Only JPEG, PNG and WEBP are allowed.")
+
+    try:
+        declared = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        declared = 0
+    if declared > max_size:
+        raise ValidationError(f"File size exceeds the {max_size // (1024 * 1024)}MB limit!")
+
+    file_name = f"{uuid.uuid4().hex}.{RAW_IMAGE_TYPES[content_type]}"
+    upload = TemporaryUploadedFile(file_name, content_type, 0, None)
+
+    sha = hashlib.sha256()
+    size = 0
+    while True:
+        block = request.read(READ_SIZE)
+        if not block:
+            break
+        size += len(block)
+        if size > max_size:
+            upload.close()
+            raise ValidationError(f"File size exceeds the {max_size // (1024 * 1024)}MB limit!")
+        sha.update(block)
+        upload.write(block)
+
+    if size == 0:
+        upload.close()
+        raise ValidationError("No image received!")
+
+    upload.size = size
+    upload.content_hash = sha.hexdigest()
+    upload.seek(0)
+    return upload
+
+
+def capture_metadata(request):
+    """
+    Capture metadata from small form fields (multipart) or, for a raw body,
+    from X-UHID / X-Custom-Tag / X-Latitude / X-Longitude headers.
+    """
+    def pick(field, header):
+        value = request.POST.get(field) if request.content_type == "multipart/form-data" else None
+        return value if value not in (None, "") else request.headers.get(header)
+
+    return {
+        "uhid": pick("uhid", "X-UHID"),
+        "custom_tag": pick("custom_tag", "X-Custom-Tag"),
+        "latitude": pick("latitude", "X-Latitude") or None,
+        "longitude": pick("longitude", "X-Longitude") or None,
+    }
+
+
+def capture_upload(request, max_size):
+    """Return the captured image from a multipart "image" part or the raw body."""
+    if request.content_type == "multipart/form-data":
+        image_file = request.FILES.get("image")
+        if not image_file:
+            raise ValidationError("No image received!")
+        if image_file.content_type not in RAW_IMAGE_TYPES:
+            raise ValidationError("Unsupported image type! Only JPEG, PNG and WEBP are allowed.")
+        if image_file.size > max_size:
+            raise ValidationError(f"File size exceeds the {max_size // (1024 * 1024)}MB limit!")
+        return image_file
+
+    return read_raw_image(request, max_size)
+
+
+def images_to_pdf_upload(image_files, max_size):
+    """
+    Validate the uploaded page images and combine them, in order, into one PDF
+    written to a temporary file (JPEGs are embedded without re-encoding).
+    """
+    for image_file in image_files:
+        if image_file.content_type not in IMAGE_PDF_TYPES:
+            raise ValidationError(f"\"{image_file.name}\" unsupported type! Only JPEG/PNG allowed.")
+        if image_file.size > max_size:
+            raise ValidationError(f"\"{image_file.name}\" exceeds the {max_size // (1024 * 1024)}MB limit!")
+
+    upload = TemporaryUploadedFile(f"images_to_pdf_{uuid.uuid4().hex[:8]}.pdf", "application/pdf", 0, None)
+    writer = ImagePdfWriter(upload)
+    for image_file in image_files:
+        image_file.seek(0)
+        try:
+            writer.add_image(image_file)
+        except OSError:  # Includes Pillow's UnidentifiedImageError
+            upload.close()
+            raise ValidationError(f"\"{image_file.name}\" is not a readable image.")
+    writer.close()
+
+    upload.size = writer.offset
+    upload.seek(0)
+    return upload
+
+
+def sniff_content_type(header):
+    """Content type from the file's magic bytes, or None if it is not an image we know."""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return 'image/webp'
+    if header[4:12] in (b'ftypavif', b'ftypavis'):
+        return 'image/avif'
+    return None
+
+
+def exif_taken_at(exif):
+    value = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    try:
+        taken = datetime.strptime(str(value).strip('\x00 '), '%Y:%m:%d %H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+    return timezone.make_aware(taken) if settings.USE_TZ else taken
+
+
+def exif_coordinates(exif):
+    """(latitude, longitude) in decimal degrees from the GPS block, or (None, None)."""
+    gps = exif.get_ifd(EXIF_GPS_IFD)
+
+    def degrees(value, ref, negative):
+        try:
+            d, m, sec = (float(part) for part in value)
+        except (TypeError, ValueError, ZeroDivisionError):
+            return None
+        result = d + m / 60 + sec / 3600
+        return -result if ref == negative else result
+
+    latitude = degrees(gps.get(2), gps.get(1), 'S')
+    longitude = degrees(gps.get(4), gps.get(3), 'W')
+    if latitude is None or longitude is None:
+        return None, None
+    return round(latitude, 7), round(longitude, 7)
+
+
+def file_sha256(file):
+    sha = hashlib.sha256()
+    file.seek(0)
+    while True:
+        block = file.read(READ_SIZE)
+        if not block:
+            break
+        sha.update(block)
+    file.seek(0)
+    return sha.hexdigest()
+
+
+def upright_size(image):
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+class IngestedImage:
+    """
+    One read of an uploaded image: the file to store, the indexed model field
+    values (size, dimensions, format, hash, EXIF time and GPS) and the decoded
+    pixels, which are handed to the rendition builder once the row is saved.
+    """
+
+    def __init__(self, file, image, fields):
+        self.file = file
+        self.image = image
+        self.fields = fields
+
+    def build_renditions(self, name):
+        for size in INGEST_RENDITIONS:
+            try:
+                renditions.build_rendition(name, size, image=self.image)
+            except Exception as e:
+                print(f"[WARN] Could not prebuild {size} rendition for {name}: {e}")
+
+    def close(self):
+        self.image.close()
+        self.file.close()
+
+
+def ingest_image(upload, allowed_types=IMAGE_UPLOAD_TYPES, tag=None, transcode_capture=False):
+    """
+    Validate and inspect an uploaded image in one pass.
+
+    The type comes from the magic bytes, not the client's content type. The
+    hash is reused from the spool step when the upload carries one (raw
+    capture bodies, assembled chunked uploads) and read here otherwise
+    (multipart uploads). Pillow decodes the image once for metadata,
+    transcoding (captures, by `tag`) and renditions.
+    Raises ValidationError for anything that is not a readable allowed image.
+    """
+    name = getattr(upload, 'name', None) or "Image"
+
+    upload.seek(0)
+    content_type = sniff_content_type(upload.read(16))
+    if content_type is None or content_type not in allowed_types:
+        allowed = "/".join(sorted({t.split('/')[-1].upper().replace('JPG', 'JPEG') for t in allowed_types}))
+        raise ValidationError(f"\"{name}\" unsupported type! Only {allowed} allowed.")
+
+    content_hash = getattr(upload, 'content_hash', None) or file_sha256(upload)
+    try:
+        image = Image.open(upload)
+        image.load()
+    except (OSError, Image.DecompressionBombError):  # OSError includes Pillow's UnidentifiedImageError
+        raise ValidationError(f"\"{name}\" is not a readable image.")
+
+    exif = image.getexif()
+    latitude, longitude = exif_coordinates(exif)
+    width, height = upright_size(image)
+    fields = {
+        "image_size": upload.size,
+        "image_width": width,
+        "image_height": height,
+        "image_format": image.format,
+        "content_hash": content_hash,
+        "exif_taken_at": exif_taken_at(exif),
+        "exif_latitude": latitude,
+        "exif_longitude": longitude,
+    }
+
+    # upload_to keeps the name's extension, so make it match the actual bytes
+    stem, _, extension = name.rpartition('.')
+    if extension.lower().replace('jpeg', 'jpg') != TYPE_EXTENSIONS[content_type]:
+        upload.name = f"{stem or name}.{TYPE_EXTENSIONS[content_type]}"
+
+    stored = upload
+    if transcode_capture:
+        stored = transcode.transcode_capture(upload, tag, image=image)
+        if stored is not upload:
+            # Describe the bytes that are actually kept, as reported by the transcoder
+            fields.update(transcode.stored_fields(stored))
+
+    upload.seek(0)
+    return IngestedImage(stored, image, fields)
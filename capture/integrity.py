@@ -0,0 +1,129 @@
+"""
+Media integrity checks, run away from the request path.
+
+Listing pages show the stored file_size / image_size and the missing_since
+flag and never touch the filesystem. This module stats every stored file
+(in a thread pool, since on NFS each stat is a network round trip), fills in
+or corrects the stored size, and sets missing_since on rows whose file is
+gone (clearing it again once the file is back).
+
+Run it with `python manage.py media_integrity`, or queue it for the job
+worker with `python manage.py media_integrity --queue` (e.g. from cron).
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.utils import timezone
+
+from . import catalog, jobs
+
+
+# (model label, file field, size field) for every table that points at a file in MEDIA_ROOT
+MEDIA_FILES = [
+    ('capture.CapturedImage', 'image_path', 'image_size'),
+    ('capture.UploadedImage', 'image_path', 'image_size'),
+    ('capture.UploadedFile', 'file_path', 'file_size'),
+    ('echs.CapturedImage', 'image_path', 'image_size'),
+    ('echs.UploadedImage', 'image_path', 'image_size'),
+    ('echs.UploadedFile', 'file_path', 'file_size'),
+    ('echs.OtherUploadedFile', 'file_path', 'file_size'),
+]
+
+INTEGRITY_WORKERS = getattr(settings, 'INTEGRITY_WORKERS', 16)
+INTEGRITY_TASK = "capture.integrity.run_integrity_job"
+
+
+def stat_size(name):
+    """Size in bytes of a stored file, or None when it is not there."""
+    if not name:
+        return None
+    try:
+        return os.stat(os.path.join(settings.MEDIA_ROOT, name)).st_size
+    except OSError:
+        return None
+
+
+def check_batch(model, size_field, rows, pool, fix_sizes=True, dry_run=False):
+    """
+    Check one batch of (pk, name, stored_size, missing_since) rows and write the
+    results back with a few set-based queries. Returns per-outcome counts.
+    """
+    counts = {'checked': len(rows), 'missing': 0, 'flagged': 0, 'restored': 0, 'size_fixed': 0}
+    flag, restore, resize = [], [], []
+
+    for (pk, name, stored_size, missing_since), size in zip(rows, pool.map(stat_size, [row[1] for row in rows])):
+        if size is None:
+            counts['missing'] += 1
+            if missing_since is None:
+                flag.append(pk)
+            continue
+        if missing_since is not None:
+            restore.append(pk)
+        if stored_size != size:
+            resize.append(model(pk=pk, **{size_field: size}))
+
+    counts['flagged'] = len(flag)
+    counts['restored'] = len(restore)
+    counts['size_fixed'] = len(resize)
+
+    if not dry_run:
+        if flag:
+            model.objects.filter(pk__in=flag).update(missing_since=timezone.now())
+        if restore:
+            model.objects.filter(pk__in=restore).update(missing_since=None)
+        if resize and fix_sizes:
+            model.objects.bulk_update(resize, [size_field], batch_size=500)
+            catalog.sync_rows(model, [obj.pk for obj in resize])
+    return counts
+
+
+def scan(labels=None, workers=INTEGRITY_WORKERS, batch_size=1000, fix_sizes=True, dry_run=False, log=print, progress=None):
+    """
+    Check every row of the MEDIA_FILES tables (or only `labels`). Returns totals per model label.
+    `progress`, if given, is called after each batch (the job worker passes its heartbeat).
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for label, file_field, size_field in MEDIA_FILES:
+            if labels and label not in labels:
+                continue
+            model = apps.get_model(label)
+            totals = {'checked': 0, 'missing': 0, 'flagged': 0, 'restored': 0, 'size_fixed': 0}
+
+            last_id = 0
+            while True:
+                rows = list(
+                    model.objects.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', file_field, size_field, 'missing_since')[:batch_size]
+                )
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                for key, value in check_batch(model, size_field, rows, pool, fix_sizes, dry_run).items():
+                    totals[key] += value
+                if progress:
+                    progress()
+
+            log(
+                f"🔎 {label}: {totals['checked']} checked, {totals['missing']} missing "
+                f"({totals['flagged']} newly flagged, {totals['restored']} back), {totals['size_fixed']} sizes corrected"
+            )
+            results[label] = totals
+    return results
+
+
+def queue_integrity_check(**options):
+    """Queue a full scan for the job worker (no-op if one is already queued or running)."""
+    return jobs.enqueue(INTEGRITY_TASK, payload=options, max_attempts=1)
+
+
+def run_integrity_job(job):
+    options = job.payload or {}
+    return scan(
+        labels=options.get('labels'),
+        workers=options.get('workers', INTEGRITY_WORKERS),
+        fix_sizes=options.get('fix_sizes', True),
+        progress=lambda: jobs.heartbeat(job),
+    )
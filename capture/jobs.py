@@ -0,0 +1,181 @@
+"""
+Database-backed job queue; no broker needed. Views enqueue, and
+`python manage.py run_jobs` claims and runs due jobs.
+
+The job row is written in the caller's transaction, so a worker only ever
+sees it once the data it refers to has been committed.
+"""
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import BackgroundJob, ExportJob
+
+
+JOB_BACKOFF_SECONDS = getattr(settings, 'JOB_BACKOFF_SECONDS', 30)
+JOB_BACKOFF_MAX_SECONDS = getattr(settings, 'JOB_BACKOFF_MAX_SECONDS', 3600)
+JOB_TIMEOUT_MINUTES = getattr(settings, 'JOB_TIMEOUT_MINUTES', 15)
+# task -> most jobs of that task running at once, across all workers
+JOB_TASK_LIMITS = getattr(settings, 'JOB_TASK_LIMITS', {})
+
+ACTIVE_STATUSES = ("queued", "running")
+# Partial unique constraints on BackgroundJob that allow one active job per task and row / target-less task
+ACTIVE_JOB_CONSTRAINTS = ("background_job_one_active_per_target", "background_job_one_active_untargeted")
+
+
+def enqueue(task, target=None, payload=None, max_attempts=5):
+    """
+    Queue `task` (dotted path of a function taking the job) for `target`.
+    Idempotent: an already queued or running job for the same task and row (or
+    the same target-less task) is returned as is. Two concurrent calls are kept
+    to one job by the ACTIVE_JOB_CONSTRAINTS partial unique constraints.
+    """
+    lookup = {"task": task, "content_type": None, "object_id": None}
+    if target is not None:
+        lookup["content_type"] = ContentType.objects.get_for_model(target.__class__)
+        lookup["object_id"] = target.pk
+    active = BackgroundJob.objects.filter(status__in=ACTIVE_STATUSES, **lookup)
+
+    for attempt in range(2):
+        job = active.first()
+        if job:
+            return job
+        try:
+            with transaction.atomic():  # Savepoint, so a lost race leaves the caller's transaction usable
+                return BackgroundJob.objects.create(payload=payload or {}, max_attempts=max_attempts, **lookup)
+        except IntegrityError as e:
+            job = active.first()
+            if job:
+                # Another request queued the same job between the check and the insert
+                print(f"[INFO] {task} already queued for {lookup['object_id']}; using that job")
+                return job
+            if attempt or not any(name in str(e) for name in ACTIVE_JOB_CONSTRAINTS):
+                raise
+            # The job that won the race has finished already: queue ours once more
+
+
+def backoff_delay(attempts):
+    return timedelta(seconds=min(JOB_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)), JOB_BACKOFF_MAX_SECONDS))
+
+
+def requeue_stale_jobs():
+    """
+    Put back jobs whose worker died mid-run: running for longer than
+    JOB_TIMEOUT_MINUTES without a heartbeat() in that time.
+    """
+    cutoff = timezone.now() - timedelta(minutes=JOB_TIMEOUT_MINUTES)
+    stale = Q(heartbeat_on__lt=cutoff) | Q(heartbeat_on__isnull=True, started_on__lt=cutoff)
+    return BackgroundJob.objects.filter(stale, status="running").update(
+        status="queued", run_after=timezone.now(), last_error="Worker timed out"
+    )
+
+
+def heartbeat(job):
+    """Called now and then by long jobs to show their worker is still alive."""
+    BackgroundJob.objects.filter(id=job.id).update(heartbeat_on=timezone.now())
+
+
+def tasks_at_limit():
+    return [
+        task for task, limit in JOB_TASK_LIMITS.items()
+        if BackgroundJob.objects.filter(task=task, status="running").count() >= limit
+    ]
+
+
+def within_limit(job):
+    """Whether a just-claimed job is among the oldest JOB_TASK_LIMITS[task] running jobs of its task."""
+    limit = JOB_TASK_LIMITS.get(job.task)
+    if limit is None:
+        return True
+    running = BackgroundJob.objects.filter(task=job.task, status="running").order_by("started_on", "id")
+    return job.id in running.values_list("id", flat=True)[:limit]
+
+
+def claim_next(tasks=None, exclude=None):
+    """
+    Claim the oldest due job (of `tasks` only / not of `exclude`, if given).
+    The conditional UPDATE makes the claim atomic, so several workers can poll
+    the same table safely. Tasks already running JOB_TASK_LIMITS jobs are skipped.
+    """
+    now = timezone.now()
+
+    # Requeued after a timeout with no attempts left: give up rather than run it once more
+    used_up = BackgroundJob.objects.filter(status="queued", attempts__gte=F("max_attempts"))
+    failed = used_up.update(status="failed", finished_on=now)
+    if failed:
+        print(f"[WARN] {failed} job(s) failed: no attempts left after their worker timed out")
+
+    candidates = BackgroundJob.objects.filter(status="queued", run_after__lte=now, attempts__lt=F("max_attempts"))
+    if tasks:
+        candidates = candidates.filter(task__in=tasks)
+    skipped = list(exclude or []) + tasks_at_limit()
+    if skipped:
+        candidates = candidates.exclude(task__in=skipped)
+
+    for job in candidates.order_by("run_after", "id")[:10]:
+        claimed = BackgroundJob.objects.filter(id=job.id, status="queued").update(
+            status="running", started_on=now, heartbeat_on=None, attempts=job.attempts + 1
+        )
+        if not claimed:
+            continue
+        if not within_limit(job):
+            # Another worker started one of the same task in the meantime: hand it back untouched
+            BackgroundJob.objects.filter(id=job.id).update(status="queued", started_on=None, attempts=job.attempts)
+            continue
+        job.refresh_from_db()
+        return job
+    return None
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome, scheduling a retry with backoff on failure."""
+    try:
+        func = import_string(job.task)
+        result = func(job)
+    except Exception as e:
+        print(f"[ERROR] Job {job.id} ({job.task}) failed on attempt {job.attempts}: {e}")
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = "failed"
+            job.finished_on = timezone.now()
+        else:
+            job.status = "queued"
+            job.run_after = timezone.now() + backoff_delay(job.attempts)
+        job.save(update_fields=["status", "last_error", "run_after", "finished_on"])
+        return False
+
+    job.status = "done"
+    job.result = result if isinstance(result, (dict, list, str, int, float, bool)) else None
+    job.finished_on = timezone.now()
+    job.save(update_fields=["status", "result", "finished_on"])
+    return True
+
+
+def can_view(user, job):
+    """Superusers see every job; others only the jobs queued for them (payload user_id) or for their own export."""
+    if user.is_superuser or (job.payload or {}).get("user_id") == user.id:
+        return True
+    return (
+        job.content_type_id == ContentType.objects.get_for_model(ExportJob).id
+        and ExportJob.objects.filter(id=job.object_id, user=user).exists()
+    )
+
+
+def job_status(job):
+    return {
+        "id": job.id,
+        "task": job.task,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_after": job.run_after.isoformat() if job.run_after else None,
+        "finished_on": job.finished_on.isoformat() if job.finished_on else None,
+        "error": job.last_error.strip().splitlines()[-1] if job.last_error else "",
+        "result": job.result,
+    }
@@ -0,0 +1,130 @@
+"""
+Keyset ("cursor") pagination, filters and totals for the superuser tables.
+
+Pages are cut on (timestamp, id) descending: the cursor is the key of the
+last row shown, so a deep page costs the same as the first one and no
+OFFSET ever walks the skipped rows. Totals come from count_rows(), which
+caches the COUNT and, on PostgreSQL, uses the planner's estimate for large
+results instead of counting them.
+"""
+import base64
+import hashlib
+import json
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import MediaItem
+
+
+LISTING_PAGE_SIZE = getattr(settings, 'LISTING_PAGE_SIZE', 50)
+LISTING_COUNT_CACHE_SECONDS = getattr(settings, 'LISTING_COUNT_CACHE_SECONDS', 300)
+# Above this many (estimated) rows a total is shown as "about N" rather than counted
+LISTING_ESTIMATE_THRESHOLD = getattr(settings, 'LISTING_ESTIMATE_THRESHOLD', 10000)
+
+# Superuser media tables: the capture catalog filtered to one kind (None = everything)
+MEDIA_TABLES = {
+    'uploaded_files': {'title': "Uploaded Files", 'kind': 'uploaded_file',
+                       'export_url': 'capture:export_uploaded_files_excel', 'export_name': 'uploaded_files'},
+    'uploaded_images': {'title': "Uploaded Images", 'kind': 'uploaded_image',
+                        'export_url': 'capture:export_uploaded_images_excel', 'export_name': 'uploaded_images'},
+    'captured_images': {'title': "Captured Images", 'kind': 'captured_image',
+                        'export_url': 'capture:export_captured_images_excel', 'export_name': 'captured_images'},
+    'all': {'title': "All Files & Images", 'kind': None,
+            'export_url': 'capture:export_all_files_images_excel', 'export_name': 'all_files_and_images'},
+}
+
+
+def encode_cursor(timestamp, pk):
+    raw = f"{timestamp.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(timestamp, pk) from a cursor, or None when it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        stamp, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(stamp), int(pk)
+    except ValueError:  # Includes binascii.Error and UnicodeDecodeError
+        return None
+
+
+def keyset_page(queryset, cursor=None, per_page=LISTING_PAGE_SIZE, time_field='timestamp'):
+    """
+    One page of `queryset`, newest first, starting after `cursor`.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    queryset = queryset.order_by(f'-{time_field}', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        stamp, pk = position
+        queryset = queryset.filter(Q(**{f'{time_field}__lt': stamp}) | Q(**{time_field: stamp, 'id__lt': pk}))
+
+    rows = list(queryset[:per_page + 1])
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    return rows, encode_cursor(getattr(rows[-1], time_field), rows[-1].pk)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_rows(queryset, filters, time_field='timestamp'):
+    """
+    Apply the cleaned data of a filter form. Dates become a half-open
+    timestamp range (not a __date lookup), so the (timestamp, id) index still applies.
+    """
+    if filters.get('date_from'):
+        queryset = queryset.filter(**{f'{time_field}__gte': day_start(filters['date_from'])})
+    if filters.get('date_to'):
+        queryset = queryset.filter(**{f'{time_field}__lt': day_start(filters['date_to'] + timedelta(days=1))})
+    if filters.get('tag'):
+        queryset = queryset.filter(custom_tag=filters['tag'])
+    if filters.get('department'):
+        queryset = queryset.filter(user__department=filters['department'])
+    if filters.get('user'):
+        queryset = queryset.filter(Q(user__email__iexact=filters['user']) | Q(user__full_name__icontains=filters['user']))
+    if filters.get('uhid') is not None:
+        queryset = queryset.filter(uhid=filters['uhid'])
+    return queryset
+
+
+def media_items(table, filters):
+    """Catalog rows of one MEDIA_TABLES table, narrowed by the cleaned data of a MediaFilterForm."""
+    items = MediaItem.objects.filter(service="capture")
+    if MEDIA_TABLES[table]['kind']:
+        items = items.filter(kind=MEDIA_TABLES[table]['kind'])
+    return filter_rows(items, filters)
+
+
+def count_rows(queryset):
+    """
+    (total, is_estimate) for a filtered queryset, cached per query. On PostgreSQL
+    a result the planner expects to be large is not counted; its estimate is used.
+    """
+    queryset = queryset.order_by()
+    key = "listing_count:" + hashlib.sha1(str(queryset.query).encode()).hexdigest()
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = None
+    if connection.vendor == 'postgresql':
+        plan = json.loads(queryset.explain(format='json'))
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+        if estimate >= LISTING_ESTIMATE_THRESHOLD:
+            result = (estimate, True)
+    if result is None:
+        result = (queryset.count(), False)
+
+    cache.set(key, result, LISTING_COUNT_CACHE_SECONDS)
+    return result
@@ -0,0 +1,57 @@
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+
+from capture import catalog
+from capture.models import MediaItem
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill / refresh the MediaItem catalog from every media table (safe to re-run), "
+        "and with --prune drop catalog rows whose source row is gone."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='labels', metavar='LABEL',
+                            help="Only this source model (e.g. echs.UploadedFile); repeatable.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows read and upserted per query.")
+        parser.add_argument('--prune', action='store_true', help="Also delete catalog rows without a source row.")
+
+    def handle(self, *args, **options):
+        known = [source[0] for source in catalog.CATALOG_SOURCES]
+        for label in options['labels'] or []:
+            if label not in known:
+                raise CommandError(f"Unknown model {label}; choose from {', '.join(known)}")
+
+        batch_size = max(1, options['batch_size'])
+        for source in catalog.CATALOG_SOURCES:
+            label = source[0]
+            if options['labels'] and label not in options['labels']:
+                continue
+            model = apps.get_model(label)
+
+            synced = 0
+            last_id = 0
+            while True:
+                pks = list(model.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+                if not pks:
+                    break
+                last_id = pks[-1]
+                catalog.upsert(list(catalog.build_items(source, model.objects.filter(id__in=pks))))
+                synced += len(pks)
+
+            pruned = 0
+            if options['prune']:
+                stale = MediaItem.objects.filter(content_type=ContentType.objects.get_for_model(model)).exclude(
+                    object_id__in=model.objects.values('id')
+                )
+                pruned, _ = stale.delete()
+
+            self.stdout.write(f"🗂️ {label}: {synced} catalogued" + (f", {pruned} stale removed" if options['prune'] else ""))
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Catalog holds {MediaItem.objects.count()} items"))
+        self.stdout.write(
+            "ℹ️ Bulk upserts skip the usage counters and patient summaries; "
+            "run `python manage.py rebuild_usage_counters` and `python manage.py verify_patient_summaries` next"
+        )
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from capture import integrity
+
+
+class Command(BaseCommand):
+    help = (
+        "Stat every stored file in parallel: backfill / correct file_size and image_size, "
+        "and flag rows whose file is missing (missing_since). Listings rely on these columns."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', dest='labels', metavar='LABEL',
+                            help="Only check this model (e.g. echs.UploadedFile); repeatable.")
+        parser.add_argument('--workers', type=int, default=integrity.INTEGRITY_WORKERS, help="Parallel stat() calls.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows read and updated per query.")
+        parser.add_argument('--verify-only', action='store_true', help="Flag missing files but do not correct stored sizes.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report; write nothing.")
+        parser.add_argument('--queue', action='store_true', help="Queue the check for the run_jobs worker instead of running it here.")
+
+    def handle(self, *args, **options):
+        known = [label for label, _, _ in integrity.MEDIA_FILES]
+        for label in options['labels'] or []:
+            if label not in known:
+                raise CommandError(f"Unknown model {label}; choose from {', '.join(known)}")
+
+        if options['queue']:
+            job = integrity.queue_integrity_check(
+                labels=options['labels'], workers=options['workers'], fix_sizes=not options['verify_only']
+            )
+            self.stdout.write(self.style.SUCCESS(f"🛠️ Integrity check queued as {job}"))
+            return
+
+        results = integrity.scan(
+            labels=options['labels'],
+            workers=options['workers'],
+            batch_size=max(1, options['batch_size']),
+            fix_sizes=not options['verify_only'],
+            dry_run=options['dry_run'],
+            log=self.stdout.write,
+        )
+
+        checked = sum(r['checked'] for r in results.values())
+        missing = sum(r['missing'] for r in results.values())
+        fixed = sum(r['size_fixed'] for r in results.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {checked} files checked: {missing} missing, {fixed} sizes "
+            f"{'to correct' if options['dry_run'] or options['verify_only'] else 'corrected'}"
+        ))
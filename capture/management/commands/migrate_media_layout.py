@@ -0,0 +1,249 @@
+import json
+import os
+import shutil
+import time
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, CharField, F, Q, Value, When
+from django.db.models.functions import Concat, Replace, Substr
+from django.utils import timezone
+
+from capture import renditions
+from filesys.layout import MEDIA_SHARD_DEPTH, find_uhid_dirs, uhid_dir
+
+
+# Every column that stores a path relative to MEDIA_ROOT, with the lookup of the row's UHID
+# (None: no UHID column, rows are matched on the path alone)
+MEDIA_PATH_FIELDS = [
+    ('capture.CapturedImage', ['image_path', 'folder_path'], 'uhid'),
+    ('capture.UploadedImage', ['image_path', 'folder_path'], 'uhid'),
+    ('capture.UploadedFile', ['file_path', 'folder_path'], 'uhid'),
+    ('capture.DeletedCapturedImage', ['image_path', 'folder_path'], 'uhid'),
+    ('capture.DeletedUploadedFile', ['file_path', 'folder_path'], 'uhid'),
+    ('capture.MediaBlobLink', ['name'], None),
+    ('capture.MediaItem', ['name'], 'uhid'),
+    ('echs.CapturedImage', ['image_path', 'folder_path'], 'patient__uhid'),
+    ('echs.UploadedImage', ['image_path', 'folder_path'], 'patient__uhid'),
+    ('echs.UploadedFile', ['file_path', 'folder_path'], 'patient__uhid'),
+    ('echs.OtherUploadedFile', ['file_path', 'folder_path'], 'patient__uhid'),
+]
+
+# Catalog kinds that have cached renditions (keyed by the source path, so they move with it)
+RENDITION_KINDS = ['captured_image', 'uploaded_image']
+
+JOURNAL_NAME = '.media_layout_migration.json'
+
+
+def journal_path():
+    return os.path.join(settings.MEDIA_ROOT, JOURNAL_NAME)
+
+
+def read_journal():
+    try:
+        with open(journal_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_journal(state):
+    tmp_path = journal_path() + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, journal_path())
+
+
+def move_tree(src, dst):
+    """
+    Move a UHID directory to its new location. A plain rename when the target does
+    not exist yet; otherwise (new uploads already landed there, or an earlier run was
+    interrupted) the files are merged one by one. Returns the number of files moved.
+    """
+    if not os.path.isdir(src):
+        return 0
+
+    if not os.path.exists(dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        shutil.move(src, dst)
+        return sum(len(files) for _, _, files in os.walk(dst))
+
+    moved = 0
+    for root, dirs, files in os.walk(src, topdown=False):
+        target_root = os.path.join(dst, os.path.relpath(root, src))
+        os.makedirs(target_root, exist_ok=True)
+        for name in files:
+            target = os.path.join(target_root, name)
+            if os.path.exists(target):
+                print(f"[WARN] {target} already exists, leaving {os.path.join(root, name)} in place")
+                continue
+            shutil.move(os.path.join(root, name), target)
+            moved += 1
+        try:
+            os.rmdir(root)
+        except OSError:
+            pass
+    return moved
+
+
+def old_prefixes(old_dir):
+    """Prefixes a stored path under `old_dir` may start with; rows written on Windows use backslashes."""
+    return [f"{old_dir}/", old_dir.replace('/', '\\') + '\\']
+
+
+def renamed(name, moves):
+    """`name` with its old UHID directory swapped for the new one (and backslashes made slashes), or None."""
+    for old_dir, new_dir in moves:
+        for prefix in old_prefixes(old_dir):
+            if name.startswith(prefix):
+                return f"{new_dir}/" + name[len(prefix):].replace('\\', '/')
+    return None
+
+
+def moved_path(field, moves):
+    """CASE expression computing renamed() for `field` in SQL."""
+    whens = []
+    for old_dir, new_dir in moves:
+        for prefix in old_prefixes(old_dir):
+            rest = Replace(Substr(field, len(prefix) + 1), Value('\\'), Value('/'))
+            whens.append(When(**{f"{field}__startswith": prefix}, then=Concat(Value(f"{new_dir}/"), rest, output_field=CharField())))
+    return Case(*whens, default=F(field), output_field=CharField())
+
+
+def rewrite_names(uhids, moves):
+    """
+    Swap the directory prefix of every stored path of a batch of UHIDs: one
+    UPDATE per column for the whole batch, narrowed by the (indexed) UHID.
+    """
+    updated = 0
+    with transaction.atomic():
+        for label, fields, uhid_lookup in MEDIA_PATH_FIELDS:
+            model = apps.get_model(label)
+            rows = model.objects.filter(**{f"{uhid_lookup}__in": uhids}) if uhid_lookup else model.objects.all()
+            for field in fields:
+                under_old = Q()
+                for old_dir, _ in moves:
+                    for prefix in old_prefixes(old_dir):
+                        under_old |= Q(**{f"{field}__startswith": prefix})
+                updated += rows.filter(under_old).update(**{field: moved_path(field, moves)})
+    return updated
+
+
+def move_renditions(uhids, moves):
+    """Move the cached renditions of the batch's images to the keys of their new paths (before the rows are rewritten)."""
+    MediaItem = apps.get_model('capture.MediaItem')
+    names = MediaItem.objects.filter(uhid__in=uhids, kind__in=RENDITION_KINDS).values_list('name', flat=True)
+    moved = 0
+    for name in names.iterator():
+        new_name = renamed(name, moves)
+        if new_name is None:
+            continue
+        for size in renditions.RENDITION_SIZES:
+            old_path = os.path.join(settings.MEDIA_ROOT, renditions.rendition_name(name, size))
+            if not os.path.exists(old_path):
+                continue
+            new_path = os.path.join(settings.MEDIA_ROOT, renditions.rendition_name(new_name, size))
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            os.replace(old_path, new_path)
+            moved += 1
+    return moved
+
+
+def migrate_batch(uhids, from_depth, to_depth):
+    """Move a batch of UHID folders and rewrite their paths. Idempotent: safe to run again for a partly migrated batch."""
+    moves = [(uhid_dir(uhid, from_depth), uhid_dir(uhid, to_depth)) for uhid in uhids]
+    moved = 0
+    for old_dir, new_dir in moves:
+        moved += move_tree(os.path.join(settings.MEDIA_ROOT, old_dir), os.path.join(settings.MEDIA_ROOT, new_dir))
+
+        # Drop shard directories left empty when moving out of a sharded layout
+        if from_depth:
+            try:
+                os.removedirs(os.path.dirname(os.path.join(settings.MEDIA_ROOT, old_dir)))
+            except OSError:
+                pass
+
+    move_renditions(uhids, moves)
+    updated = rewrite_names(uhids, moves)
+    return moved, updated
+
+
+def parse_hours(value):
+    try:
+        start, end = (int(part) for part in value.split('-'))
+    except ValueError:
+        raise CommandError("--ward-hours must look like 8-20")
+    return start, end
+
+
+class Command(BaseCommand):
+    help = (
+        "Move UHID_<n> folders into the hash-sharded layout set by MEDIA_SHARD_DEPTH and "
+        "rewrite the stored image_path / file_path / folder_path values. Resumable and throttled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-depth', type=int, default=0, help="Layout the files are in now (default 0: UHID_<n> at the top).")
+        parser.add_argument('--to-depth', type=int, default=MEDIA_SHARD_DEPTH, help="Target layout (default MEDIA_SHARD_DEPTH).")
+        parser.add_argument('--batch-size', type=int, default=100, help="UHID folders moved (and rewritten in one UPDATE per column) between pauses.")
+        parser.add_argument('--limit', type=int, default=0, help="Stop after this many UHID folders (0 = all).")
+        parser.add_argument('--sleep', type=float, default=0.5, help="Seconds to pause between batches.")
+        parser.add_argument('--ward-hours', default='8-20', help="Local hours (start-end) that use --ward-sleep instead.")
+        parser.add_argument('--ward-sleep', type=float, default=5.0, help="Seconds to pause between batches during ward hours.")
+        parser.add_argument('--dry-run', action='store_true', help="Only list what would be moved.")
+
+    def handle(self, *args, **options):
+        from_depth = options['from_depth']
+        to_depth = options['to_depth']
+        if from_depth == to_depth:
+            raise CommandError(f"Nothing to do: files are already at depth {to_depth}. Set MEDIA_SHARD_DEPTH or pass --to-depth.")
+
+        ward_start, ward_end = parse_hours(options['ward_hours'])
+        batch_size = max(1, options['batch_size'])
+
+        # Finish the batch that was in flight when a previous run stopped
+        state = read_journal()
+        if state.get('in_flight') is not None and not options['dry_run']:
+            uhids = state['in_flight'] if isinstance(state['in_flight'], list) else [state['in_flight']]
+            self.stdout.write(f"Resuming {len(uhids)} UHID folder(s) from an interrupted run")
+            migrate_batch(uhids, state['from_depth'], state['to_depth'])
+            state['in_flight'] = None
+            write_journal(state)
+
+        processed = files_moved = rows_updated = 0
+        uhid_dirs = find_uhid_dirs(from_depth)
+        if options['limit']:
+            uhid_dirs = islice(uhid_dirs, options['limit'])
+
+        if options['dry_run']:
+            for uhid, old_dir in uhid_dirs:
+                self.stdout.write(f"{old_dir} -> {uhid_dir(uhid, to_depth)}")
+                processed += 1
+
+        while not options['dry_run']:
+            batch = [uhid for uhid, _ in islice(uhid_dirs, batch_size)]
+            if not batch:
+                break
+
+            write_journal({'in_flight': batch, 'from_depth': from_depth, 'to_depth': to_depth})
+            moved, updated = migrate_batch(batch, from_depth, to_depth)
+            write_journal({'in_flight': None, 'from_depth': from_depth, 'to_depth': to_depth})
+
+            processed += len(batch)
+            files_moved += moved
+            rows_updated += updated
+            self.stdout.write(f"📦 {processed} UHID folders done ({files_moved} files, {rows_updated} rows)")
+
+            hour = timezone.localtime().hour
+            in_ward_hours = ward_start <= hour < ward_end
+            time.sleep(options['ward_sleep'] if in_ward_hours else options['sleep'])
+
+        if not options['dry_run'] and os.path.exists(journal_path()):
+            os.remove(journal_path())
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {processed} UHID folders migrated to depth {to_depth} ({files_moved} files, {rows_updated} rows updated)"
+        ))
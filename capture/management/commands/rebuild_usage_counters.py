@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from capture import usage
+from capture.models import UsageCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the usage counters behind the configs dashboard from the MediaItem catalog. "
+        "Run after backfill_media_catalog, or to correct drift after direct database edits."
+    )
+
+    def handle(self, *args, **options):
+        written = usage.rebuild()
+        totals = UsageCounter.objects.aggregate(items=Sum('items'), bytes=Sum('bytes'))
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {written} counters rebuilt: {totals['items'] or 0} live items, {totals['bytes'] or 0} bytes"
+        ))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from capture import integrity, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Diff MEDIA_ROOT against the database with bounded memory: report missing files, "
+        "orphan files and wrong stored sizes, and optionally repair rows and quarantine orphans. "
+        "Interrupted runs continue with --resume."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--state', default=None, help="SQLite checkpoint file (default MEDIA_ROOT/.reconcile_media.sqlite3).")
+        parser.add_argument('--resume', action='store_true', help="Continue from the checkpoint instead of starting over.")
+        parser.add_argument('--report', default='reconcile_media.csv', help="Where to write the CSV report.")
+        parser.add_argument('--workers', type=int, default=integrity.INTEGRITY_WORKERS, help="Parallel directory walks / stat() calls.")
+        parser.add_argument('--repair', action='store_true',
+                            help="Relink rows to their moved file, correct stored sizes and flag missing files.")
+        parser.add_argument('--quarantine', action='store_true',
+                            help=f"Move orphan files to MEDIA_ROOT/{reconcile.MEDIA_QUARANTINE_DIR}/<date>/.")
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help="Only quarantine orphans not modified for this long (uploads in flight).")
+        parser.add_argument('--dry-run', action='store_true', help="Only write the report; change nothing.")
+
+    def handle(self, *args, **options):
+        state_path = options['state'] or reconcile.default_state_path()
+        conn = reconcile.open_state(state_path, resume=options['resume'])
+        try:
+            reconcile.load_disk(conn, workers=options['workers'], log=self.stdout.write)
+            reconcile.load_rows(conn, log=self.stdout.write)
+            reconcile.diff(conn, workers=options['workers'])
+
+            found = reconcile.summary(conn)
+            self.stdout.write(
+                f"🔎 {found['disk_files']} files on disk, {found['db_rows']} file references: "
+                f"{found['missing']} missing, {found['orphans']} orphans, {found['size_mismatch']} size mismatches"
+            )
+
+            actions = {}
+            if not options['dry_run']:
+                if options['repair']:
+                    actions.update(reconcile.repair(conn, log=self.stdout.write))
+                if options['quarantine']:
+                    actions.update(reconcile.quarantine(conn, options['min_age_hours'], skip=actions, log=self.stdout.write))
+
+            reconcile.write_report(conn, options['report'], actions)
+        finally:
+            conn.close()
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Report written to {options['report']} (checkpoint: {state_path})"))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from capture import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (cover PDFs and other deferred work). Keep one or more running under a process manager."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run every due job, then exit (for cron).")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--max-jobs', type=int, default=0, help="Exit after this many jobs (0 = no limit).")
+        parser.add_argument('--task', action='append', default=[], help="Only run jobs of this task (dotted path; repeatable).")
+        parser.add_argument('--exclude-task', action='append', default=[], help="Never run jobs of this task (repeatable), e.g. to keep a worker free for cover PDFs.")
+
+    def handle(self, *args, **options):
+        done = 0
+        self.stdout.write("🛠️ Job worker started")
+
+        while True:
+            close_old_connections()
+            requeued = jobs.requeue_stale_jobs()
+            if requeued:
+                self.stdout.write(f"⚠️ Requeued {requeued} stale job(s)")
+
+            job = jobs.claim_next(tasks=options['task'], exclude=options['exclude_task'])
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            ok = jobs.run_job(job)
+            done += 1
+            self.stdout.write(f"{'✅' if ok else '❌'} {job}")
+
+            if options['max_jobs'] and done >= options['max_jobs']:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"Worker finished after {done} job(s)"))
@@ -0,0 +1,123 @@
+import os
+import time
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from capture import catalog, transcode
+
+
+# Captured-image models the backfill walks, per app
+CAPTURED_IMAGE_MODELS = {
+    'capture': 'capture.CapturedImage',
+    'echs': 'echs.CapturedImage',
+}
+
+
+def human_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-encode stored captured images following TRANSCODE_POLICY (format and quality per "
+        "CustomTag.type), update the stored size, format, dimensions and hash and report the bytes saved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app', choices=['capture', 'echs', 'all'], default='all')
+        parser.add_argument('--batch-size', type=int, default=200, help="Rows fetched per query.")
+        parser.add_argument('--limit', type=int, default=0, help="Stop after this many images (0 = all).")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+        parser.add_argument('--keep-original-days', type=int, default=transcode.TRANSCODE_KEEP_ORIGINAL_DAYS,
+                            help="Keep replaced originals under TRANSCODE_ORIGINALS_DIR for this many days (0 = delete).")
+        parser.add_argument('--purge-originals', action='store_true', help="Only delete kept originals older than the retention window.")
+        parser.add_argument('--dry-run', action='store_true', help="Encode to a temp file and report the savings without changing anything.")
+
+    def handle(self, *args, **options):
+        keep_days = options['keep_original_days']
+
+        if options['purge_originals']:
+            files, size = transcode.purge_originals(keep_days)
+            self.stdout.write(self.style.SUCCESS(f"🧹 Removed {files} kept originals ({human_size(size)})"))
+            return
+
+        labels = CAPTURED_IMAGE_MODELS.values() if options['app'] == 'all' else [CAPTURED_IMAGE_MODELS[options['app']]]
+        target_extensions = {
+            transcode.FORMAT_EXTENSIONS[transcode.output_format(policy)]
+            for policy in transcode.TRANSCODE_POLICY.values() if policy
+        }
+
+        totals = {'processed': 0, 'transcoded': 0, 'skipped': 0, 'errors': 0, 'before': 0, 'after': 0}
+        for label in labels:
+            model = apps.get_model(label)
+            queryset = model.objects.filter(is_deleted=False).select_related('custom_tag').order_by('id')
+            for extension in target_extensions:
+                queryset = queryset.exclude(image_path__iendswith=f".{extension}")
+
+            last_id = 0
+            while True:
+                if options['limit'] and totals['processed'] >= options['limit']:
+                    break
+                batch = list(queryset.filter(id__gt=last_id)[:options['batch_size']])
+                if not batch:
+                    break
+
+                for row in batch:
+                    last_id = row.id
+                    if options['limit'] and totals['processed'] >= options['limit']:
+                        break
+                    totals['processed'] += 1
+                    self.transcode_row(model, row, keep_days, options['dry_run'], totals)
+
+                self.stdout.write(
+                    f"📦 {label}: {totals['processed']} processed, {totals['transcoded']} transcoded, "
+                    f"{human_size(totals['before'] - totals['after'])} saved"
+                )
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+
+        saved = totals['before'] - totals['after']
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {'Would transcode' if options['dry_run'] else 'Transcoded'} {totals['transcoded']} of {totals['processed']} images "
+            f"({totals['skipped']} kept as is, {totals['errors']} errors): "
+            f"{human_size(totals['before'])} -> {human_size(totals['after'])}, {human_size(saved)} saved"
+        ))
+
+    def transcode_row(self, model, row, keep_days, dry_run, totals):
+        policy = transcode.policy_for(row.custom_tag)
+        if not policy or not row.image_path:
+            totals['skipped'] += 1
+            return
+
+        old_name = row.image_path.name
+        try:
+            old_size = os.path.getsize(row.image_path.path)
+            transcoded = transcode.transcode_image(row.image_path.path, policy)
+        except OSError as e:
+            print(f"[ERROR] Could not transcode {model.__name__} {row.id} ({old_name}): {e}")
+            totals['errors'] += 1
+            return
+
+        if transcoded is None:
+            totals['skipped'] += 1
+            return
+
+        try:
+            new_size = transcoded.size
+            if not dry_run:
+                extension = os.path.splitext(transcoded.name)[1]
+                new_name = default_storage.save(os.path.splitext(old_name)[0] + extension, transcoded)
+                model.objects.filter(pk=row.pk).update(image_path=new_name, **transcode.stored_fields(transcoded))
+                catalog.sync_rows(model, [row.pk])
+                transcode.retire_original(old_name, keep_days)
+        finally:
+            transcoded.close()
+
+        totals['transcoded'] += 1
+        totals['before'] += old_size
+        totals['after'] += new_size
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from capture import summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Check the per-patient summaries behind the UHID options pages against the MediaItem catalog "
+        "and repair any drift. Run after backfill_media_catalog."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report differences; change nothing.")
+        parser.add_argument('--limit', type=int, default=50, help="Differences to print (0 = all).")
+
+    def handle(self, *args, **options):
+        drift = summaries.verify(repair=not options['dry_run'])
+        shown = drift if not options['limit'] else drift[:options['limit']]
+        for line in shown:
+            self.stdout.write(f"⚠️ {line}")
+        if len(drift) > len(shown):
+            self.stdout.write(f"… and {len(drift) - len(shown)} more")
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("✅ Patient summaries match the catalog"))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"🔍 {len(drift)} difference(s) found (dry run, nothing changed)"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✅ {len(drift)} difference(s) repaired"))
@@ -0,0 +1,185 @@
+"""
+Authenticated media serving shared by the capture and echs apps.
+
+Every /media/ request is matched to the row that owns the file (by its
+image_path / file_path / attachment name) and checked against the logged-in
+user. The bytes are then handed to the front proxy:
+
+  MEDIA_SERVE_BACKEND = 'nginx'     -> X-Accel-Redirect: <MEDIA_ACCEL_PREFIX><name>
+  MEDIA_SERVE_BACKEND = 'sendfile'  -> X-Sendfile: <absolute path>  (Apache mod_xsendfile / lighttpd)
+  MEDIA_SERVE_BACKEND = 'python'    -> streamed by Django, with Range / ETag / If-None-Match
+
+Example nginx location for the 'nginx' backend:
+
+    location /protected-media/ {
+        internal;
+        alias /path/to/media/;
+    }
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .catalog import CATALOG_SOURCES
+
+
+MEDIA_SERVE_BACKEND = getattr(settings, 'MEDIA_SERVE_BACKEND', 'python')
+MEDIA_ACCEL_PREFIX = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+READ_SIZE = 64 * 1024
+
+# Files outside the MediaItem catalog: (model, file field, name prefix or None)
+UNCATALOGUED_OWNERS = [
+    ('capture.IssueReport', 'attachment', 'issue_attachments/'),
+    ('capture.DeletedCapturedImage', 'image_path', None),
+    ('capture.DeletedUploadedFile', 'file_path', None),
+]
+
+# Archive rows kept after a hard delete; only superusers may open their files
+ARCHIVE_MODELS = {'DeletedCapturedImage', 'DeletedUploadedFile'}
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def find_owner(name):
+    """
+    Return the row whose file field points at `name`, or None. Media rows are
+    found through the catalog's indexed name (two primary-key lookups in all),
+    or by the indexed path column of each media table when the catalog has no
+    row for it (e.g. before `backfill_media_catalog` has run); issue
+    attachments by their folder, and archive rows by their indexed path.
+    """
+    for label, field, prefix in UNCATALOGUED_OWNERS:
+        if prefix and name.startswith(prefix):
+            return apps.get_model(label).objects.filter(**{field: name}).first()
+
+    MediaItem = apps.get_model('capture.MediaItem')
+    item = MediaItem.objects.filter(name=name).values('content_type_id', 'object_id').first()
+    if item is not None:
+        model = ContentType.objects.get_for_id(item['content_type_id']).model_class()
+        obj = model.objects.filter(id=item['object_id']).first()
+        if obj is not None:
+            return obj
+
+    for label, _, _, file_field, _ in CATALOG_SOURCES:
+        obj = apps.get_model(label).objects.filter(**{file_field: name}).first()
+        if obj is not None:
+            return obj
+
+    for label, field, prefix in UNCATALOGUED_OWNERS:
+        if prefix is None:
+            obj = apps.get_model(label).objects.filter(**{field: name}).first()
+            if obj is not None:
+                return obj
+    return None
+
+
+def can_access(user, obj):
+    """
+    Same visibility as the pages that link to the file: active records are open to
+    every logged-in user, soft-deleted ones to whoever deleted them, issue
+    attachments to their reporter, and superusers see everything.
+    """
+    if user.is_superuser:
+        return True
+
+    model_name = obj.__class__.__name__
+    if model_name == 'IssueReport':
+        return obj.user_id == user.id
+    if model_name in ARCHIVE_MODELS:
+        return False
+    if getattr(obj, 'is_deleted', False):
+        return obj.deleted_by_id == user.id
+    return True
+
+
+def media_response(request, name, path):
+    """Build the response for an already authorized file using the configured backend."""
+    content_type, _ = mimetypes.guess_type(path)
+    content_type = content_type or 'application/octet-stream'
+
+    if MEDIA_SERVE_BACKEND == 'nginx':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + quote(name)
+    elif MEDIA_SERVE_BACKEND == 'sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        return file_response(request, path, content_type)
+
+    response['Content-Disposition'] = f"inline; filename*=UTF-8''{quote(os.path.basename(name))}"
+    return response
+
+
+def file_response(request, path, content_type, cache_control="private, no-cache"):
+    """
+    Pure-Python fallback: streams `path` in READ_SIZE blocks, answers If-None-Match /
+    If-Modified-Since with 304 and a single "Range: bytes=a-b" with 206.
+    """
+    stat = os.stat(path)
+    size = stat.st_size
+    mtime = int(stat.st_mtime)
+    etag = quote_etag(f"{size:x}-{mtime:x}")
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if not_modified is not None:
+        not_modified['Cache-Control'] = cache_control
+        return not_modified
+
+    start, end = 0, size - 1
+    status = 200
+    range_header = request.headers.get('Range', '')
+    if_range = request.headers.get('If-Range')
+    match = RANGE_RE.match(range_header.strip())
+
+    # Multi-range and malformed headers fall back to the full file, which RFC 9110 allows
+    if match and (not if_range or if_range == etag) and size > 0:
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        elif last:
+            start = max(size - int(last), 0)
+        else:
+            match = None
+
+        if match:
+            if start >= size or start > end:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f"bytes */{size}"
+                return response
+            status = 206
+
+    length = end - start + 1 if size else 0
+    response = StreamingHttpResponse(
+        read_range(path, start, length),
+        status=status,
+        content_type=content_type,
+    )
+    response['Content-Length'] = str(length)
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Cache-Control'] = cache_control
+    if status == 206:
+        response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    return response
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(READ_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
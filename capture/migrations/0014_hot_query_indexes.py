@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('capture', '0013_media_missing_since'),
+        ('members', '0009_alter_customuser_options_customuser_ward_other_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='capturedimage',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['uhid', '-timestamp'], name='cap_capimg_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedfile',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['uhid', '-timestamp'], name='cap_upfile_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedimage',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['uhid', '-timestamp'], name='cap_upimg_live_idx'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('capture', '0014_hot_query_indexes'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('members', '0009_alter_customuser_options_customuser_ward_other_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service', models.CharField(choices=[('capture', 'Capture'), ('echs', 'ECHS')], max_length=20)),
+                ('kind', models.CharField(choices=[('captured_image', 'Captured Image'), ('uploaded_image', 'Uploaded Image'), ('uploaded_file', 'Uploaded File'), ('other_file', 'Patient File')], max_length=20)),
+                ('object_id', models.PositiveIntegerField()),
+                ('uhid', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=255)),
+                ('file_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('size', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('latitude', models.FloatField(blank=True, null=True)),
+                ('longitude', models.FloatField(blank=True, null=True)),
+                ('timestamp', models.DateTimeField()),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('custom_tag', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='media_items', to='members.customtag')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media_items', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-timestamp', '-id'], name='media_item_recent_idx'), models.Index(condition=models.Q(('is_deleted', False)), fields=['service', 'uhid', '-timestamp'], name='media_item_uhid_live_idx')],
+                'constraints': [models.UniqueConstraint(fields=('content_type', 'object_id'), name='media_item_source_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('capture', '0015_media_catalog'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('members', '0009_alter_customuser_options_customuser_ward_other_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='mediaitem',
+            name='media_item_recent_idx',
+        ),
+        migrations.AddIndex(
+            model_name='issuereport',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['-created_at', '-id'], name='issue_live_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaitem',
+            index=models.Index(fields=['service', '-timestamp', '-id'], name='media_item_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mediaitem',
+            index=models.Index(fields=['service', 'kind', '-timestamp', '-id'], name='media_item_kind_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('capture', '0016_listing_indexes'),
+        ('members', '0009_alter_customuser_options_customuser_ward_other_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsageCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('service', models.CharField(choices=[('capture', 'Capture'), ('echs', 'ECHS')], max_length=20)),
+                ('kind', models.CharField(choices=[('captured_image', 'Captured Image'), ('uploaded_image', 'Uploaded Image'), ('uploaded_file', 'Uploaded File'), ('other_file', 'Patient File')], max_length=20)),
+                ('items', models.IntegerField(default=0)),
+                ('bytes', models.BigIntegerField(default=0)),
+                ('custom_tag', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='usage_counters', to='members.customtag')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('custom_tag__isnull', False)), fields=('day', 'service', 'kind', 'user', 'custom_tag'), name='usage_counter_tagged_unique'), models.UniqueConstraint(condition=models.Q(('custom_tag__isnull', True)), fields=('day', 'service', 'kind', 'user'), name='usage_counter_untagged_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('capture', '0017_usage_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediaitem',
+            name='deleted_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='deleted_media_items', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='PatientSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service', models.CharField(choices=[('capture', 'Capture'), ('echs', 'ECHS')], max_length=20)),
+                ('uhid', models.PositiveIntegerField()),
+                ('captured_images', models.IntegerField(default=0)),
+                ('uploaded_images', models.IntegerField(default=0)),
+                ('uploaded_files', models.IntegerField(default=0)),
+                ('other_files', models.IntegerField(default=0)),
+                ('last_activity', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('service', 'uhid'), name='patient_summary_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PatientDeletedCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('service', models.CharField(choices=[('capture', 'Capture'), ('echs', 'ECHS')], max_length=20)),
+                ('uhid', models.PositiveIntegerField()),
+                ('items', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='patient_deleted_counts', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('service', 'uhid', 'user'), name='patient_deleted_count_unique')],
+            },
+        ),
+    ]
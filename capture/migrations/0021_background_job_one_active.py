@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+def fail_duplicate_active_jobs(apps, schema_editor):
+    """Keep the oldest active job per task and row; jobs queued twice by a past race would block the constraint."""
+    BackgroundJob = apps.get_model('capture', 'BackgroundJob')
+    seen, duplicates = set(), []
+    active = BackgroundJob.objects.filter(status__in=["queued", "running"], content_type__isnull=False, object_id__isnull=False)
+    for job_id, key in ((job[0], job[1:]) for job in active.order_by('id').values_list('id', 'task', 'content_type_id', 'object_id')):
+        if key in seen:
+            duplicates.append(job_id)
+        seen.add(key)
+    BackgroundJob.objects.filter(id__in=duplicates).update(status="failed", last_error="Duplicate of an older active job")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('capture', '0020_media_owner_lookup_indexes'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_active_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='backgroundjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('task', 'content_type', 'object_id'), name='background_job_one_active_per_target'),
+        ),
+    ]
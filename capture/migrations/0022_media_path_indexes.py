@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:12
+
+import capture.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('capture', '0021_background_job_one_active'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='capturedimage',
+            name='image_path',
+            field=models.ImageField(db_index=True, upload_to=capture.models.upload_to),
+        ),
+        migrations.AlterField(
+            model_name='uploadedfile',
+            name='file_path',
+            field=models.FileField(db_index=True, upload_to=capture.models.upload_to),
+        ),
+        migrations.AlterField(
+            model_name='uploadedimage',
+            name='image_path',
+            field=models.ImageField(db_index=True, upload_to=capture.models.upload_to),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:10
+
+from django.db import migrations, models
+
+
+def fail_duplicate_untargeted_jobs(apps, schema_editor):
+    """Keep the oldest active job per target-less task; duplicates queued by a past race would block the constraint."""
+    BackgroundJob = apps.get_model('capture', 'BackgroundJob')
+    seen, duplicates = set(), []
+    active = BackgroundJob.objects.filter(status__in=["queued", "running"], content_type__isnull=True, object_id__isnull=True)
+    for job_id, task in active.order_by('id').values_list('id', 'task'):
+        if task in seen:
+            duplicates.append(job_id)
+        seen.add(task)
+    BackgroundJob.objects.filter(id__in=duplicates).update(status="failed", last_error="Duplicate of an older active job")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('capture', '0022_media_path_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicate_untargeted_jobs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='backgroundjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_type__isnull', True), ('object_id__isnull', True), ('status__in', ['queued', 'running'])), fields=('task',), name='background_job_one_active_untargeted'),
+        ),
+    ]
@@ -1,12 +1,16 @@
 from datetime import timezone
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 import uuid
 import os
 from django.utils import timezone  
 from members.models import CustomTag
 from django.conf import settings
+from filesys.layout import uhid_dir
 from django.core.validators import FileExtensionValidator
+from django.core.files.storage import default_storage
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.contenttypes.fields import GenericForeignKey
 import random
 import string
 
@@ -34,19 +38,28 @@ def upload_to(instance, filename):
     else:
         subfolder = f"{uhid_prefix}_other"
 
-    # Full path: UHID_<number>/UHID_<number>_<subfolder>/<filename>
-    return os.path.join(uhid_prefix, subfolder, filename)
+    # Full path: [<shard>/]UHID_<number>/UHID_<number>_<subfolder>/<filename>
+    return os.path.join(uhid_dir(instance.uhid), subfolder, filename)
 
 class CapturedImage(models.Model):
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="captured_images")  # Associate with user
     uhid = models.PositiveIntegerField()  # Numeric field for UHID
-    image_path = models.ImageField(upload_to=upload_to)  # Store the image with the UHID-based folder structure
+    image_path = models.ImageField(upload_to=upload_to, db_index=True)  # Store the image with the UHID-based folder structure (indexed for /media/ lookups)
     folder_path = models.CharField(max_length=255, blank=True, null=True)  # Folder path to store the UHID-based folder location
     custom_tag = models.ForeignKey(CustomTag, null=True, blank=True, on_delete=models.SET_NULL)
     image_size = models.PositiveIntegerField(blank=True, null=True)
+    # Filled in by the single-pass ingest (capture/ingest.py), so listings never open the file
+    image_width = models.PositiveIntegerField(blank=True, null=True)
+    image_height = models.PositiveIntegerField(blank=True, null=True)
+    image_format = models.CharField(max_length=10, blank=True, null=True, db_index=True)
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # SHA-256 of the stored bytes
+    exif_taken_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    exif_latitude = models.FloatField(blank=True, null=True)
+    exif_longitude = models.FloatField(blank=True, null=True)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)  # Capture t  mimestamp
+    missing_since = models.DateTimeField(blank=True, null=True, db_index=True)  # Set by the media integrity check while the file is not on disk
 
     is_deleted = models.BooleanField(default=False)
     deleted_on = models.DateTimeField(null=True, blank=True)
@@ -58,10 +71,18 @@ class CapturedImage(models.Model):
         related_name="deleted_by"
     )
 
+    class Meta:
+        indexes = [
+            # Patient listings: live rows of one uhid, newest first
+            models.Index(fields=["uhid", "-timestamp"], condition=models.Q(is_deleted=False), name="cap_capimg_live_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.folder_path:
-            self.folder_path = f"UHID_{self.uhid}/UHID_{self.uhid}_captured_images/"
-        super().save(*args, **kwargs)
+            self.folder_path = f"{uhid_dir(self.uhid)}/UHID_{self.uhid}_captured_images/"
+        # The post_save catalog and usage-counter updates commit or roll back with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"UHID: {self.uhid} - {self.user.username} - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -71,7 +92,7 @@ class DeletedCapturedImage(models.Model):
     original_id = models.PositiveIntegerField()  # Store original image ID
     user = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True)
     uhid = models.PositiveIntegerField()
-    image_path = models.CharField(max_length=255)  # Store path of the deleted image
+    image_path = models.CharField(max_length=255, db_index=True)  # Store path of the deleted image (looked up by /media/)
     folder_path = models.CharField(max_length=255, blank=True, null=True)
     custom_tag = models.CharField(max_length=100, blank=True, null=True)
     image_size = models.PositiveIntegerField(blank=True, null=True)
@@ -88,12 +109,13 @@ class DeletedCapturedImage(models.Model):
 class UploadedFile(models.Model):
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="uploaded_files")
     uhid = models.PositiveIntegerField()
-    file_path = models.FileField(upload_to=upload_to)
+    file_path = models.FileField(upload_to=upload_to, db_index=True)  # Indexed for /media/ lookups
     folder_path = models.CharField(max_length=255, blank=True, null=True)
     custom_tag = models.ForeignKey(CustomTag, null=True, blank=True, on_delete=models.SET_NULL)
     file_size = models.PositiveIntegerField(blank=True, null=True)  # In bytes
     file_type = models.CharField(max_length=100, blank=True, null=True)  # MIME type
     timestamp = models.DateTimeField(auto_now_add=True)
+    missing_since = models.DateTimeField(blank=True, null=True, db_index=True)  # Set by the media integrity check while the file is not on disk
 
     is_deleted = models.BooleanField(default=False)
     deleted_on = models.DateTimeField(null=True, blank=True)
@@ -105,6 +127,12 @@ class UploadedFile(models.Model):
         related_name="pdf_deleted_by"
     )
 
+    class Meta:
+        indexes = [
+            # Patient listings: live rows of one uhid, newest first
+            models.Index(fields=["uhid", "-timestamp"], condition=models.Q(is_deleted=False), name="cap_upfile_live_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.folder_path:
             self.folder_path = f"{self.uhid}/uploaded_files/"
@@ -116,7 +144,8 @@ class UploadedFile(models.Model):
             except Exception:
                 pass
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"UHID: {self.uhid} - {self.user.username} - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -129,7 +158,7 @@ class DeletedUploadedFile(models.Model):
     original_id = models.PositiveIntegerField()  # ID of the original UploadedFile
     user = models.ForeignKey(get_user_model(), on_delete=models.SET_NULL, null=True)  # Who uploaded it
     uhid = models.PositiveIntegerField()
-    file_path = models.CharField(max_length=255)  # Store the path to the file
+    file_path = models.CharField(max_length=255, db_index=True)  # Store the path to the file (looked up by /media/)
     folder_path = models.CharField(max_length=255, blank=True, null=True)
     custom_tag = models.CharField(max_length=100, blank=True, null=True)
     file_size = models.PositiveIntegerField(blank=True, null=True)
@@ -144,11 +173,20 @@ class DeletedUploadedFile(models.Model):
 class UploadedImage(models.Model):
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="uploaded_images")  # Associate with user
     uhid = models.PositiveIntegerField()  # Numeric field for UHID
-    image_path = models.ImageField(upload_to=upload_to)  # Store the image with the UHID-based folder structure
+    image_path = models.ImageField(upload_to=upload_to, db_index=True)  # Store the image with the UHID-based folder structure (indexed for /media/ lookups)
     folder_path = models.CharField(max_length=255, blank=True, null=True)  # Folder path to store the UHID-based folder location
     custom_tag = models.ForeignKey(CustomTag, null=True, blank=True, on_delete=models.SET_NULL)  # Custom tag associated with the image
     image_size = models.PositiveIntegerField(blank=True, null=True)  # Size of the image (in bytes)
+    # Filled in by the single-pass ingest (capture/ingest.py), so listings never open the file
+    image_width = models.PositiveIntegerField(blank=True, null=True)
+    image_height = models.PositiveIntegerField(blank=True, null=True)
+    image_format = models.CharField(max_length=10, blank=True, null=True, db_index=True)
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # SHA-256 of the stored bytes
+    exif_taken_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    exif_latitude = models.FloatField(blank=True, null=True)
+    exif_longitude = models.FloatField(blank=True, null=True)
     timestamp = models.DateTimeField(auto_now_add=True)  # Timestamp when the image was uploaded
+    missing_since = models.DateTimeField(blank=True, null=True, db_index=True)  # Set by the media integrity check while the file is not on disk
 
     is_deleted = models.BooleanField(default=False)
     deleted_on = models.DateTimeField(null=True, blank=True)
@@ -160,10 +198,17 @@ class UploadedImage(models.Model):
         related_name="upload_deleted_by"
     )
 
+    class Meta:
+        indexes = [
+            # Patient listings: live rows of one uhid, newest first
+            models.Index(fields=["uhid", "-timestamp"], condition=models.Q(is_deleted=False), name="cap_upimg_live_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.folder_path:
-            self.folder_path = f"UHID_{self.uhid}/uploaded_images/"
-        super().save(*args, **kwargs)
+            self.folder_path = f"{uhid_dir(self.uhid)}/uploaded_images/"
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"UHID: {self.uhid} - {self.user.username} - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -241,6 +286,12 @@ class IssueReport(models.Model):
         default=timezone.now
     )
 
+    class Meta:
+        indexes = [
+            # manage_issues: keyset pages of live issues, newest first
+            models.Index(fields=["-created_at", "-id"], condition=models.Q(is_deleted=False), name="issue_live_recent_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.issue_id:
             self.issue_id = generate_unique_issue_id()
@@ -248,3 +299,299 @@ class IssueReport(models.Model):
 
     def __str__(self):
         return f"Issue reported by {self.user.email} on {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class MediaBlob(models.Model):
+    """One physical file in the content-addressed store, shared by every upload with the same bytes."""
+    digest = models.CharField(max_length=64, unique=True)  # SHA-256 hex
+    size = models.PositiveBigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)  # Logical names pointing here
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.ref_count} refs)"
+
+
+class MediaBlobLink(models.Model):
+    """Logical media name (the upload_to path stored on a row) mapped to its blob."""
+    name = models.CharField(max_length=255, unique=True)
+    blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, related_name="links")
+    created_on = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} -> {self.blob.digest[:12]}"
+
+
+class ChunkedUploadSession(models.Model):
+    """A resumable upload whose fixed-size parts are staged on disk until commit."""
+    SERVICE_CHOICES = [
+        ("capture", "Capture"),
+        ("echs", "ECHS"),
+    ]
+    KIND_CHOICES = [
+        ("pdf", "PDF File"),
+        ("image", "Image"),
+    ]
+    STATUS_CHOICES = [
+        ("open", "Open"),
+        ("committed", "Committed"),
+    ]
+
+    session_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="chunked_uploads")
+    service = models.CharField(max_length=20, choices=SERVICE_CHOICES)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    uhid = models.PositiveIntegerField()
+    custom_tag = models.ForeignKey(CustomTag, null=True, blank=True, on_delete=models.SET_NULL, related_name="chunked_uploads")
+    file_name = models.CharField(max_length=255)
+    file_type = models.CharField(max_length=100)
+    file_size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    total_chunks = models.PositiveIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)  # Optional whole-file checksum
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="open")
+    created_on = models.DateTimeField(auto_now_add=True)
+    updated_on = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.session_id} - UHID: {self.uhid} - {self.file_name} ({self.status})"
+
+
+class BackgroundJob(models.Model):
+    """
+    A unit of deferred work picked up by `python manage.py run_jobs`.
+    `task` is the dotted path of a function taking the job; the optional generic
+    target is the row the job works on (at most one active job per task and row).
+    """
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    ]
+
+    task = models.CharField(max_length=255)
+    content_type = models.ForeignKey(ContentType, null=True, blank=True, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField(null=True, blank=True)
+    target = GenericForeignKey('content_type', 'object_id')
+    payload = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    result = models.JSONField(null=True, blank=True)
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    started_on = models.DateTimeField(null=True, blank=True)
+    heartbeat_on = models.DateTimeField(null=True, blank=True)  # long jobs report progress, so they are not taken for dead
+    finished_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+            models.Index(fields=["content_type", "object_id"]),
+        ]
+        constraints = [
+            # enqueue() relies on this: two requests racing for the same task and row get one job
+            models.UniqueConstraint(
+                fields=["task", "content_type", "object_id"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="background_job_one_active_per_target",
+            ),
+            # NULLs never collide above, so jobs without a target (e.g. the integrity scan) need their own
+            models.UniqueConstraint(
+                fields=["task"],
+                condition=models.Q(status__in=["queued", "running"], content_type__isnull=True, object_id__isnull=True),
+                name="background_job_one_active_untargeted",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.id} ({self.status}, attempt {self.attempts}/{self.max_attempts})"
+
+
+class ExportJob(models.Model):
+    """
+    A superuser export built in the background (capture/export_jobs.py): the
+    spec (type, filters, format), its progress, and the finished file under
+    MEDIA_ROOT/<EXPORT_DIR>, downloadable until `expires_on`.
+    """
+    STATUS_CHOICES = [
+        ("queued", "Queued"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+        ("expired", "Expired"),
+    ]
+
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="export_jobs")
+    export_type = models.CharField(max_length=50)  # e.g. "media:all", "members:users"
+    format = models.CharField(max_length=10, default="xlsx")
+    filters = models.JSONField(default=dict, blank=True)  # query parameters of the table page
+    base_url = models.CharField(max_length=255, blank=True)  # prefix of the file links in media exports
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="queued")
+    rows_done = models.PositiveIntegerField(default=0)
+    rows_total = models.PositiveIntegerField(null=True, blank=True)
+    file_name = models.CharField(max_length=255, blank=True)  # relative to MEDIA_ROOT
+    download_name = models.CharField(max_length=255, blank=True)
+    file_size = models.BigIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+
+    created_on = models.DateTimeField(auto_now_add=True)
+    finished_on = models.DateTimeField(null=True, blank=True)
+    expires_on = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_on", "-id"]
+        indexes = [
+            models.Index(fields=["user", "status"]),
+            models.Index(fields=["status", "expires_on"]),
+        ]
+
+    def __str__(self):
+        return f"Export {self.export_type} #{self.id} ({self.status}, {self.rows_done} rows)"
+
+
+class MediaItem(models.Model):
+    """
+    Catalog row for one stored media object of any kind, from either app.
+    Kept in sync by capture/catalog.py; combined listings and exports page
+    through this table instead of merging several querysets in Python.
+    """
+    SERVICE_CHOICES = [
+        ("capture", "Capture"),
+        ("echs", "ECHS"),
+    ]
+    KIND_CHOICES = [
+        ("captured_image", "Captured Image"),
+        ("uploaded_image", "Uploaded Image"),
+        ("uploaded_file", "Uploaded File"),
+        ("other_file", "Patient File"),
+    ]
+
+    service = models.CharField(max_length=20, choices=SERVICE_CHOICES)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    source = GenericForeignKey('content_type', 'object_id')
+
+    uhid = models.PositiveIntegerField()  # ECHS rows: the patient's UHID
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="media_items")  # Uploader
+    custom_tag = models.ForeignKey(CustomTag, null=True, blank=True, on_delete=models.SET_NULL, related_name="media_items")
+    name = models.CharField(max_length=255)  # Stored path relative to MEDIA_ROOT
+    file_type = models.CharField(max_length=100, blank=True, null=True)
+    size = models.PositiveBigIntegerField(blank=True, null=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    timestamp = models.DateTimeField()
+    is_deleted = models.BooleanField(default=False)
+    deleted_by = models.ForeignKey(get_user_model(), null=True, blank=True, on_delete=models.SET_NULL, related_name="deleted_media_items")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["content_type", "object_id"], name="media_item_source_unique"),
+        ]
+        indexes = [
+            # Superuser tables and exports: everything of one app, newest first
+            models.Index(fields=["service", "-timestamp", "-id"], name="media_item_recent_idx"),
+            # Superuser tables of one kind (keyset pages on timestamp, id)
+            models.Index(fields=["service", "kind", "-timestamp", "-id"], name="media_item_kind_recent_idx"),
+            # Patient pages: live items of one UHID per app, newest first
+            models.Index(fields=["service", "uhid", "-timestamp"], condition=models.Q(is_deleted=False), name="media_item_uhid_live_idx"),
+            # /media/ requests: the row owning a stored file
+            models.Index(fields=["name"], name="media_item_name_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id} - UHID: {self.uhid}"
+
+    @property
+    def source_type(self):
+        """'captured' / 'uploaded' as used by the rendition and delete URLs."""
+        return self.kind.split('_')[0]
+
+    @property
+    def url(self):
+        return default_storage.url(self.name)
+
+    @property
+    def filename(self):
+        return os.path.basename(self.name)
+
+
+class UsageCounter(models.Model):
+    """
+    Rollup of live media: item count and bytes per day, app, kind, uploader
+    and tag. Adjusted by capture/usage.py in the same transaction as every
+    catalog change; `python manage.py rebuild_usage_counters` recomputes it.
+    Per-department figures group these rows by the uploader's department.
+    """
+    day = models.DateField()
+    service = models.CharField(max_length=20, choices=MediaItem.SERVICE_CHOICES)
+    kind = models.CharField(max_length=20, choices=MediaItem.KIND_CHOICES)
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="usage_counters")
+    custom_tag = models.ForeignKey(CustomTag, null=True, blank=True, on_delete=models.CASCADE, related_name="usage_counters")
+    items = models.IntegerField(default=0)
+    bytes = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # One counter per key; untagged media needs its own constraint (NULLs never collide)
+            models.UniqueConstraint(
+                fields=["day", "service", "kind", "user", "custom_tag"],
+                condition=models.Q(custom_tag__isnull=False), name="usage_counter_tagged_unique",
+            ),
+            models.UniqueConstraint(
+                fields=["day", "service", "kind", "user"],
+                condition=models.Q(custom_tag__isnull=True), name="usage_counter_untagged_unique",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.service}/{self.kind} user {self.user_id}: {self.items} items, {self.bytes} bytes"
+
+
+class PatientSummary(models.Model):
+    """
+    Live media counts and latest upload of one patient (UHID) per app, read by
+    the UHID options pages. Maintained by capture/summaries.py alongside the
+    catalog; `python manage.py verify_patient_summaries` repairs drift.
+    """
+    service = models.CharField(max_length=20, choices=MediaItem.SERVICE_CHOICES)
+    uhid = models.PositiveIntegerField()
+    captured_images = models.IntegerField(default=0)
+    uploaded_images = models.IntegerField(default=0)
+    uploaded_files = models.IntegerField(default=0)
+    other_files = models.IntegerField(default=0)
+    last_activity = models.DateTimeField(null=True, blank=True)  # Newest item timestamp, live or deleted
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["service", "uhid"], name="patient_summary_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.service} UHID {self.uhid}: {self.image_count} images, {self.uploaded_files} files"
+
+    @property
+    def image_count(self):
+        return self.captured_images + self.uploaded_images
+
+
+class PatientDeletedCount(models.Model):
+    """Soft-deleted images and uploaded files of one patient, per user who deleted them."""
+    service = models.CharField(max_length=20, choices=MediaItem.SERVICE_CHOICES)
+    uhid = models.PositiveIntegerField()
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name="patient_deleted_counts")
+    items = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["service", "uhid", "user"], name="patient_deleted_count_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.service} UHID {self.uhid}: {self.items} deleted by user {self.user_id}"
@@ -0,0 +1,276 @@
+"""
+Reconcile MEDIA_ROOT with the database: files without a row (orphans), rows
+without a file (missing) and stored sizes that disagree with the disk.
+
+Both sides are loaded into an on-disk SQLite set, never into Python memory:
+the UHID_<n> directories are walked by a thread pool, and the table rows
+are streamed with .iterator(). The diff is then plain SQL joins. The state
+file doubles as the checkpoint: a run that is interrupted skips the
+directories and row ranges it already loaded when started with --resume.
+
+Used by `python manage.py reconcile_media`.
+"""
+import csv
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from filesys.layout import MEDIA_SHARD_DEPTH, find_uhid_dirs
+from . import catalog
+from .integrity import INTEGRITY_WORKERS, MEDIA_FILES
+from .storage import move_media
+
+
+MEDIA_QUARANTINE_DIR = getattr(settings, 'MEDIA_QUARANTINE_DIR', 'quarantine')
+
+# Tables that still reference a file but have no size column or missing flag
+REFERENCE_ONLY = [
+    ('capture.DeletedCapturedImage', 'image_path'),
+    ('capture.DeletedUploadedFile', 'file_path'),
+]
+
+NO_SIZE = -1  # stored_size marker for REFERENCE_ONLY rows
+STREAM_CHUNK = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS walked (dir TEXT PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS progress (label TEXT PRIMARY KEY, last_id INTEGER, done INTEGER DEFAULT 0);
+CREATE TABLE IF NOT EXISTS disk (name TEXT PRIMARY KEY, base TEXT, size INTEGER, mtime REAL);
+CREATE TABLE IF NOT EXISTS db (name TEXT, base TEXT, label TEXT, pk INTEGER, stored_size INTEGER);
+CREATE INDEX IF NOT EXISTS db_name ON db (name);
+CREATE INDEX IF NOT EXISTS disk_base ON disk (base);
+"""
+
+
+def default_state_path():
+    return os.path.join(settings.MEDIA_ROOT, '.reconcile_media.sqlite3')
+
+
+def open_state(path, resume=False):
+    if not resume and os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def list_tree(rel_dir):
+    """Every file below one UHID directory as (name, size, mtime); runs in a worker thread."""
+    entries = []
+    stack = [rel_dir]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(os.path.join(settings.MEDIA_ROOT, current)) as it:
+                for entry in it:
+                    name = f"{current}/{entry.name}"
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(name)
+                    elif entry.is_file(follow_symlinks=False):
+                        stat = entry.stat(follow_symlinks=False)
+                        entries.append((name, stat.st_size, stat.st_mtime))
+        except OSError as e:
+            print(f"[ERROR] Could not list {current}: {e}")
+    return entries
+
+
+def load_disk(conn, workers=INTEGRITY_WORKERS, log=print):
+    """Walk every UHID_<n> directory not walked yet, a slice of directories at a time."""
+    done = {row[0] for row in conn.execute("SELECT dir FROM walked")}
+    pending = [rel_dir for _, rel_dir in find_uhid_dirs(MEDIA_SHARD_DEPTH) if rel_dir not in done]
+    log(f"📂 {len(pending)} UHID folders to walk ({len(done)} already done)")
+
+    slice_size = max(1, workers) * 4
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for start in range(0, len(pending), slice_size):
+            dirs = pending[start:start + slice_size]
+            for rel_dir, entries in zip(dirs, pool.map(list_tree, dirs)):
+                conn.executemany(
+                    "INSERT OR REPLACE INTO disk (name, base, size, mtime) VALUES (?, ?, ?, ?)",
+                    ((name, os.path.basename(name), size, mtime) for name, size, mtime in entries),
+                )
+                conn.execute("INSERT INTO walked (dir) VALUES (?)", (rel_dir,))
+            conn.commit()
+
+
+def load_rows(conn, log=print):
+    """Stream every file reference from the database, checkpointing the last id per table."""
+    sources = [(label, file_field, size_field) for label, file_field, size_field in MEDIA_FILES]
+    sources += [(label, file_field, None) for label, file_field in REFERENCE_ONLY]
+
+    for label, file_field, size_field in sources:
+        state = conn.execute("SELECT last_id, done FROM progress WHERE label = ?", (label,)).fetchone()
+        if state and state[1]:
+            continue
+        last_id = state[0] if state else 0
+
+        model = apps.get_model(label)
+        fields = ['id', file_field] + ([size_field] if size_field else [])
+        rows = model.objects.filter(id__gt=last_id).order_by('id').values_list(*fields).iterator(chunk_size=STREAM_CHUNK)
+
+        batch = []
+        count = 0
+        for row in rows:
+            pk, name = row[0], row[1]
+            last_id = pk
+            if name:
+                name = name.replace("\\", "/")
+                batch.append((name, os.path.basename(name), label, pk, row[2] if size_field else NO_SIZE))
+            if len(batch) >= STREAM_CHUNK:
+                count += _flush_rows(conn, batch, label, last_id)
+                batch = []
+        count += _flush_rows(conn, batch, label, last_id)
+        conn.execute("UPDATE progress SET done = 1 WHERE label = ?", (label,))
+        conn.commit()
+        log(f"🗃️ {label}: {count} file references loaded")
+
+
+def _flush_rows(conn, batch, label, last_id):
+    conn.executemany("INSERT INTO db (name, base, label, pk, stored_size) VALUES (?, ?, ?, ?, ?)", batch)
+    conn.execute("INSERT OR REPLACE INTO progress (label, last_id, done) VALUES (?, ?, 0)", (label, last_id))
+    conn.commit()
+    return len(batch)
+
+
+def diff(conn, workers=INTEGRITY_WORKERS):
+    """
+    Materialize the missing / orphan / size-mismatch sets. A missing candidate
+    is stat()ed once more, since it may live outside the walked layout.
+    """
+    conn.executescript("""
+        DROP TABLE IF EXISTS missing;
+        DROP TABLE IF EXISTS orphan;
+        CREATE TABLE missing AS
+            SELECT db.* FROM db LEFT JOIN disk ON disk.name = db.name WHERE disk.name IS NULL;
+        CREATE TABLE orphan AS
+            SELECT disk.* FROM disk LEFT JOIN db ON db.name = disk.name WHERE db.name IS NULL;
+        CREATE INDEX missing_base ON missing (base);
+        CREATE INDEX orphan_base ON orphan (base);
+    """)
+
+    candidates = [row[0] for row in conn.execute("SELECT DISTINCT name FROM missing")]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        exists = pool.map(lambda name: os.path.exists(os.path.join(settings.MEDIA_ROOT, name)), candidates)
+        found = [(name,) for name, present in zip(candidates, exists) if present]
+    conn.executemany("DELETE FROM missing WHERE name = ?", found)
+    conn.commit()
+
+
+# Rows joined to their file whose stored size is unknown or wrong (REFERENCE_ONLY rows have none)
+MISMATCH_FROM = f"""
+    FROM db JOIN disk ON disk.name = db.name
+    WHERE db.stored_size IS NOT {NO_SIZE} AND (db.stored_size IS NULL OR db.stored_size != disk.size)
+"""
+
+
+def summary(conn):
+    return {
+        'disk_files': conn.execute("SELECT COUNT(*) FROM disk").fetchone()[0],
+        'db_rows': conn.execute("SELECT COUNT(*) FROM db").fetchone()[0],
+        'missing': conn.execute("SELECT COUNT(*) FROM missing").fetchone()[0],
+        'orphans': conn.execute("SELECT COUNT(*) FROM orphan").fetchone()[0],
+        'size_mismatch': conn.execute("SELECT COUNT(*) " + MISMATCH_FROM).fetchone()[0],
+    }
+
+
+def size_mismatches(conn):
+    return conn.execute(
+        "SELECT db.label, db.pk, db.name, db.stored_size, disk.size " + MISMATCH_FROM + " ORDER BY db.name"
+    )
+
+
+def relink_matches(conn):
+    """
+    Missing rows whose file name appears exactly once among the orphans (a move
+    that happened without the row being updated, e.g. an interrupted delete).
+    """
+    return conn.execute("""
+        SELECT m.label, m.pk, m.name, o.name, o.size FROM missing m JOIN orphan o ON o.base = m.base
+        WHERE m.stored_size IS NOT ?
+          AND (SELECT COUNT(*) FROM orphan o2 WHERE o2.base = m.base) = 1
+          AND (SELECT COUNT(*) FROM missing m2 WHERE m2.base = m.base) = 1
+    """, (NO_SIZE,)).fetchall()
+
+
+def write_report(conn, report_path, actions=None):
+    """CSV of every finding; `actions` maps (issue, name) to what was done about it."""
+    actions = actions or {}
+    with open(report_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['issue', 'name', 'model', 'id', 'stored_size', 'disk_size', 'action'])
+        for label, pk, name, stored_size in conn.execute("SELECT label, pk, name, stored_size FROM missing ORDER BY name"):
+            writer.writerow(['missing', name, label, pk, '' if stored_size == NO_SIZE else stored_size, '', actions.get(('missing', name), '')])
+        for name, size in conn.execute("SELECT name, size FROM orphan ORDER BY name"):
+            writer.writerow(['orphan', name, '', '', '', size, actions.get(('orphan', name), '')])
+        for label, pk, name, stored_size, size in size_mismatches(conn):
+            writer.writerow(['size_mismatch', name, label, pk, stored_size, size, actions.get(('size_mismatch', name), '')])
+
+
+def repair(conn, log=print):
+    """
+    Relink moved files, correct stored sizes and flag the rows that stay missing.
+    Returns {(issue, name): action} for the report.
+    """
+    file_fields = {label: (file_field, size_field) for label, file_field, size_field in MEDIA_FILES}
+    actions = {}
+
+    for label, pk, old_name, new_name, size in relink_matches(conn):
+        file_field, size_field = file_fields[label]
+        # load_rows() normalised the stored name, which may still use backslashes
+        stored = Q(**{file_field: old_name}) | Q(**{file_field: old_name.replace("/", "\\")})
+        updated = apps.get_model(label).objects.filter(stored, pk=pk).update(
+            **{file_field: new_name, size_field: size, 'missing_since': None}
+        )
+        if updated != 1:
+            # The row changed since the diff: leave it to be flagged below and the orphan to quarantine
+            log(f"[WARN] {label} #{pk} no longer points at {old_name}; not relinked")
+            continue
+        catalog.sync_rows(apps.get_model(label), [pk])
+        actions[('missing', old_name)] = f"relinked to {new_name}"
+        actions[('orphan', new_name)] = f"relinked from {label} #{pk}"
+
+    for label, pk, name, stored_size, size in size_mismatches(conn).fetchall():
+        _, size_field = file_fields[label]
+        apps.get_model(label).objects.filter(pk=pk).update(**{size_field: size})
+        catalog.sync_rows(apps.get_model(label), [pk])
+        actions[('size_mismatch', name)] = "size corrected"
+
+    now = timezone.now()
+    for label, pk, name in conn.execute("SELECT label, pk, name FROM missing WHERE stored_size IS NOT ?", (NO_SIZE,)).fetchall():
+        if ('missing', name) in actions:
+            continue
+        apps.get_model(label).objects.filter(pk=pk, missing_since__isnull=True).update(missing_since=now)
+        actions[('missing', name)] = "flagged missing_since"
+
+    log(f"🛠️ Repaired: {sum(1 for a in actions.values() if a.startswith('relinked to'))} relinked, "
+        f"{sum(1 for a in actions.values() if a == 'size corrected')} sizes corrected")
+    return actions
+
+
+def quarantine(conn, min_age_hours=24, skip=(), log=print):
+    """
+    Move orphans older than `min_age_hours` (younger ones may be uploads still
+    being committed) to MEDIA_ROOT/<MEDIA_QUARANTINE_DIR>/<date>/<name>.
+    `skip` holds the (issue, name) keys already handled, e.g. by repair().
+    """
+    actions = {}
+    cutoff = timezone.now().timestamp() - min_age_hours * 3600
+    day = timezone.now().strftime('%Y-%m-%d')
+    moved = 0
+    for (name,) in conn.execute("SELECT name FROM orphan WHERE mtime < ?", (cutoff,)).fetchall():
+        if ('orphan', name) in skip:
+            continue
+        try:
+            new_name = move_media(name, f"{MEDIA_QUARANTINE_DIR}/{day}/{name}")
+        except OSError as e:
+            print(f"[ERROR] Could not quarantine {name}: {e}")
+            continue
+        actions[('orphan', name)] = f"quarantined to {new_name}"
+        moved += 1
+    log(f"📦 Quarantined {moved} orphan files")
+    return actions
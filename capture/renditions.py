@@ -0,0 +1,94 @@
+import hashlib
+import os
+import uuid
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+
+# Longest edge in pixels for each rendition size
+RENDITION_SIZES = getattr(settings, 'RENDITION_SIZES', {'thumb': 320, 'medium': 1280})
+RENDITION_FORMAT = getattr(settings, 'RENDITION_FORMAT', 'WEBP')
+RENDITION_QUALITY = getattr(settings, 'RENDITION_QUALITY', 80)
+RENDITION_DIR = getattr(settings, 'RENDITION_DIR', 'renditions')
+
+FORMAT_EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+FORMAT_CONTENT_TYPES = {'WEBP': 'image/webp', 'JPEG': 'image/jpeg'}
+
+
+def rendition_name(source_name, size):
+    """
+    Deterministic cache path (relative to MEDIA_ROOT) for one rendition of a source file.
+    The key covers the source name and the size/format settings, so a changed setting
+    never serves a stale file.
+    """
+    edge = RENDITION_SIZES[size]
+    key = hashlib.sha1(f"{source_name}|{size}|{edge}|{RENDITION_FORMAT}|{RENDITION_QUALITY}".encode()).hexdigest()
+    return f"{RENDITION_DIR}/{size}/{key[:2]}/{key}.{FORMAT_EXTENSIONS[RENDITION_FORMAT]}"
+
+
+def rendition_content_type():
+    return FORMAT_CONTENT_TYPES[RENDITION_FORMAT]
+
+
+def build_rendition(source_name, size, image=None):
+    """
+    Write the rendition for `source_name` and return its absolute path.
+
+    `image` may be an already-decoded PIL image of the source, so an ingest step
+    can reuse its decode instead of opening the file again.
+    """
+    edge = RENDITION_SIZES[size]
+    target = os.path.join(settings.MEDIA_ROOT, rendition_name(source_name, size))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+
+    if image is None:
+        source = Image.open(os.path.join(settings.MEDIA_ROOT, source_name))
+        # Let the JPEG decoder downscale while reading; much cheaper than a full decode
+        source.draft('RGB', (edge, edge))
+        opened = True
+    else:
+        source = image
+        opened = False
+
+    try:
+        rendition = ImageOps.exif_transpose(source)
+        rendition.thumbnail((edge, edge), Image.LANCZOS)
+        if rendition.mode not in ('RGB', 'RGBA') or (RENDITION_FORMAT == 'JPEG' and rendition.mode == 'RGBA'):
+            rendition = rendition.convert('RGB')
+
+        # Unique per writer: two requests building the same rendition never share a temp file
+        tmp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+        try:
+            rendition.save(tmp_path, RENDITION_FORMAT, quality=RENDITION_QUALITY)
+            os.replace(tmp_path, target)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    finally:
+        if opened:
+            source.close()
+
+    return target
+
+
+def build_all_renditions(source_name, image=None):
+    for size in RENDITION_SIZES:
+        build_rendition(source_name, size, image=image)
+
+
+def get_rendition(source_name, size):
+    """Absolute path of the cached rendition, creating it on first request."""
+    target = os.path.join(settings.MEDIA_ROOT, rendition_name(source_name, size))
+    if os.path.exists(target):
+        return target
+    return build_rendition(source_name, size)
+
+
+def invalidate_renditions(source_name):
+    """Remove every cached rendition of a source file (on soft-delete / restore)."""
+    for size in RENDITION_SIZES:
+        target = os.path.join(settings.MEDIA_ROOT, rendition_name(source_name, size))
+        if os.path.exists(target):
+            os.remove(target)
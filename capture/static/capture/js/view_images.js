@@ -1,7 +1,8 @@
 console.log("✅ view_image.js has loaded correctly!");
 
-function showFullImage(imageUrl, filename, timestamp, sizeKb, sizeMb, location, tag, imageId, userFullName) {
+function showFullImage(imageUrl, filename, timestamp, sizeKb, sizeMb, location, tag, imageId, userFullName, originalUrl) {
     document.getElementById('fullImage').src = imageUrl;
+    document.getElementById('fullImageLink').href = originalUrl || imageUrl;
     document.getElementById('imageFilename').textContent = filename;
     document.getElementById('imageTimestamp').textContent = timestamp;
     document.getElementById('imageSize').textContent = `${sizeKb} KB (${sizeMb} MB)`;
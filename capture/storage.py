@@ -0,0 +1,143 @@
+import hashlib
+import os
+import shutil
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import F
+
+
+def blob_name_for(digest):
+    """Relative path of the physical blob for a SHA-256 digest, e.g. blobs/ab/cd/abcd..."""
+    blob_dir = getattr(settings, 'MEDIA_BLOB_DIR', 'blobs')
+    return os.path.join(blob_dir, digest[:2], digest[2:4], digest).replace("\\", "/")
+
+
+class DedupFileSystemStorage(FileSystemStorage):
+    """
+    Content-addressed variant of FileSystemStorage.
+
+    Every upload is hashed with SHA-256 while it is spooled to disk and kept
+    once under MEDIA_BLOB_DIR. The name chosen by upload_to (UHID_<n>/...) is
+    a hard link to that blob, so .path, .url and existing views keep working
+    while identical bytes are stored only once. MediaBlob.ref_count tracks how
+    many logical names point at a blob; the blob is removed with the last one.
+    """
+
+    def _spool(self, content):
+        tmp_dir = self.path(os.path.join(getattr(settings, 'MEDIA_BLOB_DIR', 'blobs'), 'tmp'))
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+
+        sha = hashlib.sha256()
+        size = 0
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        with open(tmp_path, 'wb') as out:
+            for chunk in content.chunks():
+                sha.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+
+        return sha.hexdigest(), size, tmp_path
+
+    def _place(self, name, blob_path, tmp_path):
+        """
+        Make `name` point at the blob: a hard link, or a copy on filesystems
+        without them. The spooled `tmp_path` (if still there) recreates a blob
+        file that has disappeared. Returns the name actually used.
+        """
+        while True:
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if not os.path.exists(blob_path) and tmp_path and os.path.exists(tmp_path):
+                os.replace(tmp_path, blob_path)
+            try:
+                os.link(blob_path, full_path)
+                return name
+            except FileExistsError:
+                name = self.get_available_name(name)
+            except FileNotFoundError:
+                if not (tmp_path and os.path.exists(tmp_path)):
+                    raise
+                # Blob removed under us: recreate it from the spooled copy and link again
+            except OSError:
+                # Filesystem without hard links: a plain copy, still counted against the blob
+                shutil.copyfile(blob_path, full_path)
+                return name
+
+    def _save(self, name, content):
+        from capture.models import MediaBlob, MediaBlobLink
+
+        digest, size, tmp_path = self._spool(content)
+        blob_path = self.path(blob_name_for(digest))
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+
+        try:
+            with transaction.atomic():
+                # The locked blob row keeps release_blob_link() from removing the file while we link to it
+                while True:
+                    blob, _ = MediaBlob.objects.get_or_create(digest=digest, defaults={'size': size})
+                    blob = MediaBlob.objects.select_for_update().filter(pk=blob.pk).first()
+                    if blob is not None:
+                        break  # Otherwise it was released in the meantime: create it again
+
+                name = self._place(name, blob_path, tmp_path).replace("\\", "/")
+                MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+                MediaBlobLink.objects.update_or_create(name=name, defaults={'blob': blob})
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)  # Same bytes already stored
+
+        return name
+
+    def delete(self, name):
+        super().delete(name)
+        release_blob_link(name, storage=self)
+
+
+def release_blob_link(name, storage=None):
+    """Drop the logical name from its blob and remove the blob once nothing points at it."""
+    from capture.models import MediaBlob, MediaBlobLink
+
+    storage = storage or default_storage
+
+    with transaction.atomic():
+        link = MediaBlobLink.objects.select_for_update().filter(name=name).select_related('blob').first()
+        if not link:
+            return
+        blob = link.blob
+        link.delete()
+        MediaBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+        blob.refresh_from_db(fields=['ref_count'])
+
+        if blob.ref_count > 0:
+            return
+
+        # Removed while the row is still locked, so a concurrent save of the same bytes
+        # either links to the file before this or recreates it after
+        blob.delete()
+        blob_path = storage.path(blob_name_for(blob.digest))
+        if os.path.exists(blob_path):
+            os.remove(blob_path)
+
+
+def move_media(old_name, new_name):
+    """
+    Move a stored file to a new relative name (e.g. into the _deleted_files folder)
+    and keep the blob mapping pointing at it. Returns the normalized new name.
+    """
+    from capture.models import MediaBlobLink
+
+    old_path = os.path.join(settings.MEDIA_ROOT, old_name)
+    new_path = os.path.join(settings.MEDIA_ROOT, new_name)
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+
+    # Renaming a hard link never touches the bytes other rows point to
+    shutil.move(old_path, new_path)
+
+    new_name = os.path.relpath(new_path, settings.MEDIA_ROOT).replace("\\", "/")
+    MediaBlobLink.objects.filter(name=old_name.replace("\\", "/")).update(name=new_name)
+    return new_name
@@ -0,0 +1,175 @@
+"""
+Per-patient summaries for the UHID options pages: live counts per media kind
+and the newest item timestamp (PatientSummary), plus soft-deleted items per
+deleting user (PatientDeletedCount). Opening a patient reads one indexed row
+instead of running a COUNT per relation.
+
+catalog.tracked() hands the catalog rows from before and after each change
+to apply(), inside the same transaction as the change itself.
+`python manage.py verify_patient_summaries` compares both tables with the
+catalog and repairs any difference.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateTimeField, F, Max, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import MediaItem, PatientDeletedCount, PatientSummary
+
+
+# Catalog kind -> PatientSummary column
+KIND_COLUMNS = {
+    'captured_image': 'captured_images',
+    'uploaded_image': 'uploaded_images',
+    'uploaded_file': 'uploaded_files',
+    'other_file': 'other_files',
+}
+# Kinds counted on the deleted-items tile (converted PDFs are deleted with their image)
+DELETED_KINDS = ['captured_image', 'uploaded_image', 'uploaded_file']
+
+
+def contributions(rows):
+    """
+    (counts, deleted, latest) for catalog `rows` (dicts):
+    {(service, uhid): {column: n}}, {(service, uhid, user_id): n}, {(service, uhid): newest timestamp}.
+    """
+    counts = defaultdict(lambda: defaultdict(int))
+    deleted = defaultdict(int)
+    latest = {}
+    for row in rows:
+        patient = (row['service'], row['uhid'])
+        if not row['is_deleted']:
+            counts[patient][KIND_COLUMNS[row['kind']]] += 1
+        elif row['kind'] in DELETED_KINDS and row['deleted_by_id']:
+            deleted[patient + (row['deleted_by_id'],)] += 1
+        if patient not in latest or row['timestamp'] > latest[patient]:
+            latest[patient] = row['timestamp']
+    return counts, deleted, latest
+
+
+def bump_summary(patient, changes, stamp):
+    """Add `changes` ({column: delta}) to a patient's summary and raise last_activity to `stamp`."""
+    service, uhid = patient
+    updates = {column: F(column) + delta for column, delta in changes.items()}
+    if stamp:
+        stamp_value = Value(stamp, output_field=DateTimeField())
+        updates['last_activity'] = Greatest(Coalesce('last_activity', stamp_value), stamp_value)
+    if not updates:
+        return
+    if PatientSummary.objects.filter(service=service, uhid=uhid).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            PatientSummary.objects.create(service=service, uhid=uhid, last_activity=stamp, **changes)
+    except IntegrityError:
+        # Another request created it after our UPDATE found nothing
+        PatientSummary.objects.filter(service=service, uhid=uhid).update(**updates)
+
+
+def bump_deleted(key, delta):
+    service, uhid, user_id = key
+    lookup = {'service': service, 'uhid': uhid, 'user_id': user_id}
+    if PatientDeletedCount.objects.filter(**lookup).update(items=F('items') + delta):
+        return
+    try:
+        with transaction.atomic():
+            PatientDeletedCount.objects.create(items=delta, **lookup)
+    except IntegrityError:
+        PatientDeletedCount.objects.filter(**lookup).update(items=F('items') + delta)
+
+
+def apply(before_rows, after_rows):
+    old_counts, old_deleted, old_latest = contributions(before_rows)
+    new_counts, new_deleted, new_latest = contributions(after_rows)
+
+    for patient in set(old_counts) | set(new_counts) | set(new_latest):
+        old, new = old_counts.get(patient, {}), new_counts.get(patient, {})
+        changes = {}
+        for column in KIND_COLUMNS.values():
+            if new.get(column, 0) != old.get(column, 0):
+                changes[column] = new.get(column, 0) - old.get(column, 0)
+        stamp = new_latest.get(patient)
+        bump_summary(patient, changes, stamp if stamp != old_latest.get(patient) else None)
+
+    for key in set(old_deleted) | set(new_deleted):
+        delta = new_deleted.get(key, 0) - old_deleted.get(key, 0)
+        if delta:
+            bump_deleted(key, delta)
+
+
+def for_patient(service, uhid, user=None):
+    """
+    The summary of one patient in one query; an unsaved, empty one when the
+    patient has no media. With `user`, `deleted_by_user` is the number of
+    items that user deleted.
+    """
+    summaries = PatientSummary.objects.filter(service=service, uhid=uhid)
+    if user is not None:
+        deleted = PatientDeletedCount.objects.filter(service=service, uhid=uhid, user=user).values('items')
+        summaries = summaries.annotate(deleted_by_user=Coalesce(Subquery(deleted), 0))
+
+    summary = summaries.first() or PatientSummary(service=service, uhid=uhid)
+    if not hasattr(summary, 'deleted_by_user'):
+        summary.deleted_by_user = 0
+    return summary
+
+
+def expected_summaries():
+    """{(service, uhid): {column: value}} computed from the catalog."""
+    counts = {column: Count('id', filter=Q(kind=kind, is_deleted=False)) for kind, column in KIND_COLUMNS.items()}
+    rows = MediaItem.objects.values('service', 'uhid').annotate(last_activity=Max('timestamp'), **counts).order_by()
+    return {(row.pop('service'), row.pop('uhid')): row for row in rows.iterator()}
+
+
+def expected_deleted():
+    """{(service, uhid, user_id): n} computed from the catalog."""
+    rows = (
+        MediaItem.objects.filter(is_deleted=True, kind__in=DELETED_KINDS, deleted_by__isnull=False)
+        .values('service', 'uhid', 'deleted_by').annotate(n=Count('id')).order_by()
+    )
+    return {(row['service'], row['uhid'], row['deleted_by']): row['n'] for row in rows.iterator()}
+
+
+def verify(repair=True):
+    """Compare both tables with the catalog; with `repair`, make them match. Returns one line per difference."""
+    drift = []
+    columns = list(KIND_COLUMNS.values()) + ['last_activity']
+
+    with transaction.atomic():
+        stored = {(row.service, row.uhid): row for row in PatientSummary.objects.iterator()}
+        for patient, values in expected_summaries().items():
+            label = f"{patient[0]} UHID {patient[1]}"
+            summary = stored.pop(patient, None)
+            if summary is None:
+                drift.append(f"{label}: summary missing")
+                if repair:
+                    PatientSummary.objects.create(service=patient[0], uhid=patient[1], **values)
+                continue
+            wrong = [column for column in columns if getattr(summary, column) != values[column]]
+            if wrong:
+                drift.append(f"{label}: " + ", ".join(f"{column} {getattr(summary, column)} -> {values[column]}" for column in wrong))
+                if repair:
+                    for column in wrong:
+                        setattr(summary, column, values[column])
+                    summary.save(update_fields=wrong)
+        for (service, uhid), summary in stored.items():
+            drift.append(f"{service} UHID {uhid}: summary without media")
+            if repair:
+                summary.delete()
+
+        stored = {(row.service, row.uhid, row.user_id): row for row in PatientDeletedCount.objects.iterator()}
+        for key, n in expected_deleted().items():
+            label = f"{key[0]} UHID {key[1]} deleted by user {key[2]}"
+            counter = stored.pop(key, None)
+            if counter is None or counter.items != n:
+                drift.append(f"{label}: {counter.items if counter else 'missing'} -> {n}")
+                if repair:
+                    PatientDeletedCount.objects.update_or_create(service=key[0], uhid=key[1], user_id=key[2], defaults={'items': n})
+        for (service, uhid, user_id), counter in stored.items():
+            if counter.items:
+                drift.append(f"{service} UHID {uhid} deleted by user {user_id}: {counter.items} -> 0")
+            if repair:
+                counter.delete()
+
+    return drift
@@ -1,3 +1,599 @@
-from django.test import TestCase
+import csv
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import openpyxl
+from PIL import Image
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from capture import jobs, media, reconcile, transcode
+from capture.models import (
+    BackgroundJob, CapturedImage, ChunkedUploadSession, DeletedCapturedImage, ExportJob, IssueReport, MediaBlob, MediaBlobLink,
+    MediaItem, UploadedFile, UploadedImage,
+)
+from capture.storage import DedupFileSystemStorage, blob_name_for, move_media
+from echs import models as echs_models
+from filesys import spreadsheet
+from members.models import CustomTag, CustomUser
+
+
+class HotQueryIndexTests(TestCase):
+    """
+    The per-UHID / per-patient listing queries must be answered from an index.
+
+    Each query is EXPLAINed on a seeded dataset. On PostgreSQL sequential scans
+    are disabled for the transaction first, so a Seq Scan in the plan means no
+    usable index exists (not just that the planner preferred one for a small table).
+    """
+
+    PATIENTS = 40
+    ROWS_PER_PATIENT = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('explain@example.com', 'Explain Test', 'pw', is_approved=True)
+        now = timezone.now()
+
+        capture_rows = []
+        for uhid in range(1, cls.PATIENTS + 1):
+            for n in range(cls.ROWS_PER_PATIENT):
+                capture_rows.append(dict(user=cls.user, uhid=uhid, is_deleted=n == 0))
+        CapturedImage.objects.bulk_create(CapturedImage(image_path=f"UHID_{r['uhid']}/c.jpg", **r) for r in capture_rows)
+        UploadedImage.objects.bulk_create(UploadedImage(image_path=f"UHID_{r['uhid']}/u.jpg", **r) for r in capture_rows)
+        UploadedFile.objects.bulk_create(UploadedFile(file_path=f"UHID_{r['uhid']}/f.pdf", **r) for r in capture_rows)
+
+        patients = echs_models.EchsPatientMaster.objects.bulk_create(
+            echs_models.EchsPatientMaster(uhid=uhid, patient_name=f"Patient {uhid}", date_of_admission=now)
+            for uhid in range(1, cls.PATIENTS + 1)
+        )
+        cls.patient = patients[0]
+        echs_rows = []
+        for patient in patients:
+            for n in range(cls.ROWS_PER_PATIENT):
+                deleted = n == 0
+                echs_rows.append(dict(user=cls.user, patient=patient, is_deleted=deleted, deleted_by=cls.user if deleted else None))
+        echs_models.CapturedImage.objects.bulk_create(echs_models.CapturedImage(image_path="c.jpg", **r) for r in echs_rows)
+        echs_models.UploadedImage.objects.bulk_create(echs_models.UploadedImage(image_path="u.jpg", **r) for r in echs_rows)
+        echs_models.UploadedFile.objects.bulk_create(echs_models.UploadedFile(file_path="f.pdf", **r) for r in echs_rows)
+
+        cls.image_type = ContentType.objects.get_for_model(echs_models.CapturedImage)
+        echs_models.OtherUploadedFile.objects.bulk_create(
+            echs_models.OtherUploadedFile(file_path="o.pdf", content_type=cls.image_type, object_id=n, **r)
+            for n, r in enumerate(echs_rows)
+        )
+
+    def hot_queries(self):
+        uhid = 7
+        patient = self.patient
+        return {
+            "capture CapturedImage listing": CapturedImage.objects.filter(uhid=uhid, is_deleted=False).order_by('-timestamp'),
+            "capture UploadedImage listing": UploadedImage.objects.filter(uhid=uhid, is_deleted=False).order_by('-timestamp'),
+            "capture UploadedFile listing": UploadedFile.objects.filter(uhid=uhid, is_deleted=False).order_by('-timestamp'),
+            "echs CapturedImage listing": echs_models.CapturedImage.objects.filter(patient=patient, is_deleted=False).order_by('-timestamp'),
+            "echs UploadedImage listing": echs_models.UploadedImage.objects.filter(patient=patient, is_deleted=False).order_by('-timestamp'),
+            "echs UploadedFile listing": echs_models.UploadedFile.objects.filter(patient=patient, is_deleted=False).order_by('-timestamp'),
+            "echs OtherUploadedFile listing": echs_models.OtherUploadedFile.objects.filter(patient=patient, is_deleted=False).order_by('-timestamp'),
+            "echs deleted CapturedImage": echs_models.CapturedImage.objects.filter(patient=patient, is_deleted=True, deleted_by_id=self.user.id),
+            "echs deleted UploadedImage": echs_models.UploadedImage.objects.filter(patient=patient, is_deleted=True, deleted_by_id=self.user.id),
+            "echs deleted UploadedFile": echs_models.UploadedFile.objects.filter(patient=patient, is_deleted=True, deleted_by_id=self.user.id),
+            "echs linked OtherUploadedFile": echs_models.OtherUploadedFile.objects.filter(
+                content_type=self.image_type, object_id=3, is_deleted=False
+            ),
+        }
+
+    def full_scans(self, plan, table):
+        if connection.vendor == 'postgresql':
+            return re.findall(rf"Seq Scan on {table}\b", plan)
+        if connection.vendor == 'sqlite':
+            # "SEARCH <table> USING INDEX ..." is an index lookup; "SCAN <table>" reads every row
+            return re.findall(rf"\bSCAN {table}\b", plan)
+        self.skipTest(f"No plan check for {connection.vendor}")
+
+    def test_hot_queries_use_an_index(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+        for label, queryset in self.hot_queries().items():
+            with self.subTest(label):
+                plan = queryset.explain()
+                self.assertFalse(
+                    self.full_scans(plan, queryset.model._meta.db_table),
+                    f"{label} scans {queryset.model._meta.db_table} sequentially:\n{plan}",
+                )
+
+
+class DedupStorageTests(TestCase):
+    """Reference counting of DedupFileSystemStorage blobs, on a throwaway MEDIA_ROOT."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.storage = DedupFileSystemStorage(location=self.media_root)
+
+    def blob_path(self, blob):
+        return self.storage.path(blob_name_for(blob.digest))
+
+    def test_identical_saves_share_one_blob(self):
+        first = self.storage.save('UHID_1/a.jpg', ContentFile(b'same bytes'))
+        second = self.storage.save('UHID_2/b.jpg', ContentFile(b'same bytes'))
+        self.storage.save('UHID_2/c.jpg', ContentFile(b'other bytes'))
+
+        blob = MediaBlob.objects.get(links__name=first)
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(MediaBlob.objects.count(), 2)
+        self.assertTrue(os.path.samefile(self.storage.path(first), self.blob_path(blob)))
+        self.assertTrue(os.path.samefile(self.storage.path(second), self.blob_path(blob)))
+        self.assertEqual(os.listdir(self.storage.path('blobs/tmp')), [])
+
+    def test_taken_name_gets_a_new_name_and_its_own_link(self):
+        first = self.storage.save('UHID_1/a.jpg', ContentFile(b'same bytes'))
+        second = self.storage.save('UHID_1/a.jpg', ContentFile(b'same bytes'))
+
+        self.assertNotEqual(first, second)
+        self.assertEqual(MediaBlob.objects.get().ref_count, 2)
+        self.assertEqual(set(MediaBlobLink.objects.values_list('name', flat=True)), {first, second})
+
+    def test_soft_delete_move_keeps_the_blob(self):
+        name = self.storage.save('UHID_1/a.jpg', ContentFile(b'same bytes'))
+        moved = move_media(name, f'_deleted_files/{name}')
+
+        self.assertEqual(moved, '_deleted_files/UHID_1/a.jpg')
+        self.assertFalse(os.path.exists(self.storage.path(name)))
+        link = MediaBlobLink.objects.get()
+        self.assertEqual((link.name, link.blob.ref_count), (moved, 1))
+        with open(self.storage.path(moved), 'rb') as f:
+            self.assertEqual(f.read(), b'same bytes')
+
+    def test_hard_delete_removes_the_blob_with_its_last_name(self):
+        first = self.storage.save('UHID_1/a.jpg', ContentFile(b'same bytes'))
+        second = self.storage.save('UHID_2/b.jpg', ContentFile(b'same bytes'))
+        blob = MediaBlob.objects.get()
+
+        self.storage.delete(first)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(os.path.exists(self.blob_path(blob)))
+
+        self.storage.delete(second)
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(MediaBlobLink.objects.exists())
+        self.assertFalse(os.path.exists(self.blob_path(blob)))
+
+    def test_copy_without_hard_links_is_still_counted(self):
+        self.storage.save('UHID_1/a.jpg', ContentFile(b'same bytes'))
+        with mock.patch('capture.storage.os.link', side_effect=OSError(1, 'Operation not permitted')):
+            copied = self.storage.save('UHID_2/b.jpg', ContentFile(b'same bytes'))
+
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertTrue(MediaBlobLink.objects.filter(name=copied, blob=blob).exists())
+        self.assertFalse(os.path.samefile(self.storage.path(copied), self.blob_path(blob)))
+
+        self.storage.delete(copied)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+
+    def test_vanished_blob_is_recreated(self):
+        self.storage.save('UHID_1/a.jpg', ContentFile(b'same bytes'))
+        blob = MediaBlob.objects.get()
+        link = os.link
+
+        def blob_removed_first(src, dst):
+            if blob_removed_first.pending:
+                blob_removed_first.pending = False
+                os.remove(src)
+                raise FileNotFoundError(src)
+            return link(src, dst)
+        blob_removed_first.pending = True
+
+        with mock.patch('capture.storage.os.link', side_effect=blob_removed_first):
+            name = self.storage.save('UHID_2/b.jpg', ContentFile(b'same bytes'))
+
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertTrue(os.path.samefile(self.storage.path(name), self.blob_path(blob)))
+
+
+@mock.patch('capture.chunked.CHUNK_SIZE', 4)
+class ChunkedUploadTests(TestCase):
+    """The start / part / status / commit protocol of capture/chunked.py, with 4-byte parts."""
+
+    DATA = b'%PDF-1.4 chunked body'  # 21 bytes -> 6 parts
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root, CHUNKED_UPLOAD_DIR=os.path.join(self.media_root, 'sessions'))
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.user = CustomUser.objects.create_user('chunks@example.com', 'Chunk Test', 'pw', is_approved=True)
+        self.tag = CustomTag.objects.create(name='Discharge Summary', abbreviation='DS')
+        self.client.force_login(self.user)
+
+    def start(self):
+        response = self.client.post(reverse('capture:chunked_upload_start'), {
+            'uhid': 251, 'custom-tag-select': self.tag.id, 'kind': 'pdf',
+            'file_name': 'summary.pdf', 'file_type': 'application/pdf', 'file_size': len(self.DATA),
+        })
+        data = response.json()
+        self.assertTrue(data['success'], data)
+        self.assertEqual(data['total_chunks'], 6)
+        return data['session_id']
+
+    def send_part(self, session_id, index):
+        part = self.DATA[index * 4:(index + 1) * 4]
+        response = self.client.post(
+            reverse('capture:chunked_upload_part', args=[session_id, index]), part,
+            content_type='application/octet-stream', HTTP_X_CHUNK_SHA256=hashlib.sha256(part).hexdigest(),
+        )
+        return response.json()
+
+    def received(self, session_id):
+        return self.client.get(reverse('capture:chunked_upload_status', args=[session_id])).json()['received']
+
+    def commit(self, session_id):
+        return self.client.post(reverse('capture:chunked_upload_commit', args=[session_id])).json()
+
+    def test_parts_sent_out_of_order_assemble_in_order(self):
+        session_id = self.start()
+        for index in [5, 2, 0, 4, 1, 3]:
+            self.assertTrue(self.send_part(session_id, index)['success'])
+
+        self.assertTrue(self.commit(session_id)['success'])
+        upload = UploadedFile.objects.get(uhid=251)
+        with upload.file_path.open('rb') as f:
+            self.assertEqual(f.read(), self.DATA)
+
+    def test_bad_checksum_is_rejected(self):
+        session_id = self.start()
+        response = self.client.post(
+            reverse('capture:chunked_upload_part', args=[session_id, 0]), self.DATA[:4],
+            content_type='application/octet-stream', HTTP_X_CHUNK_SHA256='0' * 64,
+        )
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(self.received(session_id), [])
+
+    def test_interrupted_upload_resumes_from_status(self):
+        session_id = self.start()
+        for index in [0, 1, 3]:
+            self.send_part(session_id, index)
+
+        result = self.commit(session_id)
+        self.assertFalse(result['success'])
+        self.assertIn('Missing parts: [2, 4, 5]', result['error'])
+        self.assertEqual(self.received(session_id), [0, 1, 3])
+
+        for index in set(range(6)) - set(self.received(session_id)):
+            self.send_part(session_id, index)
+        self.assertTrue(self.commit(session_id)['success'])
+        self.assertEqual(UploadedFile.objects.filter(uhid=251).count(), 1)
+
+    def test_second_commit_creates_nothing(self):
+        session_id = self.start()
+        for index in range(6):
+            self.send_part(session_id, index)
+
+        self.assertTrue(self.commit(session_id)['success'])
+        second = self.commit(session_id)
+        self.assertFalse(second['success'])
+        self.assertIn('Upload session not found or already completed.', second['error'])
+        self.assertEqual(UploadedFile.objects.filter(uhid=251).count(), 1)
+        self.assertEqual(ChunkedUploadSession.objects.get().status, 'committed')
+
+
+@mock.patch('capture.media.MEDIA_SERVE_BACKEND', 'python')
+class MediaAccessTests(TestCase):
+    """/media/ is served only to users who may see the row that owns the file."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.owner = CustomUser.objects.create_user('owner@example.com', 'Owner', 'pw', is_approved=True)
+        self.other = CustomUser.objects.create_user('other@example.com', 'Other', 'pw', is_approved=True)
+        self.admin = CustomUser.objects.create_superuser('admin@example.com', 'Admin', 'pw')
+
+    def get_as(self, user, name):
+        self.client.force_login(user)
+        return self.client.get(f"/media/{name}")
+
+    def assert_access(self, name, allowed, denied):
+        for user in allowed:
+            with self.subTest(user=user.email, expected=200):
+                self.assertEqual(self.get_as(user, name).status_code, 200)
+        for user in denied:
+            with self.subTest(user=user.email, expected=403):
+                self.assertEqual(self.get_as(user, name).status_code, 403)
+
+    def test_active_file_is_open_to_every_user(self):
+        image = CapturedImage.objects.create(user=self.owner, uhid=251, image_path=ContentFile(b'jpeg bytes', name='a.jpg'))
+        response = self.get_as(self.other, image.image_path.name)
+        self.assertEqual(b''.join(response.streaming_content), b'jpeg bytes')
+        self.assert_access(image.image_path.name, [self.owner, self.other, self.admin], [])
+
+    def test_rows_missing_from_the_catalog_are_still_found(self):
+        # As on a database that predates the catalog, before backfill_media_catalog has run
+        image = CapturedImage.objects.create(user=self.owner, uhid=251, image_path=ContentFile(b'jpeg bytes', name='a.jpg'))
+        pdf = echs_models.UploadedFile.objects.create(
+            user=self.owner, patient=echs_models.EchsPatientMaster.objects.create(uhid=251, patient_name='P', date_of_admission=timezone.now()),
+            file_path=ContentFile(b'%PDF', name='b.pdf'),
+        )
+        MediaItem.objects.all().delete()
+
+        self.assertEqual(media.find_owner(image.image_path.name), image)
+        self.assertEqual(media.find_owner(pdf.file_path.name), pdf)
+        self.assert_access(image.image_path.name, [self.owner, self.admin], [])
+
+    def test_soft_deleted_file_only_for_who_deleted_it(self):
+        image = CapturedImage.objects.create(user=self.owner, uhid=251, image_path=ContentFile(b'jpeg bytes', name='a.jpg'))
+        image.is_deleted, image.deleted_by = True, self.owner
+        image.save()
+        self.assert_access(image.image_path.name, [self.owner, self.admin], [self.other])
+
+    def test_issue_attachment_only_for_its_reporter(self):
+        issue = IssueReport.objects.create(user=self.owner, description='Broken', attachment=ContentFile(b'%PDF', name='shot.pdf'))
+        self.assertTrue(issue.attachment.name.startswith('issue_attachments/'))
+        self.assert_access(issue.attachment.name, [self.owner, self.admin], [self.other])
+
+    def test_archive_rows_only_for_superusers(self):
+        name = 'UHID_251/UHID_251_captured_gps_images/gone.jpg'
+        os.makedirs(os.path.join(self.media_root, os.path.dirname(name)))
+        with open(os.path.join(self.media_root, name), 'wb') as f:
+            f.write(b'jpeg bytes')
+        DeletedCapturedImage.objects.create(original_id=9, user=self.owner, uhid=251, image_path=name, deleted_by=self.owner)
+        self.assert_access(name, [self.admin], [self.owner, self.other])
+
+    def test_file_without_owner_is_not_found(self):
+        name = 'UHID_251/stray.jpg'
+        os.makedirs(os.path.join(self.media_root, 'UHID_251'))
+        with open(os.path.join(self.media_root, name), 'wb') as f:
+            f.write(b'stray')
+        self.assertEqual(self.get_as(self.admin, name).status_code, 404)
+
+
+class FileResponseTests(TestCase):
+    """Range and conditional requests of the pure-Python media backend."""
+
+    DATA = bytes(range(256)) * 4
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        self.addCleanup(os.remove, self.path)
+        with os.fdopen(handle, 'wb') as f:
+            f.write(self.DATA)
+        self.factory = RequestFactory()
+
+    def respond(self, **headers):
+        return media.file_response(self.factory.get('/media/x', headers=headers), self.path, 'application/octet-stream')
+
+    def test_full_file(self):
+        response = self.respond()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Length'], str(len(self.DATA)))
+        self.assertEqual(b''.join(response.streaming_content), self.DATA)
+
+    def test_ranges(self):
+        for header, start, end in (('bytes=10-19', 10, 19), ('bytes=1000-', 1000, 1023), ('bytes=-4', 1020, 1023), ('bytes=1020-5000', 1020, 1023)):
+            with self.subTest(header):
+                response = self.respond(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f"bytes {start}-{end}/{len(self.DATA)}")
+                self.assertEqual(b''.join(response.streaming_content), self.DATA[start:end + 1])
+
+    def test_unsatisfiable_range(self):
+        response = self.respond(Range='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f"bytes */{len(self.DATA)}")
+
+    def test_multi_range_and_stale_if_range_get_the_full_file(self):
+        self.assertEqual(self.respond(Range='bytes=0-1,5-6').status_code, 200)
+        self.assertEqual(self.respond(Range='bytes=0-1', **{'If-Range': '"stale"'}).status_code, 200)
+
+    def test_conditional_requests(self):
+        first = self.respond()
+        self.assertEqual(self.respond(**{'If-None-Match': first['ETag']}).status_code, 304)
+        self.assertEqual(self.respond(**{'If-Modified-Since': first['Last-Modified']}).status_code, 304)
+        self.assertEqual(self.respond(**{'If-None-Match': '"other"'}).status_code, 200)
+        self.assertEqual(self.respond(Range='bytes=0-1', **{'If-Range': first['ETag']}).status_code, 206)
+
+
+@mock.patch('filesys.spreadsheet.ROWS_PER_WRITE', 3)
+class SpreadsheetStreamTests(TestCase):
+    """filesys/spreadsheet.py output read back the way users open it."""
+
+    HEADERS = ['Name', 'UHID', 'Size', 'Approved', 'Note', 'File']
+
+    def rows(self, count):
+        for n in range(count):
+            yield [f"Patient {n}", n, n / 2, n % 2 == 0, None, spreadsheet.Link(f"https://example.com/media/{n}.jpg", "Click Here")]
+
+    def test_xlsx_round_trip(self):
+        data = b''.join(spreadsheet.stream_xlsx('Images: all/[2025]', self.HEADERS, self.rows(10)))
+        workbook = openpyxl.load_workbook(io.BytesIO(data))
+        sheet = workbook.active
+
+        self.assertEqual(sheet.title, 'Images  all  2025 ')
+        values = list(sheet.iter_rows(values_only=True))
+        self.assertEqual(list(values[0]), self.HEADERS)
+        self.assertEqual(len(values), 11)
+        self.assertEqual(values[5][:5], ('Patient 4', 4, 2, True, None))
+        self.assertEqual(values[2][2], 0.5)
+        self.assertEqual(values[5][5], '=HYPERLINK("https://example.com/media/4.jpg","Click Here")')
+
+    def test_xlsx_drops_characters_xml_cannot_hold(self):
+        rows = [['bell\x07 & <tag> "quoted"', 1, 2, False, 'x' * 40000, 'plain']]
+        data = b''.join(spreadsheet.stream_xlsx('Odd', self.HEADERS, rows))
+        row = list(openpyxl.load_workbook(io.BytesIO(data)).active.iter_rows(min_row=2, values_only=True))[0]
+        self.assertEqual(row[0], 'bell & <tag> "quoted"')
+        self.assertEqual(len(row[4]), spreadsheet.MAX_CELL_CHARS)
+
+    def test_csv_rows_and_formula_guard(self):
+        rows = [
+            ['=HYPERLINK("http://evil")', '+1 (555) 123-4567', '-42', '@SUM(A1)', None, spreadsheet.Link('https://example.com/a.jpg', 'Click Here')],
+        ] + [[f"Patient {n}", n, '', '', '', ''] for n in range(7)]
+        data = b''.join(spreadsheet.stream_csv(self.HEADERS, rows))
+
+        self.assertTrue(data.startswith('\ufeff'.encode()))
+        parsed = list(csv.reader(io.StringIO(data.decode('utf-8-sig'))))
+        self.assertEqual(parsed[0], self.HEADERS)
+        self.assertEqual(parsed[1], ["'=HYPERLINK(\"http://evil\")", '+1 (555) 123-4567', '-42', "'@SUM(A1)", '', 'https://example.com/a.jpg'])
+        self.assertEqual(len(parsed), 9)
+        self.assertEqual(parsed[-1][:2], ['Patient 6', '6'])
+
+
+class BackgroundJobTests(TestCase):
+    """enqueue() keeps one active job per task and target, and job_status only shows a user their own jobs."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user('jobs@example.com', 'Jobs', 'pw', is_approved=True)
+        cls.other = CustomUser.objects.create_user('nosy@example.com', 'Nosy', 'pw', is_approved=True)
+
+    def test_enqueue_returns_the_active_job(self):
+        first = jobs.enqueue('capture.integrity.run_integrity_job', payload={'fix_sizes': True})
+        self.assertEqual(jobs.enqueue('capture.integrity.run_integrity_job'), first)
+        self.assertNotEqual(jobs.enqueue('capture.integrity.run_integrity_job', self.user), first)
+
+        BackgroundJob.objects.filter(id=first.id).update(status='done')
+        self.assertNotEqual(jobs.enqueue('capture.integrity.run_integrity_job'), first)
+
+    def test_database_keeps_one_active_job_per_target(self):
+        for target in (None, self.user):
+            job = jobs.enqueue('some.task', target)
+            with self.subTest(target=target), self.assertRaises(IntegrityError), transaction.atomic():
+                BackgroundJob.objects.create(task='some.task', content_type=job.content_type, object_id=job.object_id)
+
+    def test_lost_race_returns_the_winning_job(self):
+        winner = jobs.enqueue('some.task', self.user)
+        with mock.patch('django.db.models.query.QuerySet.first', side_effect=[None, winner]):
+            self.assertEqual(jobs.enqueue('some.task', self.user), winner)
+        self.assertEqual(BackgroundJob.objects.filter(task='some.task').count(), 1)
+
+    def test_other_integrity_errors_are_raised(self):
+        with mock.patch.object(BackgroundJob.objects, 'create', side_effect=IntegrityError('NOT NULL constraint failed')):
+            with self.assertRaises(IntegrityError):
+                jobs.enqueue('some.task', self.user)
+
+    def test_job_status_only_for_the_jobs_owner(self):
+        cover = jobs.enqueue('echs.services.build_cover_pdf', payload={'user_id': self.user.id})
+        export = ExportJob.objects.create(user=self.user, export_type='media:captured_images', format='csv')
+        export_job = jobs.enqueue('capture.export_jobs.run_export_job', export)
+        admin = CustomUser.objects.create_superuser('boss@example.com', 'Boss', 'pw')
+
+        for job in (cover, export_job):
+            url = reverse('echs:job_status', args=[job.id])
+            for user, status in ((self.user, 200), (admin, 200), (self.other, 404)):
+                with self.subTest(job=job.task, user=user.email):
+                    self.client.force_login(user)
+                    self.assertEqual(self.client.get(url).status_code, status)
+
+
+class ReconcileRepairTests(TestCase):
+    """reconcile.repair() only reports a relink that actually updated the row."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = CustomUser.objects.create_user('reconcile@example.com', 'Reconcile', 'pw', is_approved=True)
+
+    def moved_upload(self, uhid, stored_name):
+        """An UploadedFile whose file now sits in another folder of its UHID; the row stores `stored_name`. Returns (row, old name, new name)."""
+        upload = UploadedFile.objects.create(user=self.user, uhid=uhid, file_path=ContentFile(b'%PDF-1.4', name='scan.pdf'))
+        moved = f"UHID_{uhid}/moved/{os.path.basename(upload.file_path.name)}"
+        os.makedirs(os.path.join(self.media_root, os.path.dirname(moved)))
+        os.rename(upload.file_path.path, os.path.join(self.media_root, moved))
+        UploadedFile.objects.filter(pk=upload.pk).update(file_path=stored_name(upload.file_path.name))
+        return upload, upload.file_path.name, moved
+
+    def diffed_state(self):
+        conn = reconcile.open_state(os.path.join(self.media_root, 'state.sqlite3'))
+        self.addCleanup(conn.close)
+        reconcile.load_disk(conn, workers=1, log=lambda message: None)
+        reconcile.load_rows(conn, log=lambda message: None)
+        reconcile.diff(conn, workers=1)
+        return conn
+
+    def test_relinks_rows_stored_with_backslashes(self):
+        upload, _, moved = self.moved_upload(251, lambda name: name.replace('/', '\\'))
+        actions = reconcile.repair(self.diffed_state(), log=lambda message: None)
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.file_path.name, moved)
+        self.assertEqual(actions[('orphan', moved)], f"relinked from capture.UploadedFile #{upload.pk}")
+
+    def test_row_changed_after_the_diff_is_flagged_not_relinked(self):
+        upload, old_name, moved = self.moved_upload(252, lambda name: name)
+        conn = self.diffed_state()
+        UploadedFile.objects.filter(pk=upload.pk).update(file_path='UHID_252/elsewhere.pdf')
+
+        actions = reconcile.repair(conn, log=lambda message: None)
+
+        upload.refresh_from_db()
+        self.assertEqual(upload.file_path.name, 'UHID_252/elsewhere.pdf')
+        self.assertIsNotNone(upload.missing_since)
+        self.assertNotIn(('orphan', moved), actions)
+        self.assertEqual(actions[('missing', old_name)], 'flagged missing_since')
+
+
+class TranscodeTests(TestCase):
+    """Images already in the target format are only kept as they are when there is nothing to rotate or strip."""
+
+    POLICY = {'format': 'WEBP', 'quality': 80}
+
+    def webp(self, tags=None, gps=None):
+        """A 40x20 WEBP carrying the EXIF `tags` ({tag: value}) and GPS block `gps`."""
+        exif = Image.Exif()
+        exif.update(tags or {})
+        if gps:
+            exif.get_ifd(0x8825).update(gps)
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 20), 'red').save(buffer, 'WEBP', exif=exif.tobytes() if tags or gps else b'')
+        buffer.seek(0)
+        return buffer
+
+    def encode(self, source, policy=None):
+        result = transcode.transcode_image(source, policy or self.POLICY)
+        if result is not None:
+            self.addCleanup(result.close)
+        return result
+
+    def test_clean_webp_is_kept(self):
+        self.assertIsNone(self.encode(self.webp()))
+
+    def test_rotated_webp_is_turned_upright(self):
+        result = self.encode(self.webp({0x0112: 6}))  # Orientation: rotate 90° clockwise
+        with Image.open(result) as output:
+            self.assertEqual(output.size, (20, 40))
+            self.assertNotIn(0x0112, output.getexif())
+        self.assertEqual((result.image_width, result.image_height), (20, 40))
+
+    def test_webp_metadata_is_stripped(self):
+        result = self.encode(self.webp({0x010f: 'Camera Maker', 0x0131: 'Editor 1.0'}))
+        with Image.open(result) as output:
+            self.assertEqual(dict(output.getexif()), {})
+
+    def test_gps_alone_is_kept_by_keep_gps_policies(self):
+        self.assertIsNone(self.encode(self.webp(gps={1: 'N'}), {**self.POLICY, 'keep_gps': True}))
+        self.assertIsNotNone(self.encode(self.webp(gps={1: 'N'})))
@@ -0,0 +1,213 @@
+"""
+Re-encode captured images to a smaller format before they are stored.
+
+The format and quality come from TRANSCODE_POLICY, looked up by the image's
+CustomTag.type. EXIF orientation is applied to the pixels, and all metadata
+except the ICC profile (and the GPS block, for policies with keep_gps) is
+dropped. If the re-encoded file is not smaller and the original needed
+neither rotating nor stripping, the original is kept as it is; the same goes,
+without encoding, for an image already in the target format.
+
+Used at ingest by the capture views and, for rows stored before this
+existed, by `python manage.py transcode_images`.
+"""
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils import timezone
+from PIL import Image, ImageOps, features
+
+from .storage import move_media
+
+
+TRANSCODE_ENABLED = getattr(settings, 'TRANSCODE_ENABLED', True)
+TRANSCODE_POLICY = getattr(settings, 'TRANSCODE_POLICY', {'default': {'format': 'WEBP', 'quality': 80}})
+TRANSCODE_KEEP_ORIGINAL_DAYS = getattr(settings, 'TRANSCODE_KEEP_ORIGINAL_DAYS', 0)
+TRANSCODE_ORIGINALS_DIR = getattr(settings, 'TRANSCODE_ORIGINALS_DIR', 'originals')
+
+FORMAT_EXTENSIONS = {'WEBP': 'webp', 'AVIF': 'avif', 'JPEG': 'jpg'}
+FORMAT_CONTENT_TYPES = {'WEBP': 'image/webp', 'AVIF': 'image/avif', 'JPEG': 'image/jpeg'}
+
+EXIF_ORIENTATION = 0x0112
+EXIF_GPS_IFD = 0x8825
+
+
+def policy_for(tag):
+    """Encoding policy for a CustomTag (or None); a policy of None means "store as uploaded"."""
+    tag_type = tag.type if tag else None
+    if tag_type in TRANSCODE_POLICY:
+        return TRANSCODE_POLICY[tag_type]
+    return TRANSCODE_POLICY.get('default')
+
+
+def output_format(policy):
+    image_format = policy.get('format', 'WEBP').upper()
+    if image_format == 'AVIF' and not features.check('avif'):
+        print("⚠️ Pillow has no AVIF support, using WEBP")
+        image_format = 'WEBP'
+    return image_format
+
+
+def transcode_image(source, policy, image=None):
+    """
+    Re-encode `source` (a path or binary file object) following `policy`.
+    `image` may be the source already opened with Pillow (the ingest step's decode).
+
+    Returns a TemporaryUploadedFile with the new image, or None when the source
+    should be stored unchanged (upright, no metadata to strip, and not smaller
+    after re-encoding or already in the target format).
+    The returned file carries the format, dimensions and SHA-256 of what was
+    written (see stored_fields()).
+    """
+    if not isinstance(source, str):
+        source.seek(0, 2)
+        source_size = source.tell()
+        source.seek(0)
+    else:
+        source_size = os.path.getsize(source)
+
+    if image is not None:
+        return _encode(image, policy, source_size)
+    with Image.open(source) as image:
+        return _encode(image, policy, source_size)
+
+
+def strips_metadata(image, exif, policy):
+    """Whether encoding under `policy` drops metadata the image carries (EXIF other than kept GPS, XMP)."""
+    kept = {EXIF_GPS_IFD} if policy.get('keep_gps') else set()
+    return bool(set(exif) - kept) or bool(image.info.get('xmp'))
+
+
+def _encode(image, policy, source_size):
+    image_format = output_format(policy)
+    exif = image.getexif()
+    upright = exif.get(EXIF_ORIENTATION, 1) == 1
+    # Already what the policy would write: upright and nothing to strip
+    clean = upright and not strips_metadata(image, exif, policy)
+    if image.format == image_format and not policy.get('max_edge') and clean:
+        # Same format: re-encoding would only lose quality
+        return None
+
+    icc_profile = image.info.get('icc_profile')
+
+    kept_exif = Image.Exif()
+    if policy.get('keep_gps'):
+        gps = exif.get_ifd(EXIF_GPS_IFD)
+        if gps:
+            kept_exif[EXIF_GPS_IFD] = gps
+
+    image.load()
+    pixels = ImageOps.exif_transpose(image)
+    if policy.get('max_edge'):
+        pixels.thumbnail((policy['max_edge'], policy['max_edge']), Image.LANCZOS)
+    if pixels.mode not in ('RGB', 'RGBA', 'L'):
+        pixels = pixels.convert('RGBA' if 'A' in pixels.mode or 'transparency' in pixels.info else 'RGB')
+    if image_format == 'JPEG' and pixels.mode == 'RGBA':
+        background = Image.new('RGB', pixels.size, 'white')
+        background.paste(pixels, mask=pixels.getchannel('A'))
+        pixels = background
+
+    extension = FORMAT_EXTENSIONS[image_format]
+    upload = TemporaryUploadedFile(f"{uuid.uuid4().hex}.{extension}", FORMAT_CONTENT_TYPES[image_format], 0, None)
+    save_options = {'quality': policy.get('quality', 80)}
+    if icc_profile:
+        save_options['icc_profile'] = icc_profile
+    if len(kept_exif):
+        save_options['exif'] = kept_exif.tobytes()
+    pixels.save(upload, image_format, **save_options)
+
+    upload.size = upload.tell()
+    if upload.size >= source_size and clean:
+        upload.close()
+        return None
+
+    sha = hashlib.sha256()
+    for chunk in upload.chunks():
+        sha.update(chunk)
+    upload.content_hash = sha.hexdigest()
+    upload.image_format = image_format
+    upload.image_width, upload.image_height = pixels.size  # Already upright
+
+    upload.seek(0)
+    return upload
+
+
+def stored_fields(transcoded):
+    """Image model field values describing a file returned by transcode_image()."""
+    return {
+        "image_size": transcoded.size,
+        "image_width": transcoded.image_width,
+        "image_height": transcoded.image_height,
+        "image_format": transcoded.image_format,
+        "content_hash": transcoded.content_hash,
+    }
+
+
+def transcode_capture(image_file, tag, image=None):
+    """
+    Ingest step for a freshly captured image: return the file to store (the
+    transcoded one, or `image_file` itself when transcoding is off or does not help).
+    An image Pillow cannot read is passed through for the model to reject or keep.
+    """
+    if not TRANSCODE_ENABLED:
+        return image_file
+    policy = policy_for(tag)
+    if not policy:
+        return image_file
+
+    try:
+        transcoded = transcode_image(image_file, policy, image=image)
+    except OSError as e:  # Includes Pillow's UnidentifiedImageError
+        print(f"[WARN] Could not transcode {getattr(image_file, 'name', image_file)}: {e}")
+        image_file.seek(0)
+        return image_file
+
+    if transcoded is None:
+        image_file.seek(0)
+        return image_file
+
+    print(f"🗜️ Transcoded capture {image_file.size} -> {transcoded.size} bytes")
+    return transcoded
+
+
+def original_name(name, now=None):
+    """Where a replaced original is kept: originals/<YYYY-MM-DD>/<its old name>."""
+    day = (now or timezone.now()).strftime('%Y-%m-%d')
+    return f"{TRANSCODE_ORIGINALS_DIR}/{day}/{name}"
+
+
+def retire_original(name, keep_days=TRANSCODE_KEEP_ORIGINAL_DAYS):
+    """Move a replaced file under the originals folder, or delete it when originals are not kept."""
+    if keep_days:
+        return move_media(name, original_name(name))
+    default_storage.delete(name)
+    return None
+
+
+def purge_originals(keep_days=TRANSCODE_KEEP_ORIGINAL_DAYS):
+    """Delete kept originals older than the retention window. Returns (files, bytes) removed."""
+    root = os.path.join(settings.MEDIA_ROOT, TRANSCODE_ORIGINALS_DIR)
+    if not os.path.isdir(root):
+        return 0, 0
+
+    cutoff = (timezone.now() - timedelta(days=keep_days)).strftime('%Y-%m-%d')
+    files = size = 0
+    for day in sorted(os.listdir(root)):
+        if day >= cutoff:
+            continue
+        for dirpath, _, filenames in os.walk(os.path.join(root, day), topdown=False):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                size += os.path.getsize(path)
+                default_storage.delete(os.path.relpath(path, settings.MEDIA_ROOT).replace("\\", "/"))
+                files += 1
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                pass
+    return files, size
@@ -12,15 +12,23 @@ urlpatterns = [
 
     # Processing the logic capture Images & Upload Files 
     path('cap_pic/', views.capture_images, name='image_capture'),  
+    path('cap_pic/raw/', views.capture_images_raw, name='image_capture_raw'),  # Binary body, metadata in headers
     path('up_file/', views.upload_file, name='upload_file'), 
     path('up_file_image2pdf/', views.upload_file_image2pdf, name='upload_file_image2pdf'),  
     path('up_file_pdf2pdf/', views.upload_file_pdf2pdf, name='upload_file_pdf2pdf'),  
     path('up_file_image2image/', views.upload_file_image2image, name='upload_file_image2image'), 
     path('up_file_multi_image2image/', views.upload_file_multi_image2image, name='upload_file_multi_image2image'), 
 
+    # Chunked, resumable uploads
+    path('chunked-upload/start/', views.chunked_upload_start, name='chunked_upload_start'),
+    path('chunked-upload/<uuid:session_id>/part/<int:index>/', views.chunked_upload_part, name='chunked_upload_part'),
+    path('chunked-upload/<uuid:session_id>/status/', views.chunked_upload_status, name='chunked_upload_status'),
+    path('chunked-upload/<uuid:session_id>/commit/', views.chunked_upload_commit, name='chunked_upload_commit'),
+
 
     # Logic for Image & File View
     path('view-images-home/<str:uhid>/', views.view_images_home_uhid, name='view_images_home'),
+    path('image-rendition/<str:model>/<int:id>/<str:size>/', views.image_rendition, name='image_rendition'),
     path('view-files-home/<str:uhid>/', views.view_files_home_uhid, name='view_files_home'),
 
 
@@ -34,6 +42,7 @@ urlpatterns = [
     path('uploaded-images-info/', views.uploaded_images_view, name='uploaded_images_info'),
     path('captured-images-info/', views.captured_images_view, name='captured_images_info'),
     path('all-files-images-info/', views.all_files_images_view, name='all_file_image_info'),
+    path('media-table-data/<str:table>/', views.media_table_data, name='media_table_data'),
 
     
     # Excel Export for Uploaded Files
@@ -41,6 +50,10 @@ urlpatterns = [
     path('export-uploaded-images/', views.export_uploaded_images_excel, name='export_uploaded_images_excel'),
     path('export-captured-images/', views.export_captured_images_excel, name='export_captured_images_excel'),
     path('export-all-files-images/', views.export_all_files_excel, name='export_all_files_images_excel'),
+    path('export-jobs/', views.export_jobs_view, name='export_jobs'),
+    path('export-jobs/submit/', views.submit_export_job, name='submit_export_job'),
+    path('export-jobs/<int:export_id>/status/', views.export_job_status, name='export_job_status'),
+    path('export-jobs/<int:export_id>/download/', views.download_export_job, name='download_export_job'),
 
     # Add this new path for the issue reporting form:
     path('report-issue/', views.report_issue, name='report_issue'),
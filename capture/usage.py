@@ -0,0 +1,99 @@
+"""
+Usage counters (UsageCounter): live items and bytes per day, app, kind,
+uploader and tag, so dashboards sum a small rollup instead of counting
+every media table.
+
+The catalog (capture/catalog.py) wraps each change of its rows in
+catalog.tracked(): the rows are read before and after, and apply() adds the
+difference of their contributions to the counters in the same transaction.
+That covers ingest, soft delete, restore and the maintenance commands that
+call sync_rows(). `python manage.py rebuild_usage_counters` recomputes the
+table from the catalog.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import MediaItem, UsageCounter
+
+
+KEY_FIELDS = ['service', 'kind', 'user_id', 'custom_tag_id']
+
+
+def day_of(stamp):
+    return timezone.localdate(stamp) if timezone.is_aware(stamp) else stamp.date()
+
+
+def contributions(rows):
+    """{(day, service, kind, user_id, custom_tag_id): [items, bytes]} of the live rows among catalog `rows` (dicts)."""
+    totals = defaultdict(lambda: [0, 0])
+    for row in rows:
+        if row['is_deleted']:
+            continue
+        key = (day_of(row['timestamp']),) + tuple(row[field] for field in KEY_FIELDS)
+        totals[key][0] += 1
+        totals[key][1] += row['size'] or 0
+    return totals
+
+
+def bump(key, items, size):
+    """Add `items` / `size` bytes (either may be negative) to one counter, creating it if needed."""
+    day, service, kind, user_id, custom_tag_id = key
+    lookup = {'day': day, 'service': service, 'kind': kind, 'user_id': user_id, 'custom_tag_id': custom_tag_id}
+    changes = {'items': F('items') + items, 'bytes': F('bytes') + size}
+    if UsageCounter.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            UsageCounter.objects.create(items=items, bytes=size, **lookup)
+    except IntegrityError:
+        # Another request created it after our UPDATE found nothing
+        UsageCounter.objects.filter(**lookup).update(**changes)
+
+
+def apply(before_rows, after_rows):
+    before, after = contributions(before_rows), contributions(after_rows)
+    for key in set(before) | set(after):
+        old_items, old_size = before.get(key, (0, 0))
+        new_items, new_size = after.get(key, (0, 0))
+        if new_items != old_items or new_size != old_size:
+            bump(key, new_items - old_items, new_size - old_size)
+
+
+def rebuild():
+    """Recompute every counter from the catalog. Returns the number of counters written."""
+    rows = (
+        MediaItem.objects.filter(is_deleted=False)
+        .annotate(day=TruncDate('timestamp'))
+        .values('day', *KEY_FIELDS)
+        .annotate(item_count=Count('id'), byte_total=Coalesce(Sum('size'), Value(0)))
+        .order_by()
+    )
+    with transaction.atomic():
+        UsageCounter.objects.all().delete()
+        counters = UsageCounter.objects.bulk_create(
+            (UsageCounter(items=row.pop('item_count'), bytes=row.pop('byte_total'), **row) for row in rows.iterator()),
+            batch_size=1000,
+        )
+    return len(counters)
+
+
+def dashboard_totals(service):
+    """
+    Items of one app from the counters, in three grouped queries:
+    {'kinds': {kind: n}, 'departments': {dept_id: {kind: n}}, 'users': {user_id: n}, 'tags': {tag_id: n}}.
+    """
+    counters = UsageCounter.objects.filter(service=service).order_by()
+    totals = {'kinds': defaultdict(int), 'departments': defaultdict(lambda: defaultdict(int)), 'users': {}, 'tags': {}}
+
+    for row in counters.values('user__department', 'kind').annotate(n=Sum('items')):
+        totals['kinds'][row['kind']] += row['n']
+        if row['user__department'] is not None:
+            totals['departments'][row['user__department']][row['kind']] += row['n']
+
+    totals['users'] = {row['user']: row['n'] for row in counters.values('user').annotate(n=Sum('items'))}
+    totals['tags'] = {row['custom_tag']: row['n'] for row in counters.values('custom_tag').annotate(n=Sum('items'))}
+    return totals
@@ -3,25 +3,29 @@ from django.views.decorators.csrf import csrf_protect
 from django.core.files.base import ContentFile
 from django.shortcuts import get_object_or_404, get_list_or_404, render, redirect # ✅ Ensure both are imported
 from django.forms import ValidationError
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404, StreamingHttpResponse
 from django.db.models import Count, Max
-from .models import CapturedImage, DeletedCapturedImage, UploadedFile, UploadedImage, IssueReport
-import zipfile
+from django.core.paginator import Paginator
+from .models import CapturedImage, DeletedCapturedImage, UploadedFile, UploadedImage, IssueReport, ExportJob
+from .storage import move_media
+from . import archives, catalog, chunked, export_jobs, exports, ingest, listing, media, renditions, summaries
 import base64
 import uuid
 import os
 import traceback  # ✅ Import for debugging
-import shutil
 from django.utils.timezone import now
 from django.conf import settings
+from members import refdata
 from members.models import CustomTag
+from filesys.archive import field_entries
+from filesys.layout import uhid_dir
 from itertools import chain
 from operator import attrgetter
-import openpyxl
 from datetime import datetime
 from django.utils import timezone
 from django.contrib import messages
-from .forms import IssueReportForm, IssueAdminUpdateForm
+from django.urls import reverse
+from .forms import IssueReportForm, IssueAdminUpdateForm, IssueFilterForm, MediaFilterForm
 from django.core.mail import send_mail
 from django.core.exceptions import ValidationError
 import traceback
@@ -59,7 +63,7 @@ def capture_images(request):
     uhid = request.GET.get('uhid')
 
     # Fetch all available custom tags
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
 
     if request.method == "POST":
         image_data = request.POST.get("image_data")
@@ -91,17 +95,23 @@ def capture_images(request):
             # Handle the custom tag
             tag_obj = None
             if custom_tag:
-                tag_obj = CustomTag.objects.get(id=custom_tag)
+                tag_obj = refdata.get(CustomTag, custom_tag, include_inactive=True)
 
-            CapturedImage.objects.create(
-                user=request.user,
-                uhid=uhid_int,
-                image_path=image_file,
-                custom_tag=tag_obj,
-                image_size=image_size,
-                latitude=latitude,
-                longitude=longitude
+            # One read of the bytes: real type, metadata, hash, transcode and thumbnail
+            ingested = ingest.ingest_image(image_file, ingest.RAW_IMAGE_TYPES, tag=tag_obj, transcode_capture=True)
+            try:
+                captured_image = CapturedImage.objects.create(
+                    user=request.user,
+                    uhid=uhid_int,
+                    image_path=ingested.file,
+                    custom_tag=tag_obj,
+                    latitude=latitude,
+                    longitude=longitude,
+                    **ingested.fields
                 )
+                ingested.build_renditions(captured_image.image_path.name)
+            finally:
+                ingested.close()
 
             print("Image successfully saved to database.")
             return JsonResponse({"success": True, "message": "Image uploaded successfully!"})
@@ -116,12 +126,75 @@ def capture_images(request):
 
     return render(request, "capture/capture_images.html", {"uhid": uhid, "custom_tags": custom_tags})
 
+
+@login_required
+def capture_images_raw(request):
+    """
+    Binary capture ingest: the image arrives as the raw request body (or a multipart
+    "image" part) and is streamed to disk; UHID, tag and lat/long come in X- headers
+    or small form fields. The base64 form POST in capture_images is kept for older clients.
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "POST required."}, status=405)
+
+    try:
+        meta = ingest.capture_metadata(request)
+        print(f"Received UHID: {meta['uhid']}")
+        print(f"Received Custom Tag: {meta['custom_tag']}")
+        print(f"Received Latitude: {meta['latitude']}")
+        print(f"Received Longitude: {meta['longitude']}")
+
+        # Ensure UHID is a valid integer and within range
+        uhid_int = int(meta["uhid"])
+        if uhid_int > 2147483647 or uhid_int < -2147483648:  # PostgreSQL Integer Range
+            raise ValidationError("UHID is too large or invalid!")
+
+        # Handle the custom tag
+        tag_obj = None
+        if meta["custom_tag"]:
+            try:
+                tag_obj = refdata.get(CustomTag, meta["custom_tag"])
+            except CustomTag.DoesNotExist:
+                raise ValidationError("Invalid custom tag selected.")
+
+        image_file = ingest.capture_upload(request, MAX_FILE_SIZE)
+        print(f"Received Image Size: {image_file.size}")
+
+        ingested = None
+        try:
+            ingested = ingest.ingest_image(image_file, ingest.RAW_IMAGE_TYPES, tag=tag_obj, transcode_capture=True)
+            captured_image = CapturedImage.objects.create(
+                user=request.user,
+                uhid=uhid_int,
+                image_path=ingested.file,
+                custom_tag=tag_obj,
+                latitude=meta["latitude"],
+                longitude=meta["longitude"],
+                **ingested.fields
+            )
+            ingested.build_renditions(captured_image.image_path.name)
+        finally:
+            image_file.close()
+            if ingested:
+                ingested.close()
+
+        print("Image successfully saved to database.")
+        return JsonResponse({"success": True, "message": "Image uploaded successfully!"})
+
+    except (TypeError, ValueError):
+        return JsonResponse({"success": False, "error": "UHID must be a valid number!"})
+    except ValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)})
+    except Exception:
+        print("❌ ERROR OCCURRED:", traceback.format_exc())
+        return JsonResponse({"success": False, "error": "Something went wrong. Please try again."})
+
 MAX_FILE_SIZE = 45 * 1024 * 1024  # 45 MB limit
 
 @login_required
 def upload_file(request):
     uhid = request.GET.get("uhid")
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
 
     if request.method == "POST":
         custom_tag_id = request.POST.get("custom-tag-select")  
@@ -163,7 +236,7 @@ def upload_file(request):
             tag_obj = None
             if custom_tag_id:
                 try:
-                    tag_obj = CustomTag.objects.get(id=custom_tag_id, is_deleted=False)
+                    tag_obj = refdata.get(CustomTag, custom_tag_id)
                 except CustomTag.DoesNotExist:
                     raise ValidationError("Invalid custom tag selected.")
 
@@ -195,61 +268,58 @@ def upload_file(request):
 @login_required
 def upload_file_image2pdf(request):
     uhid = request.GET.get("uhid")
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
 
     if request.method == "POST":
         custom_tag_id = request.POST.get("custom-tag-select")
-        uploaded_file = request.FILES.get("file")
+        # Page images arrive as "files" (one per page); a single ready-made PDF may still come as "file"
+        uploaded_files = request.FILES.getlist("files") or request.FILES.getlist("file")
 
         if not custom_tag_id:
             return JsonResponse({"success": False, "error": "Custom tag is required!"})
 
-        if not uploaded_file:
+        if not uploaded_files:
             return JsonResponse({"success": False, "error": "No file uploaded!"})
 
-        file_size = uploaded_file.size
-        file_type = uploaded_file.content_type
-
         print(f"Received UHID (from GET): {uhid}")
-        print(f"Received File: {uploaded_file}")
+        print(f"Received Files: {[f.name for f in uploaded_files]}")
         print(f"Received Custom Tag: {custom_tag_id}")
-        print(f"File Size: {file_size} bytes")
-        print(f"File Type: {file_type}")
 
         try:
             uhid_int = int(uhid)
             if uhid_int > 2147483647 or uhid_int < -2147483648:
                 raise ValidationError("UHID is too large or invalid!")
 
-            if file_size > MAX_FILE_SIZE:
-                raise ValidationError(f"File size exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit!")
-
-            allowed_file_types = [
-                'application/pdf',
-                'image/jpeg',
-                'image/jpg',
-                'image/png'
-            ]
-            if file_type not in allowed_file_types:
-                raise ValidationError("Unsupported file type! Allowed types: PDF, JPEG, PNG.")
-
             # ✅ Lookup tag by ID if present
             tag_obj = None
             if custom_tag_id:
                 try:
-                    tag_obj = CustomTag.objects.get(id=custom_tag_id, is_deleted=False)
+                    tag_obj = refdata.get(CustomTag, custom_tag_id)
                 except CustomTag.DoesNotExist:
                     raise ValidationError("Invalid custom tag selected.")
 
-            # Save the uploaded file to the database
-            UploadedFile.objects.create(
-                user=request.user,
-                uhid=uhid_int,
-                file_path=uploaded_file,
-                custom_tag=tag_obj,
-                file_size=file_size,
-                file_type=file_type
-            )
+            if len(uploaded_files) == 1 and uploaded_files[0].content_type == 'application/pdf':
+                # Already a PDF (older clients convert in the browser): store it as is
+                pdf_file = uploaded_files[0]
+                if pdf_file.size > MAX_FILE_SIZE:
+                    raise ValidationError(f"File size exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit!")
+            else:
+                # One PDF page per image, JPEGs embedded without re-encoding
+                pdf_file = ingest.images_to_pdf_upload(uploaded_files, MAX_FILE_SIZE)
+
+            print(f"📄 PDF ready: {pdf_file.size} bytes from {len(uploaded_files)} file(s)")
+
+            try:
+                UploadedFile.objects.create(
+                    user=request.user,
+                    uhid=uhid_int,
+                    file_path=pdf_file,
+                    custom_tag=tag_obj,
+                    file_size=pdf_file.size,
+                    file_type="application/pdf"
+                )
+            finally:
+                pdf_file.close()
 
             print("✅ File successfully uploaded.")
             return JsonResponse({"success": True, "message": "File uploaded successfully!"})
@@ -271,7 +341,7 @@ def upload_file_image2pdf(request):
 @login_required
 def upload_file_pdf2pdf(request):
     uhid = request.GET.get("uhid")
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
 
     if request.method == "POST":
         custom_tag_id = request.POST.get("custom-tag-select")
@@ -295,7 +365,7 @@ def upload_file_pdf2pdf(request):
 
         # Validate custom tag
         try:
-            tag_obj = CustomTag.objects.get(id=custom_tag_id, is_deleted=False)
+            tag_obj = refdata.get(CustomTag, custom_tag_id)
         except CustomTag.DoesNotExist:
             return JsonResponse({"success": False, "error": "Invalid custom tag selected."})
 
@@ -358,7 +428,7 @@ def upload_file_pdf2pdf(request):
 @login_required
 def upload_file_image2image(request):
     uhid = request.GET.get("uhid")
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
 
     if request.method == "POST":
         custom_tag_id = request.POST.get("custom-tag-select")
@@ -389,25 +459,27 @@ def upload_file_image2image(request):
             if file_size > MAX_FILE_SIZE:
                 raise ValidationError(f"File size exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit!")
 
-            # Validate file type
-            allowed_file_types = ['image/jpeg', 'image/jpg', 'image/png']
-            if file_type not in allowed_file_types:
-                raise ValidationError("Unsupported file type! Only JPEG and PNG images are allowed.")
-
             # Validate custom tag
             try:
-                tag_obj = CustomTag.objects.get(id=custom_tag_id, is_deleted=False)
+                tag_obj = refdata.get(CustomTag, custom_tag_id)
             except CustomTag.DoesNotExist:
                 raise ValidationError("Invalid custom tag selected.")
 
+            # Type from the file's own bytes; dimensions, hash and EXIF recorded in the same read
+            ingested = ingest.ingest_image(uploaded_file, ingest.IMAGE_UPLOAD_TYPES)
+
             # Save the uploaded file
-            UploadedImage.objects.create(
-                user=request.user,
-                uhid=uhid_int,
-                image_path=uploaded_file,
-                custom_tag=tag_obj,
-                image_size=file_size,
-            )
+            try:
+                uploaded_image = UploadedImage.objects.create(
+                    user=request.user,
+                    uhid=uhid_int,
+                    image_path=ingested.file,
+                    custom_tag=tag_obj,
+                    **ingested.fields
+                )
+                ingested.build_renditions(uploaded_image.image_path.name)
+            finally:
+                ingested.close()
 
             print("✅ Image successfully uploaded.")
             return JsonResponse({"success": True, "message": "Image uploaded successfully!"})
@@ -428,7 +500,7 @@ def upload_file_image2image(request):
 @login_required
 def upload_file_multi_image2image(request):
     uhid = request.GET.get("uhid")
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
 
     if request.method == "POST":
         custom_tag_id = request.POST.get("custom-tag-select")
@@ -444,7 +516,7 @@ def upload_file_multi_image2image(request):
 
         # Attempt to fetch/validate the tag object once
         try:
-            tag_obj = CustomTag.objects.get(id=custom_tag_id, is_deleted=False)
+            tag_obj = refdata.get(CustomTag, custom_tag_id)
         except CustomTag.DoesNotExist:
             return JsonResponse({"success": False, "error": "Invalid custom tag selected."})
 
@@ -471,19 +543,21 @@ def upload_file_multi_image2image(request):
                 if file_size > MAX_FILE_SIZE:
                     raise ValidationError(f"\"{file_name}\" exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit!")
 
-                # Validate each file’s MIME type
-                allowed_file_types = ['image/jpeg', 'image/jpg', 'image/png']
-                if file_type not in allowed_file_types:
-                    raise ValidationError(f"\"{file_name}\" unsupported type! Only JPEG/PNG allowed.")
+                # Each file's type from its own bytes (not the browser's MIME type), metadata in the same read
+                ingested = ingest.ingest_image(uploaded_file, ingest.IMAGE_UPLOAD_TYPES)
 
                 # Save this file to the UploadedImage model
-                UploadedImage.objects.create(
-                    user=request.user,
-                    uhid=uhid_int,
-                    image_path=uploaded_file,  # Django will assign a unique name under your upload_to
-                    custom_tag=tag_obj,
-                    image_size=file_size,
-                )
+                try:
+                    uploaded_image = UploadedImage.objects.create(
+                        user=request.user,
+                        uhid=uhid_int,
+                        image_path=ingested.file,  # Django will assign a unique name under your upload_to
+                        custom_tag=tag_obj,
+                        **ingested.fields
+                    )
+                    ingested.build_renditions(uploaded_image.image_path.name)
+                finally:
+                    ingested.close()
 
                 print(f"✅ \"{file_name}\" uploaded successfully.")
                 results.append({"file": file_name, "success": True})
@@ -521,41 +595,130 @@ def upload_file_multi_image2image(request):
     })
 
 
+# ---------------------------------------------------------------
+# Chunked, resumable uploads (large PDFs / multi-image batches)
+# ---------------------------------------------------------------
+
+@login_required
+def chunked_upload_start(request):
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "POST required."}, status=405)
+
+    try:
+        uhid_int, tag_obj, kind, file_name, file_type, file_size = chunked.validate_start(request.POST, MAX_FILE_SIZE)
+
+        session = chunked.start_session(
+            request.user, "capture", kind, uhid_int, tag_obj,
+            file_name, file_size, file_type, request.POST.get("sha256", "")
+        )
 
+        print(f"Chunked upload started: {session}")
+        return JsonResponse({
+            "success": True,
+            "session_id": str(session.session_id),
+            "chunk_size": session.chunk_size,
+            "total_chunks": session.total_chunks,
+        })
+
+    except ValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)})
+    except Exception:
+        print("❌ ERROR OCCURRED:", traceback.format_exc())
+        return JsonResponse({"success": False, "error": "Something went wrong. Please try again."})
 
 
 @login_required
-def view_images_home_uhid(request, uhid):
-    """Retrieve and display images from both CapturedImage and UploadedImage models for a specific UHID."""
+def chunked_upload_part(request, session_id, index):
+    if request.method not in ("POST", "PUT"):
+        return JsonResponse({"success": False, "error": "POST or PUT required."}, status=405)
 
-    # Fetch and optimize related fields
-    captured_images = CapturedImage.objects.filter(uhid=uhid, is_deleted=False).select_related(
-        'user__designation', 'user__department'
-    ).order_by('-timestamp')
+    try:
+        session = chunked.get_open_session(request.user, "capture", session_id)
+        chunked.write_part(session, index, request, request.headers.get("X-Chunk-SHA256"))
+        return JsonResponse({"success": True, "part": index})
 
-    uploaded_images = UploadedImage.objects.filter(uhid=uhid, is_deleted=False).select_related(
-        'user__designation', 'user__department'
-    ).order_by('-timestamp')
+    except ValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)})
+    except Exception:
+        print("❌ ERROR OCCURRED:", traceback.format_exc())
+        return JsonResponse({"success": False, "error": "Something went wrong. Please try again."})
 
-    # Add metadata and tag image type
-    for image in captured_images:
-        image.source_type = 'captured'
 
-    for image in uploaded_images:
-        image.source_type = 'uploaded'
+@login_required
+def chunked_upload_status(request, session_id):
+    try:
+        session = chunked.get_open_session(request.user, "capture", session_id)
+    except ValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({
+        "success": True,
+        "chunk_size": session.chunk_size,
+        "total_chunks": session.total_chunks,
+        "received": chunked.received_parts(session),
+    })
+
+
+@login_required
+def chunked_upload_commit(request, session_id):
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "POST required."}, status=405)
+
+    try:
+        # Session locked until the row exists, so a repeated commit cannot create it twice
+        with chunked.committing(request.user, "capture", session_id) as session:
+            assembled = chunked.assemble(session)
+
+            try:
+                if session.kind == "pdf":
+                    UploadedFile.objects.create(
+                        user=request.user,
+                        uhid=session.uhid,
+                        file_path=assembled,
+                        custom_tag=session.custom_tag,
+                        file_size=session.file_size,
+                        file_type=session.file_type
+                    )
+                else:
+                    ingested = ingest.ingest_image(assembled, ingest.IMAGE_UPLOAD_TYPES)
+                    uploaded_image = UploadedImage.objects.create(
+                        user=request.user,
+                        uhid=session.uhid,
+                        image_path=ingested.file,
+                        custom_tag=session.custom_tag,
+                        **ingested.fields
+                    )
+                    ingested.build_renditions(uploaded_image.image_path.name)
+                    ingested.close()
+            finally:
+                assembled.close()
+
+        print(f"✅ \"{session.file_name}\" uploaded successfully (chunked).")
+        return JsonResponse({"success": True, "message": "File uploaded successfully!"})
+
+    except ValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)})
+    except Exception:
+        print("❌ ERROR OCCURRED:", traceback.format_exc())
+        return JsonResponse({"success": False, "error": "Something went wrong. Please try again."})
+
 
-    # Merge and sort
-    all_images = sorted(
-        chain(captured_images, uploaded_images),
-        key=attrgetter('timestamp'),
-        reverse=True
-    )
+
+
+
+@login_required
+def view_images_home_uhid(request, uhid):
+    """Retrieve and display images from both CapturedImage and UploadedImage models for a specific UHID."""
+
+    # One indexed query on the media catalog, a page at a time
+    page_obj = Paginator(catalog.image_listing('capture', uhid), catalog.CATALOG_PAGE_SIZE).get_page(request.GET.get('page'))
+    all_images = page_obj.object_list
 
     for image in all_images:
         # Calculate size in KB and MB
         try:
-            if image.image_size:
-                size = int(image.image_size)
+            if image.size:
+                size = int(image.size)
                 image.image_size_kb = round(size / 1024, 2)
                 image.image_size_mb = round(image.image_size_kb / 1024, 2)
             else:
@@ -564,13 +727,14 @@ def view_images_home_uhid(request, uhid):
         except Exception as e:
             image.image_size_kb = None
             image.image_size_mb = None
-            print(f"[ERROR] Invalid image size for image ID {image.id}: {e}")
+            print(f"[ERROR] Invalid image size for image ID {image.object_id}: {e}")
 
-        # Extract filename
-        image.filename = os.path.basename(image.image_path.name)
+        # Thumbnail for the grid, medium preview for the full view; the original stays linked
+        image.thumb_url = reverse('capture:image_rendition', args=[image.source_type, image.object_id, 'thumb'])
+        image.preview_url = reverse('capture:image_rendition', args=[image.source_type, image.object_id, 'medium'])
 
         # Add location info for captured images
-        if isinstance(image, CapturedImage):
+        if image.kind == 'captured_image':
             image.location = f"{image.latitude}, {image.longitude}" if image.latitude and image.longitude else "Unknown Location"
         else:
             image.location = "Uploaded (no location)"
@@ -586,7 +750,7 @@ def view_images_home_uhid(request, uhid):
 
         # 🔍 Debug Logging
         print("=" * 50)
-        print(f"Image ID: {image.id} | Source: {image.source_type.upper()}")
+        print(f"Image ID: {image.object_id} | Source: {image.source_type.upper()}")
         print(f"User: {image.user_full_name}")
         print(f"Designation: {image.user_designation or ''} ({image.user_designation_other or ''})")
         print(f"Department: {image.user_department or ''} ({image.user_department_other or ''})")
@@ -597,20 +761,74 @@ def view_images_home_uhid(request, uhid):
 
     return render(request, 'capture/view_images.html', {
         'uhid': uhid,
-        'images': all_images
+        'images': all_images,
+        'page_obj': page_obj
     })
 
 
 
 
+@login_required
+def image_rendition(request, model, id, size):
+    """Serve a cached thumbnail/preview of a captured or uploaded image, building it on first request."""
+    if model == "captured":
+        obj_model = CapturedImage
+    elif model == "uploaded":
+        obj_model = UploadedImage
+    else:
+        raise Http404("Invalid model.")
+
+    if size not in renditions.RENDITION_SIZES:
+        raise Http404("Invalid size.")
+
+    image = get_object_or_404(obj_model, id=id)
+    if not image.image_path:
+        raise Http404("Image not found.")
+
+    # Same rule as the full-size file (soft-deleted images only for whoever deleted them)
+    if not media.can_access(request.user, image):
+        print(f"[WARN] {request.user} denied access to {size} rendition of image ID {image.id}")
+        return HttpResponse("You do not have permission to view this file.", status=403)
+
+    try:
+        path = renditions.get_rendition(image.image_path.name, size)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Could not build {size} rendition for image ID {image.id}: {e}")
+        raise Http404("Image not found.")
+
+    # The cache key changes whenever the source changes, so browsers may keep it
+    return media.file_response(request, path, renditions.rendition_content_type(), cache_control="private, max-age=604800")
+
+
+@login_required
+def serve_media(request, name):
+    """
+    Serve a file under MEDIA_URL after checking the logged-in user against the row that owns it.
+    The transfer itself is handed to nginx / Apache when MEDIA_SERVE_BACKEND says so.
+    """
+    owner = media.find_owner(name)
+    if owner is None:
+        raise Http404("File not found.")
+
+    if not media.can_access(request.user, owner):
+        print(f"[WARN] {request.user} denied access to {name}")
+        return HttpResponse("You do not have permission to view this file.", status=403)
+
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    if not os.path.isfile(path):
+        raise Http404("File not found.")
+
+    return media.media_response(request, name, path)
+
+
 def view_files_home_uhid(request, uhid):
     # Fetch uploaded files for the specified UHID, ordered by timestamp
     files = UploadedFile.objects.filter(uhid=uhid, is_deleted=False).order_by('-timestamp')
 
     for file in files:
-        # Calculate sizes
-        file.file_size_kb = round(file.file_path.size / 1024, 2)  # Convert to KB
-        file.file_size_mb = round(file.file_path.size / (1024 * 1024), 2)  # Convert to MB
+        # Sizes from the stored column; listings never stat the file (media_integrity keeps it right)
+        file.file_size_kb = round(file.file_size / 1024, 2) if file.file_size is not None else None  # Convert to KB
+        file.file_size_mb = round(file.file_size / (1024 * 1024), 2) if file.file_size is not None else None  # Convert to MB
 
         # Convert timestamp to local timezone and format nicely: "12-May-2025 10:15 AM"
         local_timestamp = timezone.localtime(file.timestamp)
@@ -621,10 +839,8 @@ def view_files_home_uhid(request, uhid):
         print(f"🌐 File URL: {file.file_path.url}")
         print(f"📂 File Path: {file.file_path.path}")
         
-        # Check if file actually exists on disk
-        if os.path.exists(file.file_path.path):
-            print(f"✅ File exists: {file.file_path.path}")
-        else:
+        # Missing files are flagged by the background integrity check
+        if file.missing_since:
             print(f"❌ Missing file: {file.file_path.path}")
 
     return render(request, 'capture/view_files.html', {
@@ -650,24 +866,9 @@ def download_all_images(request, uhid):
         reverse=True
     )
 
-    # Prepare ZIP response
+    # Served from the per-UHID archive cache; only new images get compressed
     zip_filename = f"UHID_{uhid}_images.zip"
-    response = HttpResponse(content_type="application/zip")
-    response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
-
-    with zipfile.ZipFile(response, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for image in all_images:
-            if image.image_path:  # Ensure path exists
-                try:
-                    file_path = image.image_path.path  # Absolute path
-                    filename = os.path.basename(file_path) # Original filename
-
-                    # Write the file to the ZIP archive with its original name
-                    zip_file.write(file_path, arcname=filename)
-                except Exception as e:
-                    print(f"[ERROR] Could not add image ID {image.id} to ZIP: {e}")
-
-    return response
+    return archives.cached_zip_response(request, "capture", uhid, "images", field_entries(all_images, 'image_path'), zip_filename)
 
 
 @login_required
@@ -677,18 +878,7 @@ def download_all_files(request, uhid):
     files = get_list_or_404(UploadedFile, uhid=uhid, is_deleted=False)  # Get all files for UHID
 
     zip_filename = f"UHID_{uhid}_files.zip"
-    response = HttpResponse(content_type="application/zip")
-    response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
-
-    with zipfile.ZipFile(response, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for file in files:
-            if file.file_path:  # Ensure file exists
-                file_path = file.file_path.path  # Absolute file path
-                filename = os.path.basename(file_path)  # Retain original filename
-                
-                zip_file.write(file_path, filename)
-
-    return response
+    return archives.cached_zip_response(request, "capture", uhid, "files", field_entries(files, 'file_path'), zip_filename)
 
 
 def uhid_options(request):
@@ -696,17 +886,10 @@ def uhid_options(request):
     if not uhid:
         return redirect('uhid_capture_camera')  # fallback
 
-    # Count captured images for UHID
-    captured_count = CapturedImage.objects.filter(uhid=uhid, is_deleted=False).count()
-
-    # Count uploaded images for UHID
-    uploaded_image_count = UploadedImage.objects.filter(uhid=uhid, is_deleted=False).count()
-
-    # Total image count = captured + uploaded
-    image_count = captured_count + uploaded_image_count
-
-    # Count uploaded non-image files (if applicable)
-    file_count = UploadedFile.objects.filter(uhid=uhid, is_deleted=False).count()
+    # Counts come from the per-patient summary row (capture/summaries.py)
+    summary = summaries.for_patient('capture', uhid)
+    image_count = summary.image_count
+    file_count = summary.uploaded_files
 
     return render(request, 'capture/uhid_options.html', {
         'uhid': uhid,
@@ -732,35 +915,21 @@ def delete_image(request, model, id):
         messages.warning(request, "Image already deleted.")
         return redirect(request.META.get("HTTP_REFERER", "/"))
 
+    # Cached thumbnails are keyed on the current path, drop them before it changes
+    if image.image_path:
+        renditions.invalidate_renditions(image.image_path.name)
+
     # Move physical file
     if image.image_path and os.path.exists(image.image_path.path):
 
-        old_path = image.image_path.path
-
-        deleted_folder = os.path.join(
-            settings.MEDIA_ROOT,
-            f"UHID_{image.uhid}",
-            f"UHID_{image.uhid}_deleted_files"
-        )
-
-        os.makedirs(deleted_folder, exist_ok=True)
-
-        new_path = os.path.join(
-            deleted_folder,
-            os.path.basename(old_path)
-        )
-
-        shutil.move(old_path, new_path)
-
-        image.image_path.name = os.path.relpath(
-            new_path,
-            settings.MEDIA_ROOT
+        deleted_name = os.path.join(
+            uhid_dir(image.uhid),
+            f"UHID_{image.uhid}_deleted_files",
+            os.path.basename(image.image_path.name)
         )
 
-        relative_path = os.path.relpath(new_path, settings.MEDIA_ROOT)
-        relative_path = relative_path.replace("\\", "/")   # <<< FIX HERE
-
-        image.image_path.name = relative_path
+        # Moves the file (a hard link when dedup is on) and keeps its blob mapping
+        image.image_path.name = move_media(image.image_path.name, deleted_name)
 
     # Soft delete
     image.is_deleted = True
@@ -785,29 +954,14 @@ def delete_uploaded_pdf(request, id):
     # FILE MOVE LOGIC
     # -----------------------------
     if file.file_path and os.path.exists(file.file_path.path):
-        old_path = file.file_path.path
-
-        # New deleted folder
-        deleted_folder = os.path.join(
-            settings.MEDIA_ROOT,
-            f"UHID_{file.uhid}",
-            f"UHID_{file.uhid}_deleted_files"
+        deleted_name = os.path.join(
+            uhid_dir(file.uhid),
+            f"UHID_{file.uhid}_deleted_files",
+            os.path.basename(file.file_path.name)
         )
 
-        os.makedirs(deleted_folder, exist_ok=True)
-
-        new_path = os.path.join(
-            deleted_folder,
-            os.path.basename(old_path)
-        )
-
-        shutil.move(old_path, new_path)
-
-        # Convert OS path → relative path → URL format
-        relative_path = os.path.relpath(new_path, settings.MEDIA_ROOT)
-        relative_path = relative_path.replace("\\", "/")   # <<< FIX HERE
-
-        file.file_path.name = relative_path
+        # Moves the file (a hard link when dedup is on) and keeps its blob mapping
+        file.file_path.name = move_media(file.file_path.name, deleted_name)
 
 
 
@@ -824,405 +978,199 @@ def delete_uploaded_pdf(request, id):
 
 
 
+def render_media_table(request, table):
+    """The table page itself is only the filter form; rows come from media_table_data."""
+    config = listing.MEDIA_TABLES[table]
+    return render(request, 'capture/media_table.html', {
+        'title': config['title'],
+        'export_url': reverse(config['export_url']),
+        'data_url': reverse('capture:media_table_data', args=[table]),
+        'form': MediaFilterForm(request.GET or None),
+        'show_type': config['kind'] is None,
+        'export_type': f"media:{table}",
+    })
+
+
 @login_required
 @user_passes_test(is_super_user)
 def uploaded_files_view(request):
-    files = UploadedFile.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-    return render(request, 'capture/uploaded_files_table.html', {'files': files})
+    return render_media_table(request, 'uploaded_files')
 
 @login_required
 @user_passes_test(is_super_user)
 def uploaded_images_view(request):
-    files = UploadedImage.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-    return render(request, 'capture/uploaded_images_table.html', {'files': files})
+    return render_media_table(request, 'uploaded_images')
 
 @login_required
 @user_passes_test(is_super_user)
 def captured_images_view(request):
-    files = CapturedImage.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-    return render(request, 'capture/captured_images_table.html', {'files': files})
+    return render_media_table(request, 'captured_images')
 
 
 @login_required
 @user_passes_test(is_super_user)
 def all_files_images_view(request):
-    # Fetch data from all three models
-    uploaded_files = UploadedFile.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-    uploaded_images = UploadedImage.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-    captured_images = CapturedImage.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-
-    # Add source_type attribute to each item dynamically
-    for obj in uploaded_files:
-        obj.source_type = "Uploaded File"
-    for obj in uploaded_images:
-        obj.source_type = "Uploaded Image"
-    for obj in captured_images:
-        obj.source_type = "Captured Image"
-
-    # Merge all into a single list and sort by timestamp
-    all_files = sorted(
-        chain(uploaded_files, uploaded_images, captured_images),
-        key=lambda x: x.timestamp,
-        reverse=True
-    )
-
-    return render(request, 'capture/all_files.html', {'files': all_files})
-
+    return render_media_table(request, 'all')
+
+
+def media_row(item):
+    """JSON shape of one table row (formatted the way the tables have always shown it)."""
+    user = item.user
+    uhid_str = str(item.uhid)
+    local_timestamp = timezone.localtime(item.timestamp)
+    return {
+        "ip": f"{uhid_str[:2]}/{uhid_str[2:]}" if len(uhid_str) > 2 else uhid_str,
+        "tag": item.custom_tag.name if item.custom_tag else "",
+        "type": item.get_kind_display(),
+        "name": user.full_name,
+        "email": user.email,
+        "designation": user.designation.title if user.designation else "",
+        "designation_other": user.designation_other or "",
+        "department": user.department.name if user.department else "",
+        "department_other": user.department_other or "",
+        "phone": user.phone or "",
+        "date": local_timestamp.strftime('%d-%b-%Y'),
+        "time": local_timestamp.strftime('%I:%M:%S %p'),
+        "url": item.url,
+    }
 
 
 @login_required
 @user_passes_test(is_super_user)
-def export_uploaded_files_excel(request):
-    files = UploadedFile.objects.select_related('user', 'custom_tag').order_by('-timestamp')
+def media_table_data(request, table):
+    """One keyset page of a superuser media table as JSON: ?cursor= plus the page's filters."""
+    if table not in listing.MEDIA_TABLES:
+        raise Http404("Unknown table.")
 
-    # Create workbook and worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Uploaded Files"
+    form = MediaFilterForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"success": False, "error": " ".join(e for errors in form.errors.values() for e in errors)})
 
-    # Add header row with updated columns
-    headers = ['Sl.', 'IP', 'Tag', 'Name', 'Username', 'Designation', 'Department', 'Phone', 'Date-Time','File Type', 'File Size (MB)', 'File Link']
-    ws.append(headers)
+    items = listing.media_items(table, form.cleaned_data).select_related('user__designation', 'user__department', 'custom_tag')
 
-    # Get the base URL for the files (e.g., "http://127.0.0.1:8000")
-    base_url = settings.SITE_URL if hasattr(settings, 'SITE_URL') else request.build_absolute_uri('/').split('/')[0] + '//' + request.get_host()
+    cursor = request.GET.get('cursor')
+    rows, next_cursor = listing.keyset_page(items, cursor)
 
-    def bytes_to_mb(size_bytes):
-        if not size_bytes:
-            return 'N/A'
-        return f"{size_bytes / (1024 * 1024):.2f} MB"
-    
-    # Add data rows with updated order
-    for idx, file in enumerate(files, start=1):
-        designation = file.user.designation.title if file.user.designation else 'N/A'
-        if file.user.designation_other:
-            designation += f" ({file.user.designation_other})"
-        
-        department = file.user.department.name if file.user.department else 'N/A'
-        if file.user.department_other:
-            department += f" ({file.user.department_other})"
-        
-        # Format UHID like 25/1678
-        uhid_str = str(file.uhid)
-        formatted_uhid = f"{uhid_str[:2]}/{uhid_str[2:]}" if len(uhid_str) > 2 else uhid_str
-        
-        # Construct the full file URL
-        file_url = f'{base_url}{file.file_path.url}' if file.file_path else ''
+    data = {"success": True, "rows": [media_row(item) for item in rows], "next": next_cursor}
+    if not cursor:
+        # Totals only with the first page; later pages just append
+        count, estimate = listing.count_rows(items)
+        data["total"] = {"count": count, "estimate": estimate}
+    return JsonResponse(data)
 
-        # Convert timestamp to local time and format
-        local_timestamp = timezone.localtime(file.timestamp)
-        datetime_str = local_timestamp.strftime('%d-%b-%Y %I:%M %p')
-
-        # Get file type (from model field if available)
-        file_type = file.file_type if file.file_type else 'Unknown'
-
-        # Get file size in MB
-        file_size_str = bytes_to_mb(file.file_size)
-
-
-
-        # Adding data in the specified order
-        ws.append([
-            idx,  # Sl.
-            formatted_uhid,  # IP (using the `uhid` for IP as per your data)
-            file.custom_tag.name if file.custom_tag else '—',  # Tag (showing the custom_tag or '—')
-            file.user.full_name,  # Name
-            file.user.email,  # Username
-            designation,  # Designation (including designation_other if exists)
-            department,  # Department (including department_other if exists)
-            file.user.phone if file.user.phone else 'N/A',
-            datetime_str,
-            file_type,  # File Type
-            file_size_str,  # File Size (MB)
-            f'=HYPERLINK("{file_url}", "Click Here")' if file_url else 'No Link',  # File Link (full URL for the file)
-        ])
-
-    # Generate dynamic filename with date-time
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"uploaded_files_{timestamp}.xlsx"
-
-    # Prepare HTTP response with Excel content
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    wb.save(response)
 
+
+def stream_media_export(request, table):
+    """
+    Stream one superuser table as ?format=xlsx (default) or csv, narrowed by
+    the same filters as the table page (date range, tag, IP, user, department).
+    """
+    fmt = request.GET.get('format', 'xlsx')
+    form = MediaFilterForm(request.GET)
+    if fmt not in exports.EXPORT_FORMATS:
+        messages.error(request, "Unknown export format.")
+        return redirect(request.META.get("HTTP_REFERER", "/"))
+    if not form.is_valid():
+        messages.error(request, " ".join(e for errors in form.errors.values() for e in errors))
+        return redirect(request.META.get("HTTP_REFERER", "/"))
+
+    filename, content_type, chunks = exports.export_media(table, form.cleaned_data, fmt, exports.site_base_url(request))
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename={filename}'
     return response
 
 
+@login_required
+@user_passes_test(is_super_user)
+def export_uploaded_files_excel(request):
+    return stream_media_export(request, 'uploaded_files')
+
 
 @login_required
 @user_passes_test(is_super_user)
 def export_uploaded_images_excel(request):
-    files = UploadedImage.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-
-    # Create workbook and worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Uploaded Images"
-
-    # Add header row
-    headers = ['Sl.', 'IP', 'Tag', 'Name', 'Username', 'Designation', 'Department', 'Phone', 'Date-Time','File Type', 'File Size (MB)', 'File Link']
-    ws.append(headers)
-
-    # Get the base URL for the files (e.g., "http://127.0.0.1:8000")
-    base_url = settings.SITE_URL if hasattr(settings, 'SITE_URL') else request.build_absolute_uri('/').split('/')[0] + '//' + request.get_host()
-
-    def bytes_to_mb(size_bytes):
-        if not size_bytes:
-            return 'N/A'
-        return f"{size_bytes / (1024 * 1024):.2f} MB"
-
-    def get_file_type(file_obj):
-        if file_obj.image_path:
-            ext = file_obj.image_path.name.split('.')[-1].lower()
-            return f'image/{ext}'
-        return 'Unknown'
-    
-    # Add data rows with updated order
-    for idx, file in enumerate(files, start=1):
-        designation = file.user.designation.title if file.user.designation else 'N/A'
-        if file.user.designation_other:
-            designation += f" ({file.user.designation_other})"
-        
-        department = file.user.department.name if file.user.department else 'N/A'
-        if file.user.department_other:
-            department += f" ({file.user.department_other})"
-        
-        # Format UHID like 25/1678
-        uhid_str = str(file.uhid)
-        formatted_uhid = f"{uhid_str[:2]}/{uhid_str[2:]}" if len(uhid_str) > 2 else uhid_str
-        
-        # Construct the full file URL
-        file_url = f'{base_url}{file.image_path.url}' if file.image_path else ''
+    return stream_media_export(request, 'uploaded_images')
 
-        # Convert timestamp to local time and format
-        local_timestamp = timezone.localtime(file.timestamp)
-        datetime_str = local_timestamp.strftime('%d-%b-%Y %I:%M %p')
-
-        # Get file type and size
-        file_type = get_file_type(file)
-        file_size_str = bytes_to_mb(file.image_size)
-
-        # Adding data in the specified order
-        ws.append([
-            idx,  # Sl.
-            formatted_uhid,  # IP (using the `uhid` for IP as per your data)
-            file.custom_tag.name if file.custom_tag else '—',  # Tag (showing the custom_tag or '—')
-            file.user.full_name,  # Name
-            file.user.email,  # Username
-            designation,  # Designation (including designation_other if exists)
-            department,  # Department (including department_other if exists)
-            file.user.phone if file.user.phone else 'N/A',
-            datetime_str,
-            file_type,  # File Type
-            file_size_str,  # File Size (MB)
-            f'=HYPERLINK("{file_url}", "Click Here")' if file_url else 'No Link',  # File Link (full URL for the file)
-        ])
-
-    # Generate dynamic filename with date-time
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"uploaded_images_{timestamp}.xlsx"
-
-    # Prepare HTTP response with Excel content
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    wb.save(response)
-
-    return response
 
 @login_required
 @user_passes_test(is_super_user)
 def export_captured_images_excel(request):
-    files =CapturedImage.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-
-    # Create workbook and worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Captured Images"
-
-    # Add header row
-    headers = ['Sl.', 'IP', 'Tag', 'Name', 'Username', 'Designation', 'Department', 'Phone', 'Date-Time','File Type', 'File Size (MB)', 'File Link']
-    ws.append(headers)
-
-    # Get the base URL for the files (e.g., "http://127.0.0.1:8000")
-    base_url = settings.SITE_URL if hasattr(settings, 'SITE_URL') else request.build_absolute_uri('/').split('/')[0] + '//' + request.get_host()
-
-    def bytes_to_mb(size_bytes):
-        if not size_bytes:
-            return 'N/A'
-        return f"{size_bytes / (1024 * 1024):.2f} MB"
-
-    def get_file_type(file_obj):
-        # Guess file type from image_path extension
-        if file_obj.image_path:
-            ext = file_obj.image_path.name.split('.')[-1].lower()
-            return f'image/{ext}'
-        return 'Unknown'
-    
-    # Add data rows with updated order
-    for idx, file in enumerate(files, start=1):
-        designation = file.user.designation.title if file.user.designation else 'N/A'
-        if file.user.designation_other:
-            designation += f" ({file.user.designation_other})"
-        
-        department = file.user.department.name if file.user.department else 'N/A'
-        if file.user.department_other:
-            department += f" ({file.user.department_other})"
-        
-        # Format UHID like 25/1678
-        uhid_str = str(file.uhid)
-        formatted_uhid = f"{uhid_str[:2]}/{uhid_str[2:]}" if len(uhid_str) > 2 else uhid_str
-        
-        # Construct the full file URL
-        file_url = f'{base_url}{file.image_path.url}' if file.image_path else ''
+    return stream_media_export(request, 'captured_images')
 
-        # Convert timestamp to local time and format as '12-May-2025 10:15 AM'
-        local_timestamp = timezone.localtime(file.timestamp)
-        datetime_str = local_timestamp.strftime('%d-%b-%Y %I:%M %p')
-        
-        # Get file type and size
-        file_type = get_file_type(file)
-        file_size_str = bytes_to_mb(file.image_size)
-
-        # Adding data in the specified order
-        ws.append([
-            idx,  # Sl.
-            formatted_uhid,  # IP (using the `uhid` for IP as per your data)
-            file.custom_tag.name if file.custom_tag else '—',  # Tag (showing the custom_tag or '—')
-            file.user.full_name,  # Name
-            file.user.email,  # Username
-            designation,  # Designation (including designation_other if exists)
-            department,  # Department (including department_other if exists)
-            file.user.phone if file.user.phone else 'N/A',
-            datetime_str,
-            file_type,  # File Type
-            file_size_str,  # File Size (MB)
-            f'=HYPERLINK("{file_url}", "Click Here")' if file_url else 'No Link',  # File Link (full URL for the file)
-        ])
-
-
-    # Generate dynamic filename with date-time
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"captured_images_{timestamp}.xlsx"
-
-    # Prepare HTTP response with Excel content
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    wb.save(response)
-
-    return response
 
 @login_required
 @user_passes_test(is_super_user)
 def export_all_files_excel(request):
-    # Fetch records from all 3 models
-    uploaded_files = UploadedFile.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-    uploaded_images = UploadedImage.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-    captured_images = CapturedImage.objects.select_related('user', 'custom_tag').order_by('-timestamp')
-
-    # Create workbook and worksheet
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "All Files & Images"
-
-    # Header row
-    headers = ['Sl.', 'Type', 'IP', 'Tag', 'Name', 'Username', 'Designation', 'Department', 'Phone', 'Date-Time','File Type', 'File Size (MB)', 'File Link']
-    ws.append(headers)
-
-    # Base URL
-    base_url = settings.SITE_URL if hasattr(settings, 'SITE_URL') else request.build_absolute_uri('/').split('/')[0] + '//' + request.get_host()
-
-    def bytes_to_mb(size_bytes):
-        if not size_bytes:
-            return 'N/A'
-        return f"{size_bytes / (1024 * 1024):.2f} MB"
-    
-    def get_file_type(file_obj, source_type):
-        # For UploadedFile, file_type field exists
-        if source_type == 'Uploaded File' and file_obj.file_type:
-            return file_obj.file_type
-        # For images, guess from extension
-        if source_type in ['Uploaded Image', 'Captured Image']:
-            if hasattr(file_obj, 'image_path') and file_obj.image_path:
-                ext = file_obj.image_path.name.split('.')[-1].lower()
-                return f'image/{ext}'
-        return 'Unknown'
-
-    def get_file_size(file_obj, source_type):
-        # UploadedFile has file_size in bytes
-        if source_type == 'Uploaded File' and file_obj.file_size:
-            return file_obj.file_size
-        # UploadedImage and CapturedImage have image_size field
-        if source_type in ['Uploaded Image', 'Captured Image']:
-            if hasattr(file_obj, 'image_size') and file_obj.image_size:
-                return file_obj.image_size
-        return None    
-
-    def write_row(idx, file, source_type, file_url):
-        # Format designation
-        designation = file.user.designation.title if file.user.designation else 'N/A'
-        if file.user.designation_other:
-            designation += f" ({file.user.designation_other})"
-        
-        # Format department
-        department = file.user.department.name if file.user.department else 'N/A'
-        if file.user.department_other:
-            department += f" ({file.user.department_other})"
-        
-        # Format UHID
-        uhid_str = str(file.uhid)
-        formatted_uhid = f"{uhid_str[:2]}/{uhid_str[2:]}" if len(uhid_str) > 2 else uhid_str
+    return stream_media_export(request, 'all')
 
-        # Convert timestamp to local time before formatting
-        local_timestamp = timezone.localtime(file.timestamp)
-        datetime_str = local_timestamp.strftime('%d-%b-%Y %I:%M %p')
-
-        # File type and size
-        file_type = get_file_type(file, source_type)
-        file_size_bytes = get_file_size(file, source_type)
-        file_size_str = bytes_to_mb(file_size_bytes)
-
-        # Add row
-        ws.append([
-            idx,
-            source_type,
-            formatted_uhid,
-            file.custom_tag.name if file.custom_tag else '—',
-            file.user.full_name,
-            file.user.email,
-            designation,
-            department,
-            file.user.phone if file.user.phone else 'N/A',
-            datetime_str,
-            file_type,
-            file_size_str,
-            f'=HYPERLINK("{file_url}", "Click Here")' if file_url else 'No Link',
-        ])
-
-    # Combined list with labels
-    all_files = [
-        ('Uploaded File', uploaded_files, lambda f: f.file_path.url if f.file_path else ''),
-        ('Uploaded Image', uploaded_images, lambda f: f.image_path.url if f.image_path else ''),
-        ('Captured Image', captured_images, lambda f: f.image_path.url if f.image_path else ''),
-    ]
 
-    idx = 1
-    for label, queryset, path_getter in all_files:
-        for file in queryset:
-            file_url = f'{base_url}{path_getter(file)}' if path_getter(file) else ''
-            write_row(idx, file, label, file_url)
-            idx += 1
+# Background exports (capture/export_jobs.py): submit, follow progress, download when ready
+
+@login_required
+@user_passes_test(is_super_user)
+def submit_export_job(request):
+    """
+    Queue an export for the job worker: export_type and format come from the
+    form, the table filters from the query string (as on the table page).
+    """
+    if request.method != "POST":
+        return redirect('capture:export_jobs')
+
+    filters = {key: value for key, value in request.GET.items() if key not in ('cursor', 'format') and value}
+    try:
+        export = export_jobs.submit_export(
+            request.user, request.POST.get('export_type', ''), request.POST.get('format', 'xlsx'),
+            filters, exports.site_base_url(request),
+        )
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect(request.META.get("HTTP_REFERER", "/"))
+
+    print(f"📤 Export {export.id} ({export.export_type}, {export.format}) queued by {request.user}")
+    messages.success(request, "Export queued. It will be ready to download here shortly.")
+    return redirect('capture:export_jobs')
 
-    # Generate filename
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"all_files_and_images_{timestamp}.xlsx"
 
-    # Return Excel response
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    wb.save(response)
+@login_required
+@user_passes_test(is_super_user)
+def export_jobs_view(request):
+    """The user's recent background exports; the page polls export_job_status for the pending ones."""
+    export_jobs.fail_abandoned()
+    recent = ExportJob.objects.filter(user=request.user)[:20]
+    return render(request, 'capture/export_jobs.html', {
+        'exports': [export_jobs.export_status(export) for export in recent],
+        'expiry_hours': export_jobs.EXPORT_EXPIRY_HOURS,
+    })
+
+
+@login_required
+@user_passes_test(is_super_user)
+def export_job_status(request, export_id):
+    export_jobs.fail_abandoned()
+    export = ExportJob.objects.filter(id=export_id, user=request.user).first()
+    if export is None:
+        return JsonResponse({"success": False, "error": "Export not found."}, status=404)
+    return JsonResponse({"success": True, "export": export_jobs.export_status(export)})
+
+
+@login_required
+@user_passes_test(is_super_user)
+def download_export_job(request, export_id):
+    export = ExportJob.objects.filter(id=export_id, user=request.user).first()
+    if export is None or export.status != "done" or export.expires_on < timezone.now():
+        messages.error(request, "This export is not available (still running, failed or expired).")
+        return redirect('capture:export_jobs')
+
+    path = export_jobs.export_path(export)
+    if not os.path.exists(path):
+        messages.error(request, "The export file is missing. Please export again.")
+        return redirect('capture:export_jobs')
+
+    response = media.media_response(request, export.file_name, path)
+    response["Content-Disposition"] = f'attachment; filename="{export.download_name}"'
     return response
 
+
 @login_required
 def report_issue(request):
     print(f"[DEBUG] User: {request.user.email} - {request.user.get_full_name()}")
@@ -1324,17 +1272,42 @@ def manage_issues(request):
             messages.success(request, f"Issue {issue.issue_id} updated successfully.")
         else:
             messages.error(request, "There was an error updating the issue.")
-        return redirect("capture:manage_issues")
-
-    all_issues = IssueReport.objects.filter(is_deleted=False).order_by("-created_at")
-    issue_forms = [IssueAdminUpdateForm(instance=issue) for issue in all_issues]
-    issue_data = zip(all_issues, issue_forms)
+        # Back to the same page and filters
+        return redirect(request.get_full_path())
+
+    filter_form = IssueFilterForm(request.GET or None)
+    issues = IssueReport.objects.filter(is_deleted=False).select_related('user__designation', 'user__department')
+    if filter_form.is_valid():
+        issues = listing.filter_rows(issues, filter_form.cleaned_data, time_field='created_at')
+        if filter_form.cleaned_data.get('status'):
+            issues = issues.filter(current_status=filter_form.cleaned_data['status'])
+
+    # One keyset page; update forms are built only for the issues shown
+    cursor = request.GET.get('cursor')
+    page_issues, next_cursor = listing.keyset_page(issues, cursor, time_field='created_at')
+    issue_forms = [IssueAdminUpdateForm(instance=issue) for issue in page_issues]
+    issue_data = zip(page_issues, issue_forms)
+
+    total, total_is_estimate = listing.count_rows(issues)
+    query = request.GET.copy()
+    query.pop('cursor', None)
+    first_query = query.urlencode()
+    next_query = None
+    if next_cursor:
+        query['cursor'] = next_cursor
+        next_query = query.urlencode()
 
     return render(
         request,
         "capture/manage_issues.html",
         {
             "issue_data": issue_data,  # List of (issue, form) pairs
+            "filter_form": filter_form,
+            "total": total,
+            "total_is_estimate": total_is_estimate,
+            "is_first_page": not cursor,
+            "first_query": first_query,
+            "next_query": next_query,
         },
     )
 
@@ -0,0 +1,165 @@
+"""
+Cover-sheet PDF rendering for tag 10/11 ECHS images.
+
+The photo is resampled with Pillow to COVER_PDF_DPI for the area it is printed
+in before ReportLab embeds it, so a cover PDF is a few hundred KB instead of a
+full camera frame. A JPEG that is already small enough (and needs no EXIF
+rotation) is embedded byte-for-byte without decoding. Layout and font metrics
+are computed once per renderer and reused for every sheet.
+"""
+import logging
+import math
+import threading
+from contextlib import contextmanager
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image, ImageOps
+from reportlab import rl_config
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+
+COVER_PDF_DPI = getattr(settings, 'COVER_PDF_DPI', 150)
+COVER_PDF_JPEG_QUALITY = getattr(settings, 'COVER_PDF_JPEG_QUALITY', 85)
+
+EXIF_ORIENTATION = 0x0112
+
+logger = logging.getLogger(__name__)
+
+_a85_lock = threading.Lock()
+
+
+@contextmanager
+def binary_streams():
+    """
+    Embed streams as binary instead of ASCII85 text (which adds 25% to every
+    photo) while a cover sheet is built. ReportLab only has the process-wide
+    rl_config.useA85 for this, so it is set for the build and restored after,
+    leaving other PDFs made by the process as ReportLab configures them.
+    """
+    with _a85_lock:
+        previous = rl_config.useA85
+        rl_config.useA85 = 0
+        try:
+            yield
+        finally:
+            rl_config.useA85 = previous
+
+
+class CoverSheetRenderer:
+    hospital_name = "HIMALAYAN HOSPITAL"
+    label_font = "Helvetica-Bold"
+    value_font = "Helvetica"
+    font_size = 14
+    margin_x = 80
+    top_offset = 80
+    line_gap = 25
+
+    def __init__(self, dpi=COVER_PDF_DPI, jpeg_quality=COVER_PDF_JPEG_QUALITY, page_size=A4):
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self.page_size = page_size
+        self.width, self.height = page_size
+
+        # Box the photo is fitted into (aspect ratio kept, centred)
+        self.image_box = (self.margin_x, 0, self.width - 2 * self.margin_x, self.height + 160)
+        self._label_widths = {}
+
+    def label_width(self, label):
+        if label not in self._label_widths:
+            self._label_widths[label] = stringWidth(label, self.label_font, self.font_size)
+        return self._label_widths[label]
+
+    def fields_for(self, patient, tag_id):
+        fields = [
+            ("HOSPITAL NAME", self.hospital_name),
+            ("PATIENT NAME", patient.patient_name),
+        ]
+        if tag_id == 10:
+            fields.append(("MOBILE NUMBER", patient.mobile_no))
+            fields.append(("DATE OF ADMISSION", patient.date_of_admission.strftime('%d-%m-%Y %H:%M hr.')))
+        if tag_id == 11:
+            fields.append(("DATE OF ADMISSION", patient.date_of_admission.strftime('%d-%m-%Y %H:%M hr.')))
+            fields.append(("DATE OF DISCHARGE", patient.date_of_discharge.strftime('%d-%m-%Y %H:%M hr.')))
+        return fields
+
+    def target_pixels(self, image_size):
+        """Pixel size that prints the image at self.dpi inside image_box."""
+        iw, ih = image_size
+        _, _, box_w, box_h = self.image_box
+        scale = min(box_w / iw, box_h / ih)
+        return (
+            max(1, math.ceil(iw * scale / 72 * self.dpi)),
+            max(1, math.ceil(ih * scale / 72 * self.dpi)),
+        )
+
+    def prepare_image(self, image_path):
+        """Return an ImageReader for the photo: the original JPEG when it fits, otherwise a resampled copy."""
+        with Image.open(image_path) as source:
+            orientation = source.getexif().get(EXIF_ORIENTATION, 1)
+            iw, ih = source.size
+            if orientation in (5, 6, 7, 8):
+                iw, ih = ih, iw
+            target_w, target_h = self.target_pixels((iw, ih))
+
+            if source.format == 'JPEG' and orientation == 1 and iw <= target_w and ih <= target_h:
+                return ImageReader(image_path)
+
+            # Let the JPEG decoder downscale while reading, then finish with a proper resample
+            source.draft('RGB', (target_w, target_h) if orientation not in (5, 6, 7, 8) else (target_h, target_w))
+            image = ImageOps.exif_transpose(source)
+            if image.mode in ('RGBA', 'LA', 'P'):
+                image = image.convert('RGBA')
+                background = Image.new('RGB', image.size, 'white')
+                background.paste(image, mask=image.getchannel('A'))
+                image = background
+            elif image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            if image.width > target_w or image.height > target_h:
+                image = image.resize((target_w, target_h), Image.LANCZOS)
+
+            buffer = BytesIO()
+            image.save(buffer, 'JPEG', quality=self.jpeg_quality, optimize=True)
+            image.close()
+
+        buffer.seek(0)
+        return ImageReader(buffer)
+
+    def render(self, patient, tag_id, image_path):
+        """Render one cover sheet and return the PDF bytes."""
+        buffer = BytesIO()
+        with binary_streams():
+            c = canvas.Canvas(buffer, pagesize=self.page_size)
+
+            y = self.height - self.top_offset
+            for index, (label, value) in enumerate(self.fields_for(patient, tag_id)):
+                y_pos = y - self.line_gap * index
+                c.setFont(self.label_font, self.font_size)
+                c.drawString(self.margin_x, y_pos, f"{label}:")
+                c.setFont(self.value_font, self.font_size)
+                c.drawString(self.margin_x + self.label_width(f"{label}:") + 8, y_pos, str(value))
+
+            try:
+                x, y0, box_w, box_h = self.image_box
+                c.drawImage(
+                    self.prepare_image(image_path),
+                    x,
+                    y0,
+                    width=box_w,
+                    height=box_h,
+                    preserveAspectRatio=True,
+                    anchor="c"
+                )
+            except Exception as e:
+                logger.error(f"PDF image draw failed: {e}")
+
+            c.showPage()
+            c.save()
+        return buffer.getvalue()
+
+
+default_renderer = CoverSheetRenderer()
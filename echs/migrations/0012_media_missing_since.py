@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('echs', '0011_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='capturedimage',
+            name='missing_since',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='otheruploadedfile',
+            name='missing_since',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='missing_since',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='missing_since',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('echs', '0012_media_missing_since'),
+        ('members', '0009_alter_customuser_options_customuser_ward_other_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='capturedimage',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['patient', '-timestamp'], name='echs_capimg_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='capturedimage',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['patient', 'deleted_by'], name='echs_capimg_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otheruploadedfile',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['patient', '-timestamp'], name='echs_other_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otheruploadedfile',
+            index=models.Index(fields=['content_type', 'object_id', 'is_deleted'], name='echs_other_linked_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedfile',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['patient', '-timestamp'], name='echs_upfile_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedfile',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['patient', 'deleted_by'], name='echs_upfile_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedimage',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['patient', '-timestamp'], name='echs_upimg_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='uploadedimage',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['patient', 'deleted_by'], name='echs_upimg_deleted_idx'),
+        ),
+    ]
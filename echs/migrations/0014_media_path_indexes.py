@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:12
+
+import echs.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('echs', '0013_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='capturedimage',
+            name='image_path',
+            field=models.ImageField(db_index=True, upload_to=echs.models.upload_to),
+        ),
+        migrations.AlterField(
+            model_name='otheruploadedfile',
+            name='file_path',
+            field=models.FileField(db_index=True, upload_to=echs.models.upload_to),
+        ),
+        migrations.AlterField(
+            model_name='uploadedfile',
+            name='file_path',
+            field=models.FileField(db_index=True, upload_to=echs.models.upload_to),
+        ),
+        migrations.AlterField(
+            model_name='uploadedimage',
+            name='image_path',
+            field=models.ImageField(db_index=True, upload_to=echs.models.upload_to),
+        ),
+    ]
@@ -1,11 +1,12 @@
 from datetime import timezone
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 import uuid
 import os
 from django.utils import timezone  
 from members.models import CustomTag
 from django.conf import settings
+from filesys.layout import uhid_dir
 from django.core.validators import FileExtensionValidator
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
@@ -47,8 +48,8 @@ def upload_to(instance, filename):
     else:
         subfolder = f"{uhid_prefix}_other"
 
-    # Full path: UHID_<number>/<subfolder>/<filename>
-    return os.path.join(uhid_prefix, subfolder, filename)
+    # Full path: [<shard>/]UHID_<number>/<subfolder>/<filename>
+    return os.path.join(uhid_dir(uhid_number), subfolder, filename)
 
 
 class EchsPatientMaster(models.Model):
@@ -77,7 +78,7 @@ class CapturedImage(models.Model):
         on_delete=models.CASCADE,
         related_name="patient_captured_images"
     )
-    image_path = models.ImageField(upload_to=upload_to)
+    image_path = models.ImageField(upload_to=upload_to, db_index=True)  # Indexed for /media/ lookups
     folder_path = models.CharField(max_length=255, blank=True, null=True)
     custom_tag = models.ForeignKey(
         CustomTag,
@@ -87,9 +88,18 @@ class CapturedImage(models.Model):
         related_name='echs_capturedimage_tags'  # UNIQUE
     )
     image_size = models.PositiveIntegerField(blank=True, null=True)
+    # Filled in by the single-pass ingest (capture/ingest.py), so listings never open the file
+    image_width = models.PositiveIntegerField(blank=True, null=True)
+    image_height = models.PositiveIntegerField(blank=True, null=True)
+    image_format = models.CharField(max_length=10, blank=True, null=True, db_index=True)
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # SHA-256 of the stored bytes
+    exif_taken_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    exif_latitude = models.FloatField(blank=True, null=True)
+    exif_longitude = models.FloatField(blank=True, null=True)
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
+    missing_since = models.DateTimeField(blank=True, null=True, db_index=True)  # Set by the media integrity check while the file is not on disk
 
     is_deleted = models.BooleanField(default=False)
     deleted_on = models.DateTimeField(null=True, blank=True)
@@ -101,10 +111,20 @@ class CapturedImage(models.Model):
         related_name="echs_deleted_images"
     )
 
+    class Meta:
+        indexes = [
+            # Patient listings: live rows of one patient, newest first
+            models.Index(fields=["patient", "-timestamp"], condition=models.Q(is_deleted=False), name="echs_capimg_live_idx"),
+            # Deleted-items page: rows one user deleted for a patient
+            models.Index(fields=["patient", "deleted_by"], condition=models.Q(is_deleted=True), name="echs_capimg_deleted_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.folder_path:
-            self.folder_path = f"UHID_{self.patient.uhid}/UHID_{self.patient.uhid}_captured_gps_images/"
-        super().save(*args, **kwargs)
+            self.folder_path = f"{uhid_dir(self.patient.uhid)}/UHID_{self.patient.uhid}_captured_gps_images/"
+        # The post_save catalog and usage-counter updates commit or roll back with the row
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.patient.patient_name} ({self.patient.uhid})"
@@ -123,7 +143,7 @@ class UploadedFile(models.Model):
         related_name="uploaded_files"
     )
 
-    file_path = models.FileField(upload_to=upload_to)
+    file_path = models.FileField(upload_to=upload_to, db_index=True)  # Indexed for /media/ lookups
     folder_path = models.CharField(max_length=255, blank=True, null=True)
 
     custom_tag = models.ForeignKey(
@@ -138,6 +158,7 @@ class UploadedFile(models.Model):
     file_type = models.CharField(max_length=100, blank=True, null=True)
 
     timestamp = models.DateTimeField(auto_now_add=True)
+    missing_since = models.DateTimeField(blank=True, null=True, db_index=True)  # Set by the media integrity check while the file is not on disk
 
     is_deleted = models.BooleanField(default=False)
     deleted_on = models.DateTimeField(null=True, blank=True)
@@ -149,10 +170,18 @@ class UploadedFile(models.Model):
         related_name="echs_deleted_file"
     )
 
+    class Meta:
+        indexes = [
+            # Patient listings: live rows of one patient, newest first
+            models.Index(fields=["patient", "-timestamp"], condition=models.Q(is_deleted=False), name="echs_upfile_live_idx"),
+            # Deleted-items page: rows one user deleted for a patient
+            models.Index(fields=["patient", "deleted_by"], condition=models.Q(is_deleted=True), name="echs_upfile_deleted_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         # Set folder path if not already set
         if not self.folder_path:
-            self.folder_path = f"UHID_{self.patient.uhid}/UHID_{self.patient.uhid}_uploaded_pdf_files/"
+            self.folder_path = f"{uhid_dir(self.patient.uhid)}/UHID_{self.patient.uhid}_uploaded_pdf_files/"
 
         # Store file size/type
         if self.file_path:
@@ -162,7 +191,8 @@ class UploadedFile(models.Model):
             except Exception:
                 pass
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.patient.patient_name} ({self.patient.uhid}) - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -185,7 +215,7 @@ class UploadedImage(models.Model):
         related_name="uploaded_images"        # UNIQUE + Matches UploadedFile pattern
     )
 
-    image_path = models.ImageField(upload_to=upload_to)
+    image_path = models.ImageField(upload_to=upload_to, db_index=True)  # Indexed for /media/ lookups
 
     folder_path = models.CharField(
         max_length=255,
@@ -205,8 +235,17 @@ class UploadedImage(models.Model):
         blank=True,
         null=True
     )
+    # Filled in by the single-pass ingest (capture/ingest.py), so listings never open the file
+    image_width = models.PositiveIntegerField(blank=True, null=True)
+    image_height = models.PositiveIntegerField(blank=True, null=True)
+    image_format = models.CharField(max_length=10, blank=True, null=True, db_index=True)
+    content_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # SHA-256 of the stored bytes
+    exif_taken_at = models.DateTimeField(blank=True, null=True, db_index=True)
+    exif_latitude = models.FloatField(blank=True, null=True)
+    exif_longitude = models.FloatField(blank=True, null=True)
 
     timestamp = models.DateTimeField(auto_now_add=True)
+    missing_since = models.DateTimeField(blank=True, null=True, db_index=True)  # Set by the media integrity check while the file is not on disk
 
     is_deleted = models.BooleanField(default=False)
     deleted_on = models.DateTimeField(null=True, blank=True)
@@ -218,16 +257,25 @@ class UploadedImage(models.Model):
         related_name="delete_uploaded_images"
     )
 
+    class Meta:
+        indexes = [
+            # Patient listings: live rows of one patient, newest first
+            models.Index(fields=["patient", "-timestamp"], condition=models.Q(is_deleted=False), name="echs_upimg_live_idx"),
+            # Deleted-items page: rows one user deleted for a patient
+            models.Index(fields=["patient", "deleted_by"], condition=models.Q(is_deleted=True), name="echs_upimg_deleted_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         # Automatically assign folder
         if not self.folder_path:
-            self.folder_path = f"UHID_{self.patient.uhid}/UHID_{self.patient.uhid}_uploaded_gps_images/"
+            self.folder_path = f"{uhid_dir(self.patient.uhid)}/UHID_{self.patient.uhid}_uploaded_gps_images/"
 
         # Save image size
         if self.image_path and hasattr(self.image_path, "size"):
             self.image_size = self.image_path.size
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         username = self.user.username if self.user else "Unknown User"
@@ -247,7 +295,7 @@ class OtherUploadedFile(models.Model):
         related_name="converted_files"
     )
 
-    file_path = models.FileField(upload_to=upload_to)
+    file_path = models.FileField(upload_to=upload_to, db_index=True)  # Indexed for /media/ lookups
     folder_path = models.CharField(max_length=255, blank=True, null=True)
 
     custom_tag = models.ForeignKey(
@@ -262,6 +310,7 @@ class OtherUploadedFile(models.Model):
     file_type = models.CharField(max_length=100, blank=True, null=True)
 
     timestamp = models.DateTimeField(auto_now_add=True)
+    missing_since = models.DateTimeField(blank=True, null=True, db_index=True)  # Set by the media integrity check while the file is not on disk
 
     is_deleted = models.BooleanField(default=False)
     deleted_on = models.DateTimeField(null=True, blank=True)
@@ -277,10 +326,18 @@ class OtherUploadedFile(models.Model):
     object_id = models.PositiveIntegerField(null=True)
     linked_object = GenericForeignKey('content_type', 'object_id')
 
+    class Meta:
+        indexes = [
+            # Patient listings: live rows of one patient, newest first
+            models.Index(fields=["patient", "-timestamp"], condition=models.Q(is_deleted=False), name="echs_other_live_idx"),
+            # PDFs linked to a captured/uploaded image (soft delete and restore)
+            models.Index(fields=["content_type", "object_id", "is_deleted"], name="echs_other_linked_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         # Set folder path if not already set
         if not self.folder_path:
-            self.folder_path = f"UHID_{self.patient.uhid}/UHID_{self.patient.uhid}_patient_pdf/"
+            self.folder_path = f"{uhid_dir(self.patient.uhid)}/UHID_{self.patient.uhid}_patient_pdf/"
 
 
         # Store file size/type
@@ -291,7 +348,8 @@ class OtherUploadedFile(models.Model):
             except Exception:
                 pass
 
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.patient.patient_name} ({self.patient.uhid}) - {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
@@ -1,19 +1,17 @@
 import os
 from django.contrib.contenttypes.models import ContentType
-from io import BytesIO
 from django.core.files.base import ContentFile
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.lib.utils import ImageReader
-from datetime import datetime
 import logging
+from django.contrib.auth import get_user_model
 
 from echs.models import OtherUploadedFile
+from echs.cover_pdf import default_renderer
+from capture import jobs
 
 logger = logging.getLogger(__name__)
 
 
-def generate_pdf_file(patient, captured_image, user):
+def generate_pdf_file(patient, captured_image, user, renderer=None):
 
     if not captured_image or not captured_image.image_path:
         return None
@@ -22,12 +20,7 @@ def generate_pdf_file(patient, captured_image, user):
     if not os.path.exists(image_path):
         return None
 
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    y = height - 80
-    line_gap = 25
+    renderer = renderer or default_renderer
 
     tag_id = None
     tag_obj = None
@@ -38,55 +31,7 @@ def generate_pdf_file(patient, captured_image, user):
         tag_id = tag_obj.id
         tag_name = tag_obj.name.replace(" ", "_")
 
-    def draw_label_value(label, value, y_pos):
-        c.setFont("Helvetica-Bold", 14)
-        c.drawString(80, y_pos, f"{label}:")
-        label_width = c.stringWidth(f"{label}:", "Helvetica-Bold", 14)
-        c.setFont("Helvetica", 14)
-        c.drawString(80 + label_width + 8, y_pos, str(value))
-
-    draw_label_value("HOSPITAL NAME", "HIMALAYAN HOSPITAL", y)
-    draw_label_value("PATIENT NAME", patient.patient_name, y - line_gap)
-
-    if tag_id == 10:
-        draw_label_value("MOBILE NUMBER", patient.mobile_no, y - (line_gap * 2))
-        draw_label_value(
-            "DATE OF ADMISSION",
-            patient.date_of_admission.strftime('%d-%m-%Y %H:%M hr.'),
-            y - (line_gap * 3)
-        )
-
-    if tag_id == 11:
-        draw_label_value(
-            "DATE OF ADMISSION",
-            patient.date_of_admission.strftime('%d-%m-%Y %H:%M hr.'),
-            y - (line_gap * 2)
-        )
-        draw_label_value(
-            "DATE OF DISCHARGE",
-            patient.date_of_discharge.strftime('%d-%m-%Y %H:%M hr.'),
-            y - (line_gap * 3)
-        )
-
-    try:
-        image = ImageReader(image_path)
-        c.drawImage(
-            image,
-            80,
-            0,
-            width=width - 160,
-            height=height + 160,
-            preserveAspectRatio=True,
-            anchor="c"
-        )
-    except Exception as e:
-        logger.error(f"PDF image draw failed: {e}")
-
-    c.showPage()
-    c.save()
-
-    buffer.seek(0)
-
+    pdf_bytes = renderer.render(patient, tag_id, image_path)
 
     # 🔥 Create DB record using upload_to()
     pdf_instance = OtherUploadedFile(
@@ -99,8 +44,58 @@ def generate_pdf_file(patient, captured_image, user):
 
     pdf_instance.file_path.save(
         f"IP_{patient.uhid}_{tag_name}.pdf",
-        ContentFile(buffer.read()),
+        ContentFile(pdf_bytes),
         save=True
     )
 
-    return pdf_instance 
+    return pdf_instance
+
+
+def generate_pdf_files(source_images, user, renderer=None):
+    """
+    Batch API: render cover sheets for many images in one process with one renderer.
+    Only one sheet is in memory at a time; returns the OtherUploadedFile (or None) per image.
+    """
+    renderer = renderer or default_renderer
+    results = []
+    for source_image in source_images:
+        try:
+            results.append(generate_pdf_file(source_image.patient, source_image, user or source_image.user, renderer=renderer))
+        except Exception as e:
+            logger.error(f"Cover PDF failed for {source_image.__class__.__name__} {source_image.id}: {e}")
+            results.append(None)
+    return results
+
+
+# Tags whose images get a cover PDF (OtherUploadedFile) generated from them
+COVER_PDF_TAG_IDS = (10, 11)
+COVER_PDF_TASK = "echs.services.run_cover_pdf_job"
+
+
+def queue_cover_pdf(source_image, user):
+    """
+    Queue the cover PDF for a tag 10/11 image instead of rendering it in the request.
+    Returns the BackgroundJob, or None when the tag does not need one.
+    """
+    tag_obj = getattr(source_image, "custom_tag", None)
+    if not tag_obj or tag_obj.id not in COVER_PDF_TAG_IDS:
+        return None
+    return jobs.enqueue(COVER_PDF_TASK, source_image, payload={"user_id": user.id})
+
+
+def run_cover_pdf_job(job):
+    """Worker side of queue_cover_pdf(); safe to run twice for the same image."""
+    source_image = job.target
+    if source_image is None or source_image.is_deleted:
+        return {"skipped": "source image removed"}
+
+    existing = OtherUploadedFile.objects.filter(content_type=job.content_type, object_id=job.object_id).first()
+    if existing:
+        return {"other_file_id": existing.id, "skipped": "already generated"}
+
+    user = get_user_model().objects.filter(id=job.payload.get("user_id")).first() or source_image.user
+    pdf_instance = generate_pdf_file(source_image.patient, source_image, user)
+    if pdf_instance is None:
+        raise FileNotFoundError(f"Image file for {job.content_type} {job.object_id} not found")
+
+    return {"other_file_id": pdf_instance.id}
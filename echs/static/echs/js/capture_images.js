@@ -860,31 +860,24 @@ document.addEventListener('DOMContentLoaded', () => {
             return; // Prevent upload if no tag is selected
         }
 
-        const reader = new FileReader();
-        reader.readAsDataURL(storedImageBlob);
-        reader.onloadend = () => {
-            const imageData = reader.result;
-            console.log("🟡 Custom Tag Value:", customTagValue);
-            uploadImage(imageData, uhidValue, customTagValue, storedImageSize, storedLatitude, storedLongitude);
-        };
+        console.log("🟡 Custom Tag Value:", customTagValue);
+        uploadImage(storedImageBlob, uhidValue, customTagValue, storedLatitude, storedLongitude);
     });
 
-    function uploadImage(imageData, uhidValue, customTagValue, imageSize, latitude, longitude) {
+    // Sends the JPEG blob as the raw request body (no base64 data URL); metadata travels in headers
+    function uploadImage(imageBlob, uhidValue, customTagValue, latitude, longitude) {
         console.log("📤 JS Helper Function Sending image to server...");
-        fetch(window.location.href, {
+        fetch("/echs/image_capture/raw/", {
             method: "POST",
             headers: {
-                "Content-Type": "application/x-www-form-urlencoded",
-                "X-CSRFToken": document.querySelector("[name=csrfmiddlewaretoken]").value
+                "Content-Type": imageBlob.type || "image/jpeg",
+                "X-CSRFToken": document.querySelector("[name=csrfmiddlewaretoken]").value,
+                "X-UHID": uhidValue,
+                "X-Custom-Tag": customTagValue,
+                "X-Latitude": latitude,
+                "X-Longitude": longitude
             },
-            body: new URLSearchParams({
-                image_data: imageData,
-                uhid: uhidValue,
-                custom_tag: customTagValue,
-                image_size: imageSize,
-                latitude: latitude,
-                longitude: longitude
-            })
+            body: imageBlob
         })
         .then(response => response.json())
         .then(data => {
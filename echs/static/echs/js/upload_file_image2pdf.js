@@ -156,46 +156,9 @@ document.addEventListener("DOMContentLoaded", () => {
         formData.append("uhid", uhid);
         formData.append("custom-tag-select", customTag);
 
-        try {
-            const { PDFDocument } = window.PDFLib;
-            const pdfDoc = await PDFDocument.create();
-
-            for (const entry of selectedFiles) {
-                const imageFile = entry.file;
-                const imageBytes = await imageFile.arrayBuffer();
-                let pdfImage;
-
-                if (imageFile.type === "image/jpeg" || imageFile.type === "image/jpg") {
-                    pdfImage = await pdfDoc.embedJpg(imageBytes);
-                } else if (imageFile.type === "image/png") {
-                    pdfImage = await pdfDoc.embedPng(imageBytes);
-                } else {
-                    showAlert("Unsupported image format.");
-                    return;
-                }
-
-                const page = pdfDoc.addPage([pdfImage.width, pdfImage.height]);
-                page.drawImage(pdfImage, {
-                    x: 0,
-                    y: 0,
-                    width: pdfImage.width,
-                    height: pdfImage.height,
-                });
-            }
-
-            const pdfBytes = await pdfDoc.save();
-            const blob = new Blob([pdfBytes], { type: "application/pdf" });
-            const pdfFile = new File(
-                [blob],
-                `images_to_pdf_${Date.now()}.pdf`,
-                { type: "application/pdf" }
-            );
-
-            formData.append("file", pdfFile);
-        } catch (err) {
-            console.error("PDF creation error:", err);
-            showAlert("Failed to generate PDF from images.");
-            return;
+        // Pages are sent as images; the server combines them into one PDF
+        for (const entry of selectedFiles) {
+            formData.append("files", entry.file, entry.file.name);
         }
 
         fetch("", {
@@ -12,13 +12,22 @@ urlpatterns = [
     path('check-discharge-status/',views.check_discharge_status,name='check_discharge_status'),
 
     path('image_capture/', views.echs_image_capture, name='echs_image_capture'),
+    path('image_capture/raw/', views.echs_image_capture_raw, name='echs_image_capture_raw'),
     path('up_file_image2image/', views.upload_file_image2image, name='upload_file_image2image'),
     path('up_file_multi_image2image/', views.upload_file_multi_image2image, name='upload_file_multi_image2image'),
     path('up_file_image2pdf/', views.upload_file_image2pdf, name='upload_file_image2pdf'),
     path('up_file_pdf2pdf/', views.upload_file_pdf2pdf, name='upload_file_pdf2pdf'), 
+
+    # Chunked, resumable uploads
+    path('chunked-upload/start/', views.chunked_upload_start, name='chunked_upload_start'),
+    path('chunked-upload/<uuid:session_id>/part/<int:index>/', views.chunked_upload_part, name='chunked_upload_part'),
+    path('chunked-upload/<uuid:session_id>/status/', views.chunked_upload_status, name='chunked_upload_status'),
+    path('chunked-upload/<uuid:session_id>/commit/', views.chunked_upload_commit, name='chunked_upload_commit'),
+    path('job-status/<int:job_id>/', views.job_status, name='job_status'),
  
 
     path('view-images-home/<str:uhid>/', views.view_images_home, name='view_images_home'),
+    path('image-rendition/<str:model>/<int:id>/<str:size>/', views.image_rendition, name='image_rendition'),
     path('download-all-images/<str:uhid>/', views.download_all_images, name='download_all_images'),
     path('delete-image/<str:model>/<str:id>/', views.delete_image, name='delete_image'),
 
@@ -28,6 +37,7 @@ urlpatterns = [
 
     path('view-other-files/<str:uhid>/', views.view_other_files, name='view_other_files'),
     path('download-all-other-files/<str:uhid>/', views.download_all_other_files, name='download_all_other_files'),
+    path('patient-dossier/<str:uhid>/', views.patient_dossier, name='patient_dossier'),
     # path('delete-other-files/<str:id>/', views.delete_other_files, name='delete_other_files'),
 
     path('view-deleted-items/<str:uhid>/', views.view_deleted_items, name='view_deleted_items'),
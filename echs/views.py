@@ -5,26 +5,31 @@ import traceback
 from django.core.files.base import ContentFile
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, Http404
 from django.shortcuts import render, redirect, get_object_or_404, get_list_or_404
 from django.contrib.auth.decorators import login_required
 from echs.models import EchsPatientMaster, CapturedImage, UploadedFile, UploadedImage, OtherUploadedFile
 from datetime import datetime
+from members import refdata
 from members.models import CustomTag
 from django.db import models
 import os
-import shutil
-import zipfile
-import time
 from itertools import chain
 from operator import attrgetter
 from django.utils import timezone
-from echs.services import generate_pdf_file
+from echs.services import queue_cover_pdf
+from filesys.archive import field_entries
+from filesys.layout import uhid_dir
+from filesys.pdf_merge import stream_pdf
+from capture.storage import move_media
+from capture import archives, catalog, chunked, ingest, jobs, media, renditions, summaries
+from capture.models import BackgroundJob
 from django.conf import settings
 from django.contrib import messages
 from django.db.models import Value, CharField
 from django.contrib.contenttypes.fields import GenericRelation
 from django.urls import reverse
+from django.core.paginator import Paginator
 
 
 
@@ -71,20 +76,13 @@ def echs_uhid_options(request):
     try:
         patient = EchsPatientMaster.objects.get(uhid=uhid)
         patient_name = patient.patient_name
-        captured_count = patient.patient_captured_images.filter(is_deleted=False).count()
-        captured_deleted= patient.patient_captured_images.filter(is_deleted=True, deleted_by_id = request.user.id).count()      
 
-        uploaded_image_count = patient.uploaded_images.filter(is_deleted=False).count()       
-        uploaded_deleted = patient.uploaded_images.filter(is_deleted=True, deleted_by_id = request.user.id).count()
-
-
-        file_count = patient.uploaded_files.filter(is_deleted=False).count() 
-        file_deleted = patient.uploaded_files.filter(is_deleted=True, deleted_by_id = request.user.id).count() 
-
-        other_files = patient.converted_files.filter(is_deleted=False).count() 
-
-        total_image_count = captured_count + uploaded_image_count
-        total_deleted_files= captured_deleted + uploaded_deleted + file_deleted
+        # Counts come from the per-patient summary row (capture/summaries.py)
+        summary = summaries.for_patient('echs', patient.uhid, request.user if request.user.is_authenticated else None)
+        total_image_count = summary.image_count
+        file_count = summary.uploaded_files
+        other_files = summary.other_files
+        total_deleted_files = summary.deleted_by_user
     except EchsPatientMaster.DoesNotExist:
         pass
   
@@ -194,7 +192,7 @@ def echs_image_capture(request):
     patient_name = patient.patient_name
 
     # Get available custom tags
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
     
     if request.method == "POST":
         image_data = request.POST.get("image_data")
@@ -230,24 +228,29 @@ def echs_image_capture(request):
             # Handle the custom tag
             tag_obj = None
             if custom_tag:
-                tag_obj = CustomTag.objects.get(id=custom_tag)
+                tag_obj = refdata.get(CustomTag, custom_tag, include_inactive=True)
 
-            captured_image = CapturedImage.objects.create(
-                user=request.user,
-                patient=patient,
-                image_path=image_file,
-                custom_tag=tag_obj,
-                image_size=image_size,
-                latitude=latitude,
-                longitude=longitude
+            # One read of the bytes: real type, metadata, hash, transcode and thumbnail
+            ingested = ingest.ingest_image(image_file, ingest.RAW_IMAGE_TYPES, tag=tag_obj, transcode_capture=True)
+            try:
+                captured_image = CapturedImage.objects.create(
+                    user=request.user,
+                    patient=patient,
+                    image_path=ingested.file,
+                    custom_tag=tag_obj,
+                    latitude=latitude,
+                    longitude=longitude,
+                    **ingested.fields
                 )
+                ingested.build_renditions(captured_image.image_path.name)
+            finally:
+                ingested.close()
 
-            if tag_obj and tag_obj.id in [10, 11]:
-                generate_pdf_file(patient, captured_image,request.user)
-
+            # Cover PDF is rendered by the job worker, the nurse does not wait for it
+            pdf_job = queue_cover_pdf(captured_image, request.user)
 
             print("Image successfully saved to database.")
-            return JsonResponse({"success": True, "message": "Image uploaded successfully!"})
+            return JsonResponse({"success": True, "message": "Image uploaded successfully!", "pdf_job_id": pdf_job.id if pdf_job else None})
 
         except ValueError:
             return JsonResponse({"success": False, "error": "UHID must be a valid number!"})
@@ -260,6 +263,75 @@ def echs_image_capture(request):
     return render(request, "echs/echs_capture_images.html", 
     {"uhid": uhid, "custom_tags": custom_tags, "patient_name": patient_name, "GOOGLE_MAPS_API_KEY": settings.GOOGLE_MAPS_API_KEY})
 
+
+@login_required
+def echs_image_capture_raw(request):
+    """
+    Binary capture ingest: the image arrives as the raw request body (or a multipart
+    "image" part) and is streamed to disk; UHID, tag and lat/long come in X- headers
+    or small form fields. The base64 form POST in echs_image_capture is kept for older clients.
+    """
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "POST required."}, status=405)
+
+    try:
+        meta = ingest.capture_metadata(request)
+        print(f"Received UHID: {meta['uhid']}")
+        print(f"Received Custom Tag: {meta['custom_tag']}")
+        print(f"Received Latitude: {meta['latitude']}")
+        print(f"Received Longitude: {meta['longitude']}")
+
+        # Ensure UHID is a valid integer and within range
+        uhid_int = int(meta["uhid"])
+        if uhid_int > 2147483647 or uhid_int < -2147483648:  # PostgreSQL Integer Range
+            raise ValidationError("UHID is too large or invalid!")
+
+        patient = EchsPatientMaster.objects.filter(uhid=uhid_int).first()
+        if not patient:
+            return JsonResponse({"success": False, "error": "Patient not found!"})
+
+        # Handle the custom tag
+        tag_obj = None
+        if meta["custom_tag"]:
+            try:
+                tag_obj = refdata.get(CustomTag, meta["custom_tag"])
+            except CustomTag.DoesNotExist:
+                raise ValidationError("Invalid custom tag selected.")
+
+        image_file = ingest.capture_upload(request, MAX_FILE_SIZE)
+        print(f"Received Image Size: {image_file.size}")
+
+        ingested = None
+        try:
+            ingested = ingest.ingest_image(image_file, ingest.RAW_IMAGE_TYPES, tag=tag_obj, transcode_capture=True)
+            captured_image = CapturedImage.objects.create(
+                user=request.user,
+                patient=patient,
+                image_path=ingested.file,
+                custom_tag=tag_obj,
+                latitude=meta["latitude"],
+                longitude=meta["longitude"],
+                **ingested.fields
+            )
+            ingested.build_renditions(captured_image.image_path.name)
+        finally:
+            image_file.close()
+            if ingested:
+                ingested.close()
+
+        pdf_job = queue_cover_pdf(captured_image, request.user)
+
+        print("Image successfully saved to database.")
+        return JsonResponse({"success": True, "message": "Image uploaded successfully!", "pdf_job_id": pdf_job.id if pdf_job else None})
+
+    except (TypeError, ValueError):
+        return JsonResponse({"success": False, "error": "UHID must be a valid number!"})
+    except ValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)})
+    except Exception:
+        print("❌ ERROR OCCURRED:", traceback.format_exc())
+        return JsonResponse({"success": False, "error": "Something went wrong. Please try again."})
+
 MAX_FILE_SIZE = 45 * 1024 * 1024  # 45 MB limit
 
 
@@ -283,7 +355,7 @@ def upload_file_image2image(request):
 
     # Patient exists → extract name
     patient_name = patient.patient_name
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
 
     if request.method == "POST":
         custom_tag_id = request.POST.get("custom-tag-select")
@@ -314,31 +386,32 @@ def upload_file_image2image(request):
             if file_size > MAX_FILE_SIZE:
                 raise ValidationError(f"File size exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit!")
 
-            # Validate file type
-            allowed_file_types = ['image/jpeg', 'image/jpg', 'image/png']
-            if file_type not in allowed_file_types:
-                raise ValidationError("Unsupported file type! Only JPEG and PNG images are allowed.")
-
             # Validate custom tag
             try:
-                tag_obj = CustomTag.objects.get(id=custom_tag_id, is_deleted=False)
+                tag_obj = refdata.get(CustomTag, custom_tag_id)
             except CustomTag.DoesNotExist:
                 raise ValidationError("Invalid custom tag selected.")
 
+            # Type from the file's own bytes; dimensions, hash and EXIF recorded in the same read
+            ingested = ingest.ingest_image(uploaded_file, ingest.IMAGE_UPLOAD_TYPES)
+
             # Save the uploaded file
-            uploaded_image = UploadedImage.objects.create(
-                user=request.user,
-                patient=patient,
-                image_path=uploaded_file,
-                custom_tag=tag_obj,
-                image_size=file_size,
-            )
+            try:
+                uploaded_image = UploadedImage.objects.create(
+                    user=request.user,
+                    patient=patient,
+                    image_path=ingested.file,
+                    custom_tag=tag_obj,
+                    **ingested.fields
+                )
+                ingested.build_renditions(uploaded_image.image_path.name)
+            finally:
+                ingested.close()
+
+            pdf_job = queue_cover_pdf(uploaded_image, request.user)
 
-            if tag_obj and tag_obj.id in [10, 11]:
-              generate_pdf_file(patient, uploaded_image, request.user)
-              
             print("✅ Image successfully uploaded.")
-            return JsonResponse({"success": True, "message": "Image uploaded successfully!"})
+            return JsonResponse({"success": True, "message": "Image uploaded successfully!", "pdf_job_id": pdf_job.id if pdf_job else None})
 
         except ValueError:
             return JsonResponse({"success": False, "error": "UHID must be a valid number!"})
@@ -377,7 +450,7 @@ def upload_file_multi_image2image(request):
 
     # Patient exists → extract name
     patient_name = patient.patient_name
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
     
     # patient = EchsPatientMaster.objects.filter(uhid=uhid).first()
     # patient_name = patient.patient_name
@@ -396,7 +469,7 @@ def upload_file_multi_image2image(request):
 
         # Attempt to fetch/validate the tag object once
         try:
-            tag_obj = CustomTag.objects.get(id=custom_tag_id, is_deleted=False)
+            tag_obj = refdata.get(CustomTag, custom_tag_id)
         except CustomTag.DoesNotExist:
             return JsonResponse({"success": False, "error": "Invalid custom tag selected."})
 
@@ -423,25 +496,26 @@ def upload_file_multi_image2image(request):
                 if file_size > MAX_FILE_SIZE:
                     raise ValidationError(f"\"{file_name}\" exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit!")
 
-                # Validate each file’s MIME type
-                allowed_file_types = ['image/jpeg', 'image/jpg', 'image/png']
-                if file_type not in allowed_file_types:
-                    raise ValidationError(f"\"{file_name}\" unsupported type! Only JPEG/PNG allowed.")
+                # Each file's type from its own bytes (not the browser's MIME type), metadata in the same read
+                ingested = ingest.ingest_image(uploaded_file, ingest.IMAGE_UPLOAD_TYPES)
 
                 # Save this file to the UploadedImage model
-                uploaded_image = UploadedImage.objects.create(
-                    user=request.user,
-                    patient=patient,
-                    image_path=uploaded_file,  # Django will assign a unique name under your upload_to
-                    custom_tag=tag_obj,
-                    image_size=file_size,
-                )
-
-                if tag_obj and tag_obj.id in [10, 11]:
-                    generate_pdf_file(patient, uploaded_image, request.user)
+                try:
+                    uploaded_image = UploadedImage.objects.create(
+                        user=request.user,
+                        patient=patient,
+                        image_path=ingested.file,  # Django will assign a unique name under your upload_to
+                        custom_tag=tag_obj,
+                        **ingested.fields
+                    )
+                    ingested.build_renditions(uploaded_image.image_path.name)
+                finally:
+                    ingested.close()
+
+                pdf_job = queue_cover_pdf(uploaded_image, request.user)
 
                 print(f"✅ \"{file_name}\" uploaded successfully.")
-                results.append({"file": file_name, "success": True})
+                results.append({"file": file_name, "success": True, "pdf_job_id": pdf_job.id if pdf_job else None})
 
             except ValueError:
                 results.append({"file": file_name, "success": False, "error": "UHID must be a valid number!"})
@@ -477,6 +551,134 @@ def upload_file_multi_image2image(request):
     })
 
 
+@login_required
+def job_status(request, job_id):
+    """Progress of a background job (e.g. the cover PDF queued by an image upload)."""
+    job = BackgroundJob.objects.filter(id=job_id).first()
+    # Other users' jobs look missing: their results and errors name rows and files
+    if not job or not jobs.can_view(request.user, job):
+        return JsonResponse({"success": False, "error": "Job not found."}, status=404)
+    return JsonResponse({"success": True, "job": jobs.job_status(job)})
+
+
+# ---------------------------------------------------------------
+# Chunked, resumable uploads (large PDFs / multi-image batches)
+# ---------------------------------------------------------------
+
+@login_required
+def chunked_upload_start(request):
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "POST required."}, status=405)
+
+    try:
+        uhid_int, tag_obj, kind, file_name, file_type, file_size = chunked.validate_start(request.POST, MAX_FILE_SIZE)
+
+        if not EchsPatientMaster.objects.filter(uhid=uhid_int).exists():
+            return JsonResponse({"success": False, "error": "Patient not found!"})
+
+        session = chunked.start_session(
+            request.user, "echs", kind, uhid_int, tag_obj,
+            file_name, file_size, file_type, request.POST.get("sha256", "")
+        )
+
+        print(f"Chunked upload started: {session}")
+        return JsonResponse({
+            "success": True,
+            "session_id": str(session.session_id),
+            "chunk_size": session.chunk_size,
+            "total_chunks": session.total_chunks,
+        })
+
+    except ValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)})
+    except Exception:
+        print("❌ ERROR OCCURRED:", traceback.format_exc())
+        return JsonResponse({"success": False, "error": "Something went wrong. Please try again."})
+
+
+@login_required
+def chunked_upload_part(request, session_id, index):
+    if request.method not in ("POST", "PUT"):
+        return JsonResponse({"success": False, "error": "POST or PUT required."}, status=405)
+
+    try:
+        session = chunked.get_open_session(request.user, "echs", session_id)
+        chunked.write_part(session, index, request, request.headers.get("X-Chunk-SHA256"))
+        return JsonResponse({"success": True, "part": index})
+
+    except ValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)})
+    except Exception:
+        print("❌ ERROR OCCURRED:", traceback.format_exc())
+        return JsonResponse({"success": False, "error": "Something went wrong. Please try again."})
+
+
+@login_required
+def chunked_upload_status(request, session_id):
+    try:
+        session = chunked.get_open_session(request.user, "echs", session_id)
+    except ValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)})
+
+    return JsonResponse({
+        "success": True,
+        "chunk_size": session.chunk_size,
+        "total_chunks": session.total_chunks,
+        "received": chunked.received_parts(session),
+    })
+
+
+@login_required
+def chunked_upload_commit(request, session_id):
+    if request.method != "POST":
+        return JsonResponse({"success": False, "error": "POST required."}, status=405)
+
+    try:
+        # Session locked until the row exists, so a repeated commit cannot create it twice
+        with chunked.committing(request.user, "echs", session_id) as session:
+            patient = EchsPatientMaster.objects.filter(uhid=session.uhid).first()
+            if not patient:
+                raise ValidationError("Patient not found!")  # Leaves the session open
+
+            assembled = chunked.assemble(session)
+            tag_obj = session.custom_tag
+
+            try:
+                if session.kind == "pdf":
+                    UploadedFile.objects.create(
+                        user=request.user,
+                        patient=patient,
+                        file_path=assembled,
+                        custom_tag=tag_obj,
+                        file_size=session.file_size,
+                        file_type=session.file_type
+                    )
+                else:
+                    ingested = ingest.ingest_image(assembled, ingest.IMAGE_UPLOAD_TYPES)
+                    uploaded_image = UploadedImage.objects.create(
+                        user=request.user,
+                        patient=patient,
+                        image_path=ingested.file,
+                        custom_tag=tag_obj,
+                        **ingested.fields
+                    )
+                    ingested.build_renditions(uploaded_image.image_path.name)
+                    ingested.close()
+
+                    queue_cover_pdf(uploaded_image, request.user)
+            finally:
+                assembled.close()
+
+        print(f"✅ \"{session.file_name}\" uploaded successfully (chunked).")
+        return JsonResponse({"success": True, "message": "File uploaded successfully!"})
+
+    except ValidationError as e:
+        return JsonResponse({"success": False, "error": str(e)})
+    except Exception:
+        print("❌ ERROR OCCURRED:", traceback.format_exc())
+        return JsonResponse({"success": False, "error": "Something went wrong. Please try again."})
+
+
 
 @login_required
 def upload_file_image2pdf(request):
@@ -500,61 +702,58 @@ def upload_file_image2pdf(request):
     # Patient exists → extract name
     patient_name = patient.patient_name
 
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
 
     if request.method == "POST":
         custom_tag_id = request.POST.get("custom-tag-select")
-        uploaded_file = request.FILES.get("file")
+        # Page images arrive as "files" (one per page); a single ready-made PDF may still come as "file"
+        uploaded_files = request.FILES.getlist("files") or request.FILES.getlist("file")
 
         if not custom_tag_id:
             return JsonResponse({"success": False, "error": "Custom tag is required!"})
 
-        if not uploaded_file:
+        if not uploaded_files:
             return JsonResponse({"success": False, "error": "No file uploaded!"})
 
-        file_size = uploaded_file.size
-        file_type = uploaded_file.content_type
-
         print(f"Received UHID (from GET): {uhid}")
-        print(f"Received File: {uploaded_file}")
+        print(f"Received Files: {[f.name for f in uploaded_files]}")
         print(f"Received Custom Tag: {custom_tag_id}")
-        print(f"File Size: {file_size} bytes")
-        print(f"File Type: {file_type}")
 
         try:
             uhid_int = int(uhid)
             if uhid_int > 2147483647 or uhid_int < -2147483648:
                 raise ValidationError("UHID is too large or invalid!")
 
-            if file_size > MAX_FILE_SIZE:
-                raise ValidationError(f"File size exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit!")
-
-            allowed_file_types = [
-                'application/pdf',
-                'image/jpeg',
-                'image/jpg',
-                'image/png'
-            ]
-            if file_type not in allowed_file_types:
-                raise ValidationError("Unsupported file type! Allowed types: PDF, JPEG, PNG.")
-
             # ✅ Lookup tag by ID if present
             tag_obj = None
             if custom_tag_id:
                 try:
-                    tag_obj = CustomTag.objects.get(id=custom_tag_id, is_deleted=False)
+                    tag_obj = refdata.get(CustomTag, custom_tag_id)
                 except CustomTag.DoesNotExist:
                     raise ValidationError("Invalid custom tag selected.")
 
-            # Save the uploaded file to the database
-            UploadedFile.objects.create(
-                user=request.user,
-                patient=patient,
-                file_path=uploaded_file,
-                custom_tag=tag_obj,
-                file_size=file_size,
-                file_type=file_type
-            )
+            if len(uploaded_files) == 1 and uploaded_files[0].content_type == 'application/pdf':
+                # Already a PDF (older clients convert in the browser): store it as is
+                pdf_file = uploaded_files[0]
+                if pdf_file.size > MAX_FILE_SIZE:
+                    raise ValidationError(f"File size exceeds the {MAX_FILE_SIZE // (1024 * 1024)}MB limit!")
+            else:
+                # One PDF page per image, JPEGs embedded without re-encoding
+                pdf_file = ingest.images_to_pdf_upload(uploaded_files, MAX_FILE_SIZE)
+
+            print(f"📄 PDF ready: {pdf_file.size} bytes from {len(uploaded_files)} file(s)")
+
+            try:
+                UploadedFile.objects.create(
+                    user=request.user,
+                    patient=patient,
+                    file_path=pdf_file,
+                    custom_tag=tag_obj,
+                    file_size=pdf_file.size,
+                    file_type="application/pdf"
+                )
+            finally:
+                pdf_file.close()
 
             print("✅ File successfully uploaded.")
             return JsonResponse({"success": True, "message": "File uploaded successfully!"})
@@ -596,7 +795,7 @@ def upload_file_pdf2pdf(request):
 
     # Patient exists → extract name
     patient_name = patient.patient_name
-    custom_tags = CustomTag.objects.filter(is_deleted=False).order_by('name')
+    custom_tags = refdata.active(CustomTag)
 
     if request.method == "POST":
         custom_tag_id = request.POST.get("custom-tag-select")
@@ -620,7 +819,7 @@ def upload_file_pdf2pdf(request):
 
         # Validate custom tag
         try:
-            tag_obj = CustomTag.objects.get(id=custom_tag_id, is_deleted=False)
+            tag_obj = refdata.get(CustomTag, custom_tag_id)
         except CustomTag.DoesNotExist:
             return JsonResponse({"success": False, "error": "Invalid custom tag selected."})
 
@@ -695,35 +894,15 @@ def view_images_home(request, uhid):
         
     patient_name = patient.patient_name
 
-    # Fetch and optimize related fields
-    captured_images = CapturedImage.objects.filter(patient__uhid=uhid, is_deleted=False).select_related(
-        'user__designation', 'user__department', 'patient'
-    ).order_by('-timestamp')
-
-    uploaded_images = UploadedImage.objects.filter(patient__uhid=uhid, is_deleted=False).select_related(
-        'user__designation', 'user__department', 'patient'
-    ).order_by('-timestamp')
-
-        
-    # Add metadata and tag image type
-    for image in captured_images:
-        image.source_type = 'captured'
-
-    for image in uploaded_images:
-        image.source_type = 'uploaded'
-
-    # Merge and sort
-    all_images = sorted(
-        chain(captured_images, uploaded_images),
-        key=attrgetter('timestamp'),
-        reverse=True
-    )
+    # One indexed query on the media catalog, a page at a time
+    page_obj = Paginator(catalog.image_listing('echs', uhid), catalog.CATALOG_PAGE_SIZE).get_page(request.GET.get('page'))
+    all_images = page_obj.object_list
 
     for image in all_images:
         # Calculate size in KB and MB
         try:
-            if image.image_size:
-                size = int(image.image_size)
+            if image.size:
+                size = int(image.size)
                 image.image_size_kb = round(size / 1024, 2)
                 image.image_size_mb = round(image.image_size_kb / 1024, 2)
             else:
@@ -732,13 +911,14 @@ def view_images_home(request, uhid):
         except Exception as e:
             image.image_size_kb = None
             image.image_size_mb = None
-            print(f"[ERROR] Invalid image size for image ID {image.id}: {e}")
+            print(f"[ERROR] Invalid image size for image ID {image.object_id}: {e}")
 
-        # Extract filename
-        image.filename = os.path.basename(image.image_path.name)
+        # Thumbnail for the grid, medium preview for the full view; the original stays linked
+        image.thumb_url = reverse('echs:image_rendition', args=[image.source_type, image.object_id, 'thumb'])
+        image.preview_url = reverse('echs:image_rendition', args=[image.source_type, image.object_id, 'medium'])
 
         # Add location info for captured images
-        if isinstance(image, CapturedImage):
+        if image.kind == 'captured_image':
             image.location = f"{image.latitude}, {image.longitude}" if image.latitude and image.longitude else "Unknown Location"
         else:
             image.location = "Uploaded (no location)"
@@ -754,7 +934,7 @@ def view_images_home(request, uhid):
 
         # 🔍 Debug Logging
         print("=" * 50)
-        print(f"Image ID: {image.id} | Source: {image.source_type.upper()}")
+        print(f"Image ID: {image.object_id} | Source: {image.source_type.upper()}")
         print(f"User: {image.user_full_name}")
         print(f"Designation: {image.user_designation or ''} ({image.user_designation_other or ''})")
         print(f"Department: {image.user_department or ''} ({image.user_department_other or ''})")
@@ -766,11 +946,45 @@ def view_images_home(request, uhid):
     return render(request, 'echs/view_images.html', {
         'uhid': uhid,
         'images': all_images,
+        'page_obj': page_obj,
         'patient_name': patient_name
     })
 
 
 
+@login_required
+def image_rendition(request, model, id, size):
+    """Serve a cached thumbnail/preview of a captured or uploaded image, building it on first request."""
+    if model == "captured":
+        obj_model = CapturedImage
+    elif model == "uploaded":
+        obj_model = UploadedImage
+    else:
+        raise Http404("Invalid model type.")
+
+    if size not in renditions.RENDITION_SIZES:
+        raise Http404("Invalid size.")
+
+    image = get_object_or_404(obj_model, id=id)
+    if not image.image_path:
+        raise Http404("Image not found.")
+
+    # Same rule as the full-size file (soft-deleted images only for whoever deleted them)
+    if not media.can_access(request.user, image):
+        print(f"[WARN] {request.user} denied access to {size} rendition of image ID {image.id}")
+        return HttpResponse("You do not have permission to view this file.", status=403)
+
+    try:
+        path = renditions.get_rendition(image.image_path.name, size)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Could not build {size} rendition for image ID {image.id}: {e}")
+        raise Http404("Image not found.")
+
+    # The cache key changes whenever the source changes, so browsers may keep it
+    return media.file_response(request, path, renditions.rendition_content_type(), cache_control="private, max-age=604800")
+
+
+
 @login_required
 def download_all_images(request, uhid):
     """
@@ -789,24 +1003,9 @@ def download_all_images(request, uhid):
         reverse=True
     )
 
-    # Prepare ZIP response
+    # Served from the per-UHID archive cache; only new images get compressed
     zip_filename = f"UHID_{uhid}_images.zip"
-    response = HttpResponse(content_type="application/zip")
-    response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
-
-    with zipfile.ZipFile(response, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for image in all_images:
-            if image.image_path:  # Ensure path exists
-                try:
-                    file_path = image.image_path.path  # Absolute path
-                    filename = os.path.basename(file_path) # Original filename
-
-                    # Write the file to the ZIP archive with its original name
-                    zip_file.write(file_path, arcname=filename)
-                except Exception as e:
-                    print(f"[ERROR] Could not add image ID {image.id} to ZIP: {e}")
-
-    return response
+    return archives.cached_zip_response(request, "echs", uhid, "images", field_entries(all_images, 'image_path'), zip_filename)
 
 
 
@@ -906,6 +1105,8 @@ def delete_image(request, model, id):
     # --------------------------
     # Soft delete Image instance
     # --------------------------
+    renditions.invalidate_renditions(image.image_path.name)
+
     image.is_deleted = True
     image.deleted_on = timezone.now()
     image.deleted_by = request.user
@@ -933,9 +1134,9 @@ def view_files_home_uhid(request, uhid):
     files = UploadedFile.objects.filter(patient=patient,is_deleted=False).order_by('-timestamp')
 
     for file in files:
-        # Calculate sizes
-        file.file_size_kb = round(file.file_path.size / 1024, 2)  # Convert to KB
-        file.file_size_mb = round(file.file_path.size / (1024 * 1024), 2)  # Convert to MB
+        # Sizes from the stored column; listings never stat the file (media_integrity keeps it right)
+        file.file_size_kb = round(file.file_size / 1024, 2) if file.file_size is not None else None  # Convert to KB
+        file.file_size_mb = round(file.file_size / (1024 * 1024), 2) if file.file_size is not None else None  # Convert to MB
 
         # Convert timestamp to local timezone and format nicely: "12-May-2025 10:15 AM"
         local_timestamp = timezone.localtime(file.timestamp)
@@ -946,10 +1147,8 @@ def view_files_home_uhid(request, uhid):
         print(f"🌐 File URL: {file.file_path.url}")
         print(f"📂 File Path: {file.file_path.path}")
         
-        # Check if file actually exists on disk
-        if os.path.exists(file.file_path.path):
-            print(f"✅ File exists: {file.file_path.path}")
-        else:
+        # Missing files are flagged by the background integrity check
+        if file.missing_since:
             print(f"❌ Missing file: {file.file_path.path}")
 
     return render(request, 'echs/view_files.html', {
@@ -972,18 +1171,7 @@ def download_all_files(request, uhid):
     # files = get_list_or_404(UploadedFile, uhid=uhid)  # Get all files for UHID
 
     zip_filename = f"UHID_{uhid}_files.zip"
-    response = HttpResponse(content_type="application/zip")
-    response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
-
-    with zipfile.ZipFile(response, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for file in files:
-            if file.file_path:  # Ensure file exists
-                file_path = file.file_path.path  # Absolute file path
-                filename = os.path.basename(file_path)  # Retain original filename
-                
-                zip_file.write(file_path, filename)
-
-    return response
+    return archives.cached_zip_response(request, "echs", uhid, "files", field_entries(files, 'file_path'), zip_filename)
 
 
 @login_required
@@ -1055,9 +1243,9 @@ def view_other_files(request, uhid):
     files = OtherUploadedFile.objects.filter(patient=patient, is_deleted=False).order_by('-timestamp')
 
     for file in files:
-        # Calculate sizes
-        file.file_size_kb = round(file.file_path.size / 1024, 2)  # Convert to KB
-        file.file_size_mb = round(file.file_path.size / (1024 * 1024), 2)  # Convert to MB
+        # Sizes from the stored column; listings never stat the file (media_integrity keeps it right)
+        file.file_size_kb = round(file.file_size / 1024, 2) if file.file_size is not None else None  # Convert to KB
+        file.file_size_mb = round(file.file_size / (1024 * 1024), 2) if file.file_size is not None else None  # Convert to MB
 
         # Convert timestamp to local timezone and format nicely: "12-May-2025 10:15 AM"
         local_timestamp = timezone.localtime(file.timestamp)
@@ -1068,10 +1256,8 @@ def view_other_files(request, uhid):
         print(f"🌐 File URL: {file.file_path.url}")
         print(f"📂 File Path: {file.file_path.path}")
         
-        # Check if file actually exists on disk
-        if os.path.exists(file.file_path.path):
-            print(f"✅ File exists: {file.file_path.path}")
-        else:
+        # Missing files are flagged by the background integrity check
+        if file.missing_since:
             print(f"❌ Missing file: {file.file_path.path}")
 
     return render(request, 'echs/view_other_files.html', {
@@ -1089,18 +1275,44 @@ def download_all_other_files(request, uhid):
     files = OtherUploadedFile.objects.filter(patient=patient, is_deleted=False)
 
     zip_filename = f"UHID_{uhid}_files.zip"
-    response = HttpResponse(content_type="application/zip")
-    response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
+    return archives.cached_zip_response(request, "echs", uhid, "other", field_entries(files, 'file_path'), zip_filename)
+
+
 
-    with zipfile.ZipFile(response, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for file in files:
-            if file.file_path:  # Ensure file exists
-                file_path = file.file_path.path  # Absolute file path
-                filename = os.path.basename(file_path)  # Retain original filename
-                
-                zip_file.write(file_path, filename)
+@login_required
+def patient_dossier(request, uhid):
+    """
+    One PDF with every active document of the patient: uploaded PDFs, other
+    files (cover sheets, ...) and images, ordered by timestamp then tag.
+    Streamed page by page; cached until the patient's file set changes.
+    """
+    patient = get_object_or_404(EchsPatientMaster, uhid=uhid)
+
+    documents = chain(
+        ((obj, obj.file_path) for obj in UploadedFile.objects.filter(patient=patient, is_deleted=False).select_related('custom_tag')),
+        ((obj, obj.file_path) for obj in OtherUploadedFile.objects.filter(patient=patient, is_deleted=False).select_related('custom_tag')),
+        ((obj, obj.image_path) for obj in CapturedImage.objects.filter(patient=patient, is_deleted=False).select_related('custom_tag')),
+        ((obj, obj.image_path) for obj in UploadedImage.objects.filter(patient=patient, is_deleted=False).select_related('custom_tag')),
+    )
 
-    return response
+    entries = []
+    for obj, field in sorted(documents, key=lambda doc: (doc[0].timestamp, doc[0].custom_tag.name if doc[0].custom_tag else "")):
+        if not field:
+            continue
+        try:
+            file_path = field.path
+        except Exception as e:
+            print(f"[ERROR] Could not resolve path for ID {obj.id}: {e}")
+            continue
+        tag = f"{obj.custom_tag.name} - " if obj.custom_tag else ""
+        entries.append((file_path, f"{tag}{os.path.basename(file_path)}"))
+
+    print(f"📚 Dossier for UHID {uhid}: {len(entries)} documents")
+    return archives.cached_stream_response(
+        request, "echs", uhid, "dossier", entries, stream_pdf,
+        f"UHID_{uhid}_dossier.pdf", "application/pdf",
+        use_cache=getattr(settings, 'DOSSIER_CACHE_ENABLED', True),
+    )
 
 
 
@@ -1164,8 +1376,8 @@ def view_deleted_items(request, uhid):
         size_kb = None
         size_mb = None
 
-        if path and os.path.exists(path):
-            file_size = os.path.getsize(path)
+        file_size = f.file_size if f.source_type == "pdf" else f.image_size
+        if file_size is not None:
             size_kb = round(file_size / 1024, 2)
             size_mb = round(file_size / (1024 * 1024), 2)
 
@@ -1179,6 +1391,7 @@ def view_deleted_items(request, uhid):
             "formatted_datetime": formatted_datetime,
             "file_size_kb": size_kb,
             "file_size_mb": size_mb,
+            "missing_since": f.missing_since,
             "file_type": file_type,
             "source": f.source_type,
             "file_url": url,
@@ -1220,6 +1433,10 @@ def restore_item(request, file_id, source):
 
     obj = get_object_or_404(model, id=file_id)
 
+    # Thumbnails are rebuilt on the next gallery view
+    if source in ("captured", "uploaded") and obj.image_path:
+        renditions.invalidate_renditions(obj.image_path.name)
+
     obj.is_deleted = False
     obj.deleted_by = None
     obj.deleted_on = None
@@ -1256,7 +1473,7 @@ def restore_physical_file(obj):
    
     deleted_folder = os.path.join(
         settings.MEDIA_ROOT,
-        f"UHID_{obj.patient.uhid}",
+        uhid_dir(obj.patient.uhid),
         f"UHID_{obj.patient.uhid}_deleted_files"
     )
 
@@ -1278,18 +1495,15 @@ def restore_physical_file(obj):
     if not os.path.exists(deleted_path):
         return False
 
-    original_folder = os.path.join(settings.MEDIA_ROOT, obj.folder_path)
-    os.makedirs(original_folder, exist_ok=True)
-    new_path = os.path.join(original_folder, filename)
+    deleted_name = os.path.relpath(deleted_path, settings.MEDIA_ROOT)
+    original_name = os.path.join(obj.folder_path, filename)
 
+    # Move rather than copy + remove so a deduplicated blob is never duplicated or dropped
     try:
-        shutil.copy2(deleted_path, new_path)
-        time.sleep(0.2) 
-        os.remove(deleted_path)
+        rel_path = move_media(deleted_name, original_name)
     except PermissionError:
         return False
 
-    rel_path = os.path.relpath(new_path, settings.MEDIA_ROOT).replace("\\", "/")
     setattr(obj, field_name, rel_path)
     obj.save(update_fields=[field_name])
 
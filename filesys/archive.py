@@ -0,0 +1,90 @@
+import os
+import zipfile
+
+
+# Already-compressed formats gain almost nothing from deflate, so store them as-is
+STORED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp', 'pdf'}
+
+# Bytes read from disk per write into the archive
+CHUNK_SIZE = 64 * 1024
+
+
+class StreamBuffer:
+    """Write-only file object that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def compress_type_for(filename):
+    ext = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    return zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive piece by piece.
+
+    `entries` is an iterable of (absolute_path, arcname) pairs. Only one
+    CHUNK_SIZE block of a file is held in memory at a time. Missing or
+    unreadable files are skipped.
+    """
+    buffer = StreamBuffer()
+
+    with zipfile.ZipFile(buffer, 'w', allowZip64=True) as zip_file:
+        for file_path, arcname in entries:
+            try:
+                zinfo = zipfile.ZipInfo.from_file(file_path, arcname=arcname)
+                zinfo.compress_type = compress_type_for(arcname)
+
+                with open(file_path, 'rb') as src, zip_file.open(zinfo, 'w', force_zip64=zinfo.file_size > zipfile.ZIP64_LIMIT) as dest:
+                    while True:
+                        block = src.read(CHUNK_SIZE)
+                        if not block:
+                            break
+                        dest.write(block)
+                        data = buffer.drain()
+                        if data:
+                            yield data
+            except OSError as e:
+                print(f"[ERROR] Could not add {file_path} to ZIP: {e}")
+
+            data = buffer.drain()
+            if data:
+                yield data
+
+    # Central directory is written when the archive is closed
+    data = buffer.drain()
+    if data:
+        yield data
+
+
+def field_entries(objects, field_name):
+    """Yield (absolute_path, basename) for the file field `field_name` of each object."""
+    for obj in objects:
+        field = getattr(obj, field_name)
+        if not field:
+            continue
+        try:
+            file_path = field.path
+        except Exception as e:
+            print(f"[ERROR] Could not resolve path for ID {obj.id}: {e}")
+            continue
+        yield file_path, os.path.basename(file_path)
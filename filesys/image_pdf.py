@@ -0,0 +1,201 @@
+"""
+Wrap one or many images into a single PDF, one page per image.
+
+JPEG files are embedded as-is (DCTDecode): their bytes are copied into the
+PDF in CHUNK_SIZE blocks and never decoded or re-encoded, and EXIF rotation
+becomes the page's /Rotate. Other formats (PNG, ...) are decoded with Pillow
+and stored losslessly with FlateDecode, one strip of rows at a time. Pages
+are written to the output file as they are added, so memory stays flat
+however many pages there are.
+"""
+import zlib
+
+from PIL import Image, ImageOps
+
+
+CHUNK_SIZE = 64 * 1024
+STRIP_ROWS = 256
+DEFAULT_DPI = 72  # Page size in points equals the pixel size unless the file says otherwise
+PAGE_MARGIN = 24  # Points around an image fitted onto a fixed page size
+
+EXIF_ORIENTATION = 0x0112
+# EXIF orientation -> clockwise page rotation; mirrored orientations are re-encoded instead
+ORIENTATION_ROTATE = {1: 0, 3: 180, 6: 90, 8: 270}
+
+JPEG_COLORSPACES = {'RGB': '/DeviceRGB', 'L': '/DeviceGray'}
+
+
+class ImagePdfWriter:
+    """Minimal streaming PDF writer; call add_image() per page, then close()."""
+
+    def __init__(self, fileobj):
+        self.out = fileobj
+        self.offset = 0
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 3  # 1 = catalog, 2 = page tree (written last)
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.out.write(data)
+        self.offset += len(data)
+
+    def _reserve(self):
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def _begin(self, obj_id):
+        self.offsets[obj_id] = self.offset
+        self._write(f"{obj_id} 0 obj\n".encode())
+
+    def _object(self, obj_id, body):
+        self._begin(obj_id)
+        self._write(body.encode() + b"\nendobj\n")
+
+    def add_image(self, source, page_size=None):
+        """
+        `source` is a path or a binary file object (e.g. an UploadedFile).
+        By default the page is the image's own size; with `page_size` (points, e.g. A4)
+        the image is scaled down to fit a page of that size, turned to match its orientation.
+        """
+        image = Image.open(source)
+        try:
+            dpi_x, dpi_y = image.info.get('dpi', (DEFAULT_DPI, DEFAULT_DPI))
+            dpi_x = dpi_x or DEFAULT_DPI
+            dpi_y = dpi_y or DEFAULT_DPI
+            orientation = image.getexif().get(EXIF_ORIENTATION, 1)
+
+            if (image.format == 'JPEG' and image.mode in JPEG_COLORSPACES
+                    and orientation in ORIENTATION_ROTATE):
+                width, height = image.size
+                image_id = self._add_jpeg(source, image)
+                rotate = ORIENTATION_ROTATE[orientation]
+            else:
+                if orientation != 1:
+                    image = ImageOps.exif_transpose(image)
+                width, height = image.size
+                image_id = self._add_flate(image)
+                rotate = 0
+        finally:
+            image.close()
+
+        self._add_page(image_id, width * 72.0 / dpi_x, height * 72.0 / dpi_y, rotate, page_size)
+
+    def _add_jpeg(self, source, image):
+        width, height = image.size
+        if isinstance(source, str):
+            stream = open(source, 'rb')
+            close_after = True
+        else:
+            stream = source
+            close_after = False
+
+        try:
+            stream.seek(0, 2)
+            length = stream.tell()
+            stream.seek(0)
+
+            image_id = self._reserve()
+            self._begin(image_id)
+            self._write((
+                f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                f"/ColorSpace {JPEG_COLORSPACES[image.mode]} /BitsPerComponent 8 "
+                f"/Filter /DCTDecode /Length {length} >>\nstream\n"
+            ).encode())
+            while True:
+                block = stream.read(CHUNK_SIZE)
+                if not block:
+                    break
+                self._write(block)
+            self._write(b"\nendstream\nendobj\n")
+        finally:
+            if close_after:
+                stream.close()
+        return image_id
+
+    def _add_flate(self, image):
+        if image.mode in ('RGBA', 'LA', 'P', 'PA'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        width, height = image.size
+        colorspace = '/DeviceGray' if image.mode == 'L' else '/DeviceRGB'
+
+        image_id = self._reserve()
+        length_id = self._reserve()
+        self._begin(image_id)
+        self._write((
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace {colorspace} /BitsPerComponent 8 "
+            f"/Filter /FlateDecode /Length {length_id} 0 R >>\nstream\n"
+        ).encode())
+
+        start = self.offset
+        compressor = zlib.compressobj(6)
+        for top in range(0, height, STRIP_ROWS):
+            strip = image.crop((0, top, width, min(top + STRIP_ROWS, height)))
+            self._write(compressor.compress(strip.tobytes()))
+            strip.close()
+        self._write(compressor.flush())
+        length = self.offset - start
+
+        self._write(b"\nendstream\nendobj\n")
+        self._object(length_id, str(length))
+        return image_id
+
+    def _add_page(self, image_id, width_pt, height_pt, rotate, page_size=None):
+        x = y = 0
+        page_w, page_h = width_pt, height_pt
+        if page_size:
+            page_w, page_h = page_size
+            if (width_pt > height_pt) != (page_w > page_h):
+                page_w, page_h = page_h, page_w
+            scale = min((page_w - 2 * PAGE_MARGIN) / width_pt, (page_h - 2 * PAGE_MARGIN) / height_pt, 1)
+            width_pt, height_pt = width_pt * scale, height_pt * scale
+            x, y = (page_w - width_pt) / 2, (page_h - height_pt) / 2
+
+        content = f"q {width_pt:.2f} 0 0 {height_pt:.2f} {x:.2f} {y:.2f} cm /Im0 Do Q".encode()
+        content_id = self._reserve()
+        self._begin(content_id)
+        self._write(f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream\nendobj\n")
+
+        page_id = self._reserve()
+        rotate_entry = f" /Rotate {rotate}" if rotate else ""
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w:.2f} {page_h:.2f}]{rotate_entry} "
+            f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        if not self.page_ids:
+            raise ValueError("No pages were added to the PDF.")
+
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>")
+        self._object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref_offset = self.offset
+        size = self.next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            if obj_id in self.offsets:
+                lines.append(f"{self.offsets[obj_id]:010d} 00000 n \n")
+            else:
+                lines.append("0000000000 00001 f \n")  # Reserved but never written (a skipped page)
+        self._write("".join(lines).encode())
+        self._write(f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode())
+
+
+def images_to_pdf(sources, fileobj):
+    """Write every image in `sources` (paths or file objects) as one page of a PDF into `fileobj`."""
+    writer = ImagePdfWriter(fileobj)
+    for source in sources:
+        writer.add_image(source)
+    writer.close()
+    return writer.offset
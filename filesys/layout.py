@@ -0,0 +1,54 @@
+import hashlib
+import os
+import re
+
+from django.conf import settings
+
+
+# Number of hash-prefix directory levels above UHID_<n> (0 keeps UHID_<n> directly under MEDIA_ROOT)
+MEDIA_SHARD_DEPTH = getattr(settings, 'MEDIA_SHARD_DEPTH', 0)
+# Hex characters per level; 2 gives 256 directories per level
+MEDIA_SHARD_WIDTH = getattr(settings, 'MEDIA_SHARD_WIDTH', 2)
+
+UHID_DIR_RE = re.compile(r'^UHID_(\d+)$')
+
+
+def shard_prefix(uhid, depth=None):
+    """Hash-prefix directories for a UHID, e.g. "3f/a2" for depth 2 ("" when depth is 0)."""
+    depth = MEDIA_SHARD_DEPTH if depth is None else depth
+    digest = hashlib.md5(str(uhid).encode()).hexdigest()
+    w = MEDIA_SHARD_WIDTH
+    return "/".join(digest[i * w:(i + 1) * w] for i in range(depth))
+
+
+def uhid_dir(uhid, depth=None):
+    """Relative directory (under MEDIA_ROOT) holding every file of a UHID."""
+    prefix = shard_prefix(uhid, depth)
+    return f"{prefix}/UHID_{uhid}" if prefix else f"UHID_{uhid}"
+
+
+def find_uhid_dirs(depth):
+    """Yield (uhid, relative_dir) for every UHID_<n> directory laid out at `depth` levels."""
+    levels = [""]
+    for _ in range(depth):
+        next_levels = []
+        for level in levels:
+            try:
+                names = sorted(os.listdir(os.path.join(settings.MEDIA_ROOT, level)))
+            except FileNotFoundError:
+                continue
+            for name in names:
+                if len(name) == MEDIA_SHARD_WIDTH and all(c in '0123456789abcdef' for c in name):
+                    next_levels.append(f"{level}/{name}" if level else name)
+        levels = next_levels
+
+    for level in levels:
+        base = os.path.join(settings.MEDIA_ROOT, level)
+        try:
+            names = sorted(os.listdir(base))
+        except FileNotFoundError:
+            continue
+        for name in names:
+            match = UHID_DIR_RE.match(name)
+            if match and os.path.isdir(os.path.join(base, name)):
+                yield int(match.group(1)), (f"{level}/{name}" if level else name)
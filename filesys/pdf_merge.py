@@ -0,0 +1,198 @@
+"""
+Merge PDFs and images into one PDF that is streamed out page by page.
+
+Extends the ImagePdfWriter: images go through add_image() (fitted on an A4
+page), and each page of a source PDF is copied with its resources, with
+object numbers remapped into the output file. Only one source document is
+open at a time and each page is written out before the next is read, so
+memory stays bounded by the largest single page, not the whole dossier.
+
+Annotations (links, form fields) and document-level structure (outlines,
+tags) of the sources are not carried over; page content is.
+"""
+import os
+from io import BytesIO
+
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+from .archive import StreamBuffer
+from .image_pdf import ImagePdfWriter
+
+
+A4 = (595.28, 841.89)
+
+PDF_EXTENSIONS = {'pdf'}
+
+# Page entries copied from a source page; /Parent is rewritten and /Annots dropped
+PAGE_KEYS = {
+    '/Type', '/MediaBox', '/CropBox', '/BleedBox', '/TrimBox', '/ArtBox',
+    '/Rotate', '/UserUnit', '/Resources', '/Contents', '/Group',
+}
+
+# Objects that would pull the source's page tree into the output if followed
+SKIPPED_TYPES = {'/Page', '/Pages', '/Catalog'}
+
+
+def pdf_string(text):
+    text = str(text).encode('latin-1', 'replace').decode('latin-1')
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+class PdfMergeWriter(ImagePdfWriter):
+    """ImagePdfWriter that can also copy the pages of existing PDFs and add plain text notice pages."""
+
+    def __init__(self, fileobj):
+        super().__init__(fileobj)
+        self.font_id = None
+
+    def add_pdf(self, source):
+        """
+        Copy every page of the PDF at `source`. This is a generator: it yields
+        after each page so the caller can flush the output in between.
+        """
+        reader = PdfReader(source)
+        if reader.is_encrypted:
+            # Most "protected" hospital PDFs only carry an owner password
+            if not reader.decrypt(''):
+                raise ValueError("PDF is password protected")
+
+        ref_map = {}
+        for page in reader.pages:
+            self._copy_page(page, ref_map)
+            yield
+
+    def _copy_page(self, page, ref_map):
+        # Objects are collected first so a page that fails halfway leaves nothing behind
+        objects = []
+        snapshot = dict(ref_map)
+        try:
+            page_id = self._reserve()
+            pending = []
+            entries = ["/Type /Page", "/Parent 2 0 R"]
+            for key, value in page.items():
+                if key in PAGE_KEYS and key != '/Type':
+                    entries.append(f"{key} {self._serialize(value, ref_map, pending)}")
+            objects.append((page_id, ("<< " + " ".join(entries) + " >>").encode()))
+
+            while pending:
+                ref = pending.pop()
+                obj_id = ref_map[(ref.idnum, ref.generation)]
+                objects.append((obj_id, self._serialize_object(ref.get_object(), ref_map, pending)))
+        except Exception:
+            ref_map.clear()
+            ref_map.update(snapshot)
+            raise
+
+        for obj_id, body in objects:
+            self._begin(obj_id)
+            self._write(body + b"\nendobj\n")
+        self.page_ids.append(page_id)
+
+    def _serialize_object(self, obj, ref_map, pending):
+        """Body of a top-level object: streams get their data written with a direct /Length."""
+        if isinstance(obj, StreamObject):
+            data = obj._data
+            entries = [
+                f"{key} {self._serialize(value, ref_map, pending)}"
+                for key, value in obj.items() if key != '/Length'
+            ]
+            entries.append(f"/Length {len(data)}")
+            header = "<< " + " ".join(entries) + " >>\nstream\n"
+            return header.encode() + data + b"\nendstream"
+        return self._serialize(obj, ref_map, pending).encode('latin-1')
+
+    def _serialize(self, obj, ref_map, pending):
+        if isinstance(obj, IndirectObject):
+            key = (obj.idnum, obj.generation)
+            if key not in ref_map:
+                target = obj.get_object()
+                if isinstance(target, DictionaryObject) and target.get('/Type') in SKIPPED_TYPES:
+                    return "null"
+                ref_map[key] = self._reserve()
+                pending.append(obj)
+            return f"{ref_map[key]} 0 R"
+
+        if isinstance(obj, StreamObject):
+            raise ValueError("Direct stream object in PDF")
+
+        if isinstance(obj, DictionaryObject):
+            entries = [
+                f"{key} {self._serialize(value, ref_map, pending)}"
+                for key, value in obj.items() if key not in ('/Parent', '/Annots')
+            ]
+            return "<< " + " ".join(entries) + " >>"
+
+        if isinstance(obj, ArrayObject):
+            return "[" + " ".join(self._serialize(item, ref_map, pending) for item in obj) + "]"
+
+        buffer = BytesIO()
+        obj.write_to_stream(buffer)
+        return buffer.getvalue().decode('latin-1')
+
+    def add_notice(self, lines, page_size=A4):
+        """Add a page of plain text (used in place of a document that could not be included)."""
+        if self.font_id is None:
+            self.font_id = self._reserve()
+            self._object(self.font_id, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+        width, height = page_size
+        text = ["BT", "/F1 12 Tf", "16 TL", f"56 {height - 72:.2f} Td"]
+        for line in lines:
+            text.append(f"{pdf_string(line)} Tj T*")
+        text.append("ET")
+        content = "\n".join(text).encode('latin-1')
+
+        content_id = self._reserve()
+        self._begin(content_id)
+        self._write(f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream\nendobj\n")
+
+        page_id = self._reserve()
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+            f"/Resources << /Font << /F1 {self.font_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ))
+        self.page_ids.append(page_id)
+
+
+def is_pdf(path):
+    return path.rsplit('.', 1)[-1].lower() in PDF_EXTENSIONS if '.' in path else False
+
+
+def stream_pdf(entries, page_size=A4):
+    """
+    Yield one PDF made of every entry, in order.
+
+    `entries` is an iterable of (absolute_path, title) pairs; PDFs are copied
+    page by page and anything else is treated as an image and fitted on a
+    `page_size` page. A source that cannot be read is replaced by a notice page.
+    """
+    buffer = StreamBuffer()
+    writer = PdfMergeWriter(buffer)
+
+    for file_path, title in entries:
+        try:
+            if is_pdf(file_path):
+                for _ in writer.add_pdf(file_path):
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            else:
+                writer.add_image(file_path, page_size=page_size)
+        except Exception as e:
+            print(f"[ERROR] Could not add {file_path} to merged PDF: {e}")
+            writer.add_notice([
+                "This document could not be (fully) included:",
+                title or os.path.basename(file_path),
+                str(e),
+            ], page_size)
+
+        data = buffer.drain()
+        if data:
+            yield data
+
+    if not writer.page_ids:
+        writer.add_notice(["No documents."], page_size)
+
+    writer.close()
+    yield buffer.drain()
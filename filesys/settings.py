@@ -165,6 +165,106 @@ GOOGLE_MAPS_API_KEY = "your api key"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Content-addressed media store: identical uploads share one blob under MEDIA_ROOT/<MEDIA_BLOB_DIR>
+# and the UHID_<n>/... names become hard links to it (see capture/storage.py)
+MEDIA_DEDUP_ENABLED = False
+MEDIA_BLOB_DIR = 'blobs'
+
+# Hash-prefix levels above UHID_<n> (e.g. 2 -> MEDIA_ROOT/3f/a2/UHID_251/...). Existing files are
+# moved with `python manage.py migrate_media_layout` after changing this.
+MEDIA_SHARD_DEPTH = 0
+MEDIA_SHARD_WIDTH = 2
+
+# Resumable chunked uploads: parts are staged here (outside MEDIA_ROOT) until commit
+CHUNKED_UPLOAD_DIR = os.path.join(BASE_DIR, 'upload_sessions')
+CHUNKED_UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MB per part
+CHUNKED_UPLOAD_EXPIRY_HOURS = 24
+
+# Gallery renditions: generated on first request, cached under MEDIA_ROOT/<RENDITION_DIR>
+RENDITION_SIZES = {'thumb': 320, 'medium': 1280}  # longest edge in px
+RENDITION_FORMAT = 'WEBP'
+RENDITION_QUALITY = 80
+RENDITION_DIR = 'renditions'
+INGEST_RENDITIONS = ['thumb']  # written at upload time from the image already decoded for ingest
+
+# How /media/ bytes are sent once the view has checked access:
+# 'python' (Django streams it), 'nginx' (X-Accel-Redirect) or 'sendfile' (X-Sendfile for Apache/lighttpd)
+MEDIA_SERVE_BACKEND = 'python'
+MEDIA_ACCEL_PREFIX = '/protected-media/'  # internal nginx location aliased to MEDIA_ROOT
+
+# Cached per-UHID "download all" ZIPs under MEDIA_ROOT/<ARCHIVE_CACHE_DIR>, evicted by age and total size
+ARCHIVE_CACHE_DIR = 'archives'
+ARCHIVE_CACHE_MAX_BYTES = 5 * 1024 * 1024 * 1024  # 5 GB
+ARCHIVE_CACHE_MAX_AGE_HOURS = 72
+DOSSIER_CACHE_ENABLED = True  # keep the merged per-patient dossier PDF in the same cache
+
+# Background jobs (capture/jobs.py), run by `python manage.py run_jobs`
+JOB_BACKOFF_SECONDS = 30        # first retry delay, doubled per attempt
+JOB_BACKOFF_MAX_SECONDS = 3600
+JOB_TIMEOUT_MINUTES = 15        # running jobs older than this (and silent as long) are requeued
+# At most this many jobs of a task run at once across all workers (the rest wait in the queue)
+JOB_TASK_LIMITS = {
+    'capture.export_jobs.run_export_job': 2,
+}
+
+# `python manage.py media_integrity` (or --queue for the worker): parallel stat() of every stored file to
+# backfill file_size/image_size and flag missing files, so listing pages never touch the filesystem
+INTEGRITY_WORKERS = 16
+# Rows per page for listings served from the MediaItem catalog (`python manage.py backfill_media_catalog` fills it)
+CATALOG_PAGE_SIZE = 60
+# Superuser tables and manage_issues: keyset page size, and how totals are produced (capture/listing.py)
+LISTING_PAGE_SIZE = 50
+LISTING_COUNT_CACHE_SECONDS = 300
+LISTING_ESTIMATE_THRESHOLD = 10000  # PostgreSQL: larger results show the planner's estimate instead of a COUNT
+# Superuser table exports (capture/exports.py) are streamed; catalog rows fetched per database round trip
+EXPORT_CHUNK_SIZE = 2000
+# Background exports (capture/export_jobs.py): files under MEDIA_ROOT/<EXPORT_DIR>, kept for EXPORT_EXPIRY_HOURS;
+# each superuser may have this many queued or running at once
+EXPORT_DIR = 'exports'
+EXPORT_EXPIRY_HOURS = 24
+EXPORT_MAX_PENDING_PER_USER = 3
+# `python manage.py reconcile_media --quarantine` moves orphan files (no row points at them) here
+MEDIA_QUARANTINE_DIR = 'quarantine'
+# Cache holding the reference-data version (members/refdata.py). Each worker keeps tags, departments,
+# designations and wards in memory and rereads them when this version changes, so the alias must be
+# shared by every worker process (members refuses to start on a LocMemCache). The file cache covers
+# workers on one host; switch it to Redis / Memcached if the workers run on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'refdata': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'refdata'),
+    },
+}
+REFDATA_CACHE = 'refdata'
+
+# ECHS cover-sheet PDFs: photos are resampled to this resolution for the printed area
+COVER_PDF_DPI = 150
+COVER_PDF_JPEG_QUALITY = 85
+
+# Captured images are re-encoded at ingest (capture/transcode.py) by CustomTag.type; 'default' covers
+# untagged images and other types, a policy of None stores the upload unchanged. 'AVIF' needs Pillow
+# built with libavif. Existing rows: `python manage.py transcode_images`.
+TRANSCODE_ENABLED = True
+TRANSCODE_POLICY = {
+    'default': {'format': 'WEBP', 'quality': 80},
+    'Geo-Pic': {'format': 'WEBP', 'quality': 85, 'keep_gps': True},
+    'File Only': None,
+}
+TRANSCODE_KEEP_ORIGINAL_DAYS = 0  # >0 keeps replaced originals under MEDIA_ROOT/<TRANSCODE_ORIGINALS_DIR>/<date>/
+TRANSCODE_ORIGINALS_DIR = 'originals'
+
+STORAGES = {
+    "default": {
+        "BACKEND": "capture.storage.DedupFileSystemStorage" if MEDIA_DEDUP_ENABLED else "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 # Disable HTTPS enforcement in local development
 SECURE_SSL_REDIRECT = False
 CSRF_COOKIE_SECURE = False
@@ -0,0 +1,174 @@
+import csv
+import re
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+from filesys.archive import StreamBuffer
+
+
+# Rows serialized per write into the worksheet stream
+ROWS_PER_WRITE = 500
+
+# Characters XML 1.0 does not allow, even escaped
+ILLEGAL_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# Excel's limit on the text of one cell
+MAX_CELL_CHARS = 32767
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+CONTENT_TYPES = XML_HEADER + (
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+ROOT_RELS = XML_HEADER + (
+    f'<Relationships xmlns="{PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK_RELS = XML_HEADER + (
+    f'<Relationships xmlns="{PKG_REL_NS}">'
+    f'<Relationship Id="rId1" Type="{REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+    f'<Relationship Id="rId2" Type="{REL_NS}/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+STYLES = XML_HEADER + (
+    f'<styleSheet xmlns="{MAIN_NS}">'
+    '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+class Link:
+    """A cell holding a hyperlink: a HYPERLINK() formula in XLSX, the bare URL in CSV."""
+
+    def __init__(self, url, label):
+        self.url = url
+        self.label = label
+
+    def __str__(self):
+        return self.url
+
+
+def clean_text(value):
+    return ILLEGAL_XML_CHARS.sub('', str(value))[:MAX_CELL_CHARS]
+
+
+def column_letter(index):
+    """0 -> A, 25 -> Z, 26 -> AA ..."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def cell_xml(ref, value):
+    if value is None or value == '':
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c r="{ref}"><v>{value}</v></c>'
+    if isinstance(value, Link):
+        url = clean_text(value.url).replace('"', '""')
+        label = clean_text(value.label).replace('"', '""')
+        formula = escape('HYPERLINK("' + url + '","' + label + '")')
+        # The cached result lets viewers that never calculate still show the label
+        return f'<c r="{ref}" t="str"><f>{formula}</f><v>{escape(clean_text(value.label))}</v></c>'
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{escape(clean_text(value))}</t></is></c>'
+
+
+def row_xml(number, values, columns):
+    cells = ''.join(cell_xml(f'{columns[i]}{number}', value) for i, value in enumerate(values))
+    return f'<row r="{number}">{cells}</row>'
+
+
+def sheet_name(title):
+    # Excel: at most 31 characters, none of []:*?/\
+    return re.sub(r'[\[\]:*?/\\]', ' ', title)[:31] or 'Sheet1'
+
+
+def stream_xlsx(title, headers, rows):
+    """
+    Yield a one-sheet .xlsx workbook piece by piece.
+
+    `rows` is any iterable of value lists (str, int, float, bool, None or
+    Link) and is consumed lazily; strings are written inline, so nothing
+    is collected in memory. The worksheet is limited by ZIP to 2 GiB
+    uncompressed (several million rows of a typical export).
+    """
+    buffer = StreamBuffer()
+    columns = [column_letter(i) for i in range(len(headers))]
+    name = quoteattr(sheet_name(title))
+    workbook = XML_HEADER + (
+        f'<workbook xmlns="{MAIN_NS}" xmlns:r="{REL_NS}">'
+        f'<sheets><sheet name={name} sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr('[Content_Types].xml', CONTENT_TYPES)
+        zip_file.writestr('_rels/.rels', ROOT_RELS)
+        zip_file.writestr('xl/workbook.xml', workbook)
+        zip_file.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        zip_file.writestr('xl/styles.xml', STYLES)
+        yield buffer.drain()
+
+        with zip_file.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write((XML_HEADER + f'<worksheet xmlns="{MAIN_NS}"><sheetData>' + row_xml(1, headers, columns)).encode())
+            batch = []
+            for number, values in enumerate(rows, start=2):
+                batch.append(row_xml(number, values, columns))
+                if len(batch) >= ROWS_PER_WRITE:
+                    sheet.write(''.join(batch).encode())
+                    batch = []
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            sheet.write((''.join(batch) + '</sheetData></worksheet>').encode())
+
+    # Rest of the compressed sheet and the central directory, written on close
+    yield buffer.drain()
+
+
+class LineBuffer:
+    """csv.writer target that hands back each written line."""
+
+    def write(self, line):
+        return line
+
+
+def csv_safe(value):
+    # A leading = + - @ makes spreadsheet apps evaluate a cell as a formula; phone-like numbers are left alone
+    text = '' if value is None else str(value)
+    if text[:1] in ('=', '+', '-', '@') and not re.fullmatch(r'[+\-]?[\d\s()\-]+', text):
+        return "'" + text
+    return text
+
+
+def stream_csv(headers, rows):
+    """Yield a UTF-8 CSV (with BOM, so Excel detects the encoding), ROWS_PER_WRITE rows at a time."""
+    writer = csv.writer(LineBuffer())
+    yield '\ufeff'.encode() + writer.writerow([csv_safe(value) for value in headers]).encode()
+    batch = []
+    for values in rows:
+        batch.append(writer.writerow([csv_safe(value) for value in values]))
+        if len(batch) >= ROWS_PER_WRITE:
+            yield ''.join(batch).encode()
+            batch = []
+    if batch:
+        yield ''.join(batch).encode()
@@ -17,7 +17,7 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from capture.views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,6 +26,7 @@ urlpatterns = [
     path('', include('capture.urls', namespace="capture")), # Include URLs from the capture app
 ]
 
-# Serve media files in development mode
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Serve media files through an access-checked view (the proxy does the transfer, see capture/media.py)
+urlpatterns += [
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:name>", serve_media, name='serve_media'),
+]
@@ -3,3 +3,9 @@ from django.apps import AppConfig
 class MembersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'members'
+
+    def ready(self):
+        # Tell every worker's reference-data copy when tags / departments / designations / wards change
+        from . import refdata
+        refdata.check_shared_cache()
+        refdata.connect_signals()
@@ -0,0 +1,94 @@
+"""
+Rows of the superuser list exports (users, departments, wards, designations,
+tags). The Excel buttons stream them directly; capture/export_jobs.py
+builds the same files in the background.
+"""
+from django.utils.timezone import localtime
+
+from .models import CustomTag, CustomUser, Department, Designation, Ward
+
+
+def user_row(user):
+    designation = str(user.designation) if user.designation else '—'
+    if user.designation_other:
+        designation += f" ({user.designation_other})"
+
+    department = str(user.department) if user.department else '—'
+    if user.department_other:
+        department += f" ({user.department_other})"
+
+    return [
+        user.full_name,
+        user.email,
+        user.employee_id or '—',
+        designation,
+        department,
+        user.phone or '—',
+        'Yes' if user.is_approved else 'No',
+        user.approved_by.full_name if user.approved_by else '—',
+        localtime(user.approved_at).strftime('%d-%b-%Y %I:%M %p') if user.approved_at else '—',
+    ]
+
+
+def reference_row(name_field, abbreviation_field):
+    def row(obj):
+        return [
+            getattr(obj, name_field),
+            getattr(obj, abbreviation_field),
+            'Yes' if obj.is_active else 'No',
+            obj.created_at.strftime('%Y-%m-%d %H:%M:%S') if obj.created_at else '',
+            obj.created_by.full_name if obj.created_by else '',
+        ]
+    return row
+
+
+def tag_row(tag):
+    return [tag.name, tag.abbreviation, tag.value, tag.type, 'Yes' if tag.is_deleted else 'No']
+
+
+# name -> title, file name stem, headers (after 'Sl. No.'), queryset, row function
+LIST_EXPORTS = {
+    'users': {
+        'title': "User List",
+        'export_name': "user_list",
+        'headers': ['Full Name', 'Email', 'Employee ID', 'Designation', 'Department', 'Phone', 'Is Approved', 'Approved By', 'Approved At'],
+        'queryset': lambda: CustomUser.objects.select_related('approved_by', 'designation', 'department').order_by('full_name', 'id'),
+        'row': user_row,
+    },
+    'departments': {
+        'title': "Department List",
+        'export_name': "department_list",
+        'headers': ['Department Name', 'Abbreviation', 'Is Active', 'Created At', 'Created By'],
+        'queryset': lambda: Department.objects.select_related('created_by').order_by('name'),
+        'row': reference_row('name', 'abbreviation'),
+    },
+    'wards': {
+        'title': "Ward List",
+        'export_name': "ward_list",
+        'headers': ['Ward Name', 'Abbreviation', 'Is Active', 'Created At', 'Created By'],
+        'queryset': lambda: Ward.objects.select_related('created_by').order_by('ward_name'),
+        'row': reference_row('ward_name', 'ward_abbre'),
+    },
+    'designations': {
+        'title': "Designation List",
+        'export_name': "designation_list",
+        'headers': ['Designation Title', 'Abbreviation', 'Is Active', 'Created At', 'Created By'],
+        'queryset': lambda: Designation.objects.select_related('created_by').order_by('title'),
+        'row': reference_row('title', 'abbreviation'),
+    },
+    'tags': {
+        'title': "Tag List",
+        'export_name': "tag_list",
+        'headers': ['Tag Name', 'Abbreviation', 'Value', 'Tag Type', 'Is Deleted'],
+        'queryset': lambda: CustomTag.objects.order_by('name'),
+        'row': tag_row,
+    },
+}
+
+
+def list_export(name):
+    """(title, file name stem, headers, queryset, rows) of one list export."""
+    config = LIST_EXPORTS[name]
+    items = config['queryset']()
+    rows = ([idx] + config['row'](obj) for idx, obj in enumerate(items.iterator(chunk_size=2000), start=1))
+    return config['title'], config['export_name'], ['Sl. No.'] + config['headers'], items, rows
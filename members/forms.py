@@ -2,6 +2,43 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from .models import CustomUser, CustomTag, Department, Designation, Ward
 from django.contrib.auth.forms import PasswordChangeForm
+from django.forms.models import ModelChoiceIterator
+from . import refdata
+
+
+class ReferenceChoiceIterator(ModelChoiceIterator):
+    # Options from the process-local reference data (members/refdata.py), not a query per render
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in refdata.active(self.queryset.model):
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(refdata.active(self.queryset.model)) + (self.field.empty_label is not None)
+
+
+class ReferenceChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField over the active rows of a reference table (CustomTag,
+    Department, Designation, Ward), rendered and validated from refdata.
+    `queryset` only names the model.
+    """
+    iterator = ReferenceChoiceIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        model = self.queryset.model
+        if isinstance(value, model):
+            value = value.pk
+        try:
+            return refdata.get(model, value)
+        except model.DoesNotExist:
+            raise forms.ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value}
+            )
+
 
 class UserRegisterForm(UserCreationForm):
     # 1️⃣ Full Name field
@@ -27,7 +64,7 @@ class UserRegisterForm(UserCreationForm):
         help_text="A valid email address is required."
     )
 
-    department = forms.ModelChoiceField(
+    department = ReferenceChoiceField(
         queryset=Department.objects.filter(is_active=True),
         required=True,
         empty_label="Select Department",
@@ -46,7 +83,7 @@ class UserRegisterForm(UserCreationForm):
         })
     )
 
-    ward = forms.ModelChoiceField(
+    ward = ReferenceChoiceField(
         queryset=Ward.objects.filter(is_active=True),
         required=False,
         empty_label="Select Ward (optional)",
@@ -65,7 +102,7 @@ class UserRegisterForm(UserCreationForm):
         })
     )
 
-    designation = forms.ModelChoiceField(
+    designation = ReferenceChoiceField(
         queryset=Designation.objects.filter(is_active=True),
         required=True,
         empty_label="Select Designation",
@@ -241,7 +278,7 @@ class ProfileForm(forms.ModelForm):
         })
     )
 
-    department = forms.ModelChoiceField(
+    department = ReferenceChoiceField(
         queryset=Department.objects.filter(is_active=True),
         required=False,
         widget=forms.Select(attrs={
@@ -260,7 +297,7 @@ class ProfileForm(forms.ModelForm):
         })
     )
 
-    ward = forms.ModelChoiceField(
+    ward = ReferenceChoiceField(
         queryset=Ward.objects.filter(is_active=True),
         required=False,
         widget=forms.Select(attrs={
@@ -279,7 +316,7 @@ class ProfileForm(forms.ModelForm):
         })
     )
     
-    designation = forms.ModelChoiceField(
+    designation = ReferenceChoiceField(
         queryset=Designation.objects.filter(is_active=True),
         required=False,
         widget=forms.Select(attrs={
@@ -466,5 +503,10 @@ class UploadExcelForm(forms.Form):
         label='Select Excel (.xlsx) file',
         widget=forms.ClearableFileInput(attrs={'accept': '.xlsx'})
     )
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Preview only (show the changes without saving them)",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
 
 
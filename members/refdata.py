@@ -0,0 +1,107 @@
+"""
+Process-local copy of the reference tables: CustomTag, Department,
+Designation and Ward. They change a few times a year but are read by every
+upload page, form and template download.
+
+Each worker keeps the rows in memory together with the version number they
+were loaded under. The version lives in the REFDATA_CACHE cache and is
+bumped (after commit) whenever a row of these tables is saved or deleted,
+which covers every add / edit / soft-delete / restore view. Every read
+compares the cached version with its copy, so a change is picked up by all
+workers on their next request. The steady state costs one cache read and no
+database query. The cache has to be shared by the workers: check_shared_cache()
+stops the app from starting on a per-process LocMemCache.
+
+The returned instances are shared between requests: read them, never modify them.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from .models import CustomTag, Department, Designation, Ward
+
+
+# Must be shared by all worker processes (file-based, database, Redis or Memcached)
+REFDATA_CACHE = getattr(settings, 'REFDATA_CACHE', 'default')
+VERSION_KEY = 'refdata_version'
+
+# model -> (field, value marking a row active, display order)
+REFERENCE_TABLES = {
+    CustomTag: ('is_deleted', False, 'name'),
+    Department: ('is_active', True, 'name'),
+    Designation: ('is_active', True, 'title'),
+    Ward: ('is_active', True, 'ward_name'),
+}
+
+# model -> (version, {pk: row}, [active rows in display order])
+_copies = {}
+
+
+def check_shared_cache():
+    """Refuse a per-process cache: a version bumped in one worker would never reach the others."""
+    if isinstance(caches[REFDATA_CACHE], LocMemCache):
+        raise ImproperlyConfigured(
+            f"REFDATA_CACHE ({REFDATA_CACHE!r}) is a LocMemCache, which every worker process keeps to itself. "
+            "Point it at a shared cache (file-based, database, Redis or Memcached)."
+        )
+
+
+def current_version():
+    cache = caches[REFDATA_CACHE]
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Lost or never set: start from a fresh value so no worker's copy matches it
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    cache = caches[REFDATA_CACHE]
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:  # Key missing
+        cache.set(VERSION_KEY, time.time_ns(), None)
+
+
+def _copy(model):
+    version = current_version()
+    copy = _copies.get(model)
+    if copy is None or copy[0] != version:
+        field, active_value, order = REFERENCE_TABLES[model]
+        rows = list(model.objects.order_by(order))
+        copy = (version, {row.pk: row for row in rows}, [row for row in rows if getattr(row, field) == active_value])
+        _copies[model] = copy
+    return copy
+
+
+def active(model):
+    """Active rows of a reference table, in display order."""
+    return _copy(model)[2]
+
+
+def get(model, pk, include_inactive=False):
+    """One row by primary key (active only unless `include_inactive`); raises model.DoesNotExist like .get()."""
+    try:
+        row = _copy(model)[1].get(int(pk))
+    except (TypeError, ValueError):
+        row = None
+    field, active_value, _ = REFERENCE_TABLES[model]
+    if row is None or not (include_inactive or getattr(row, field) == active_value):
+        raise model.DoesNotExist(f"No {model._meta.object_name} with id {pk!r}")
+    return row
+
+
+def changed(sender, **kwargs):
+    transaction.on_commit(bump_version)
+
+
+def connect_signals():
+    for model in REFERENCE_TABLES:
+        post_save.connect(changed, sender=model, dispatch_uid=f"refdata_save_{model._meta.label}")
+        post_delete.connect(changed, sender=model, dispatch_uid=f"refdata_delete_{model._meta.label}")
@@ -1,3 +1,113 @@
+import io
+
+import openpyxl
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.urls import reverse
+
+from members import user_import
+from members.models import CustomUser, Department, Designation
+
+
+HEADER = ['Email', 'Full Name', 'Is Approved', 'ID', 'Department', 'Designation', 'Phone']
+
+
+def workbook(*rows, trailer=True):
+    """The sheet download_user_template makes, with `rows` under the header."""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(HEADER)
+    for row in rows:
+        ws.append(row)
+    if trailer:
+        ws.append([])
+        ws.append(['Valid Departments'])
+        ws.append(['Radiology'])
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class UserImportTests(TestCase):
+    """Bulk user update from the template sheet (members/user_import.py)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.radiology = Department.objects.create(name='Radiology')
+        cls.surgery = Department.objects.create(name='Surgery')
+        cls.nurse = Designation.objects.create(title='Staff Nurse')
+        cls.alice = CustomUser.objects.create_user('alice@example.com', 'Alice', 'pw', phone='12345', department=cls.surgery)
+        cls.bob = CustomUser.objects.create_user('bob@example.com', 'Bob', 'pw')
+
+    def run_import(self, *rows, dry_run=False):
+        return user_import.import_users(user_import.read_rows(workbook(*rows)), dry_run=dry_run)
+
+    def test_reading_stops_at_the_reference_lists(self):
+        rows = list(user_import.read_rows(workbook(['alice@example.com', 'Alice', 'Yes', 'E1', '', '', 98765])))
+        self.assertEqual(rows, [['alice@example.com', 'Alice', 'Yes', 'E1', '', '', '98765']])
+
+    def test_dry_run_reports_without_saving(self):
+        results, updated, skipped = self.run_import(['alice@example.com', 'Alice', 'Yes', 'E1', 'radiology', 'Staff Nurse', '+91 98765-43210'], dry_run=True)
+
+        self.assertEqual((updated, skipped), (1, 0))
+        self.assertEqual(results[0]['symbol'], '✅')
+        self.assertIn('Department: Surgery → Radiology', results[0]['changes'])
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.employee_id, self.alice.department, self.alice.phone), (None, self.surgery, '12345'))
+
+    def test_apply_saves_every_imported_field(self):
+        results, updated, skipped = self.run_import(['ALICE@example.com', 'Alice', 'Yes', 'E1', 'radiology', 'staff nurse', '+91 98765-43210'])
+
+        self.assertEqual((updated, skipped), (1, 0))
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.employee_id, 'E1')
+        self.assertEqual(self.alice.department, self.radiology)
+        self.assertEqual(self.alice.designation, self.nurse)
+        self.assertEqual(self.alice.phone, '+91 98765-43210')
+
+    def test_duplicate_email_uses_the_first_row(self):
+        results, updated, skipped = self.run_import(
+            ['alice@example.com', '', '', 'FIRST', '', '', ''],
+            ['Alice@Example.com', '', '', 'SECOND', '', '', ''],
+        )
+
+        self.assertEqual((updated, skipped), (1, 1))
+        self.assertEqual(results[1]['message'], 'Listed more than once (first row used)')
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.employee_id, 'FIRST')
+
+    def test_invalid_phone_is_reported_and_not_saved(self):
+        results, updated, skipped = self.run_import(
+            ['alice@example.com', '', '', '', 'Radiology', '', 'call me'],
+            ['bob@example.com', '', '', '', '', '', 'abc-123'],
+        )
+
+        self.assertEqual((updated, skipped), (1, 1))
+        self.assertEqual((results[0]['symbol'], results[0]['message']), ('⚠️', 'Partial'))
+        self.assertIn('Phone: 12345 → ❌ call me (Invalid)', results[0]['changes'])
+        self.assertEqual((results[1]['symbol'], results[1]['message']), ('❌', 'Failed'))
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.alice.phone, self.alice.department), ('12345', self.radiology))
+        self.assertIsNone(self.bob.phone)
+
+    def test_unknown_users_and_missing_emails_are_skipped(self):
+        results, updated, skipped = self.run_import(
+            ['nobody@example.com', '', '', 'E9', '', '', ''],
+            ['', 'No Email', '', 'E8', '', '', ''],
+        )
+        self.assertEqual((updated, skipped), (0, 2))
+        self.assertEqual([r['message'] for r in results], ['User not found', 'Missing Email'])
+
+    def test_upload_view_preview(self):
+        admin = CustomUser.objects.create_superuser('admin@example.com', 'Admin', 'pw')
+        self.client.force_login(admin)
+        sheet = SimpleUploadedFile('users.xlsx', workbook(['bob@example.com', '', '', 'E2', '', '', '']).getvalue())
+
+        response = self.client.post(reverse('members:upload_user_template'), {'file': sheet, 'dry_run': 'on'})
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['summary'], 'Preview: 1 would be updated, 0 skipped. Nothing was saved.')
+        self.bob.refresh_from_db()
+        self.assertIsNone(self.bob.employee_id)
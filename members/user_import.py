@@ -0,0 +1,157 @@
+"""
+Bulk update of users from the sheet made by download_user_template.
+
+The workbook is read in read-only mode, one row at a time. The users named
+in it are then fetched with a few `email IN (...)` queries, departments and
+designations with one query each, every proposed value is validated in
+memory, and the changed users are written with bulk_update() in one
+transaction. A dry run builds the same report without saving anything.
+
+Only Employee ID, Department, Designation and Phone are imported; the other
+columns are there for reference. Blank cells leave a value unchanged.
+"""
+import openpyxl
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from .models import CustomUser, Department, Designation
+
+
+# Sheet columns: Email, Full Name, Is Approved, ID, Department, Designation, Phone
+COLUMNS = 7
+EMAIL, EMPLOYEE_ID, DEPARTMENT, DESIGNATION, PHONE = 0, 3, 4, 5, 6
+IMPORTED_FIELDS = ['employee_id', 'department', 'designation', 'phone']
+LOOKUP_BATCH = 1000
+
+
+def cell_text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def read_rows(file):
+    """Yield the user rows of the sheet (lists of COLUMNS texts), up to the first blank row or the 'Valid Departments' list."""
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in wb.active.iter_rows(min_row=2, values_only=True):
+            cells = [cell_text(value) for value in row[:COLUMNS]]
+            cells += [''] * (COLUMNS - len(cells))
+            if not any(cells) or cells[EMAIL] == 'Valid Departments':
+                break
+            yield cells
+    finally:
+        wb.close()
+
+
+def users_by_email(emails, lock=False):
+    """{lowercase email: user} for `emails`, LOOKUP_BATCH addresses per query."""
+    users = {}
+    emails = sorted(emails)
+    for start in range(0, len(emails), LOOKUP_BATCH):
+        query = (
+            CustomUser.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=emails[start:start + LOOKUP_BATCH])
+            .select_related('department', 'designation')
+        )
+        if lock:
+            query = query.select_for_update(of=('self',))
+        users.update({user.email_lower: user for user in query})
+    return users
+
+
+def valid_text(field_name, value, user):
+    """`value` if the model field accepts it, else None."""
+    try:
+        CustomUser._meta.get_field(field_name).clean(value, user)
+    except ValidationError:
+        return None
+    return value
+
+
+def row_result(email, symbol, message, changes=(), success=False):
+    return {'email': email, 'symbol': symbol, 'message': message, 'changes': list(changes), 'success': success}
+
+
+def plan_import(rows, lock=False):
+    """
+    Work out what each row changes. Returns (results, changed users): one
+    report entry per row with something to say, and the users to save with
+    their new values already set.
+    """
+    rows = list(rows)
+    users = users_by_email({row[EMAIL].lower() for row in rows if row[EMAIL]}, lock=lock)
+    departments = {dept.name.lower(): dept for dept in Department.objects.all()}
+    designations = {des.title.lower(): des for des in Designation.objects.all()}
+
+    results, changed, seen = [], [], set()
+    for row in rows:
+        email = row[EMAIL]
+        if not email:
+            results.append(row_result('N/A', '❌', 'Missing Email'))
+            continue
+        user = users.get(email.lower())
+        if user is None:
+            results.append(row_result(email, '❌', 'User not found'))
+            continue
+        if user.pk in seen:
+            results.append(row_result(email, '❌', 'Listed more than once (first row used)'))
+            continue
+        seen.add(user.pk)
+
+        changes, requested, applied = [], 0, 0
+
+        for field_name, label, column in (('employee_id', 'ID', EMPLOYEE_ID), ('phone', 'Phone', PHONE)):
+            proposed, current = row[column], getattr(user, field_name) or ''
+            if not proposed or proposed == current:
+                continue
+            requested += 1
+            if valid_text(field_name, proposed, user) is None:
+                changes.append(f'{label}: {current} → ❌ {proposed} (Invalid)')
+                continue
+            setattr(user, field_name, proposed)
+            changes.append(f'{label}: {current} → {proposed}')
+            applied += 1
+
+        for field_name, label, column, choices, name_field in (
+            ('department', 'Department', DEPARTMENT, departments, 'name'),
+            ('designation', 'Designation', DESIGNATION, designations, 'title'),
+        ):
+            current_obj = getattr(user, field_name)
+            proposed = row[column]
+            current = getattr(current_obj, name_field) if current_obj else ''
+            if not proposed or proposed.lower() == current.lower():
+                continue
+            requested += 1
+            match = choices.get(proposed.lower())
+            if match is None:
+                changes.append(f'{label}: {current} → ❌ {proposed} (Invalid)')
+                continue
+            setattr(user, field_name, match)
+            changes.append(f'{label}: {current} → {getattr(match, name_field)}')
+            applied += 1
+
+        if requested == 0:
+            continue
+        if applied == 0:
+            results.append(row_result(email, '❌', 'Failed', changes))
+            continue
+
+        changed.append(user)
+        complete = applied == requested
+        results.append(row_result(email, '✅' if complete else '⚠️', 'Success' if complete else 'Partial', changes, complete))
+
+    return results, changed
+
+
+def import_users(rows, dry_run=False):
+    """
+    Plan and (unless `dry_run`) save the sheet's changes in one transaction,
+    with the affected users locked while it runs. Returns (results, updated, skipped).
+    """
+    with transaction.atomic():
+        results, changed = plan_import(rows, lock=not dry_run)
+        if changed and not dry_run:
+            CustomUser.objects.bulk_update(changed, IMPORTED_FIELDS, batch_size=500)
+
+    skipped = sum(1 for result in results if result['symbol'] == '❌')
+    return results, len(changed), skipped
@@ -11,6 +11,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse
 import json
 from .models import CustomUser, CustomTag, Department, Designation, Ward
+from . import exports, refdata, user_import
 from django.utils import timezone
 from django.db.models import Q
 from django.contrib.auth.hashers import make_password
@@ -19,15 +20,14 @@ from django.conf import settings
 import logging
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import HttpResponse
-from django.utils.timezone import localtime
+from django.http import HttpResponse, StreamingHttpResponse
 from openpyxl import Workbook
 from datetime import datetime
 import csv
 import io
-import openpyxl
 from django.views.decorators.cache import never_cache
-from capture.models import UploadedFile, UploadedImage, CapturedImage
+from capture import usage
+from filesys import spreadsheet
 from django.db.models import Count
 from django.db.models import Count, Q, F, Value, IntegerField, Sum
 
@@ -338,46 +338,22 @@ def unblock_user_bysuper(request):
 @user_passes_test(is_super_user)
 @login_required
 def configs(request):
-    # Cache all departments and users once
-    departments = Department.objects.all()
-    active_department_ids = list(departments.values_list('id', flat=True))
+    # Every figure comes from the usage counters (capture/usage.py), so the
+    # number of queries no longer grows with departments, users or uploads
+    departments = list(Department.objects.annotate(user_count=Count('customuser')).order_by('id'))
+    all_users = list(CustomUser.objects.only('email', 'full_name', 'first_name', 'last_name'))
+    tags = list(CustomTag.objects.filter(is_deleted=False))
 
-    all_users = CustomUser.objects.select_related('department').all()
+    totals = usage.dashboard_totals('capture')
+    kinds = totals['kinds']
 
-    # Pre-fetch file/image counts per user efficiently by aggregating
-    # We'll do a single query per model grouped by user, then map later
-
-    # Aggregated counts per user for UploadedFile
-    uploaded_file_counts = UploadedFile.objects.values('user').annotate(count=Count('id'))
-    uploaded_file_map = {item['user']: item['count'] for item in uploaded_file_counts}
-
-    # Aggregated counts per user for CapturedImage
-    captured_image_counts = CapturedImage.objects.values('user').annotate(count=Count('id'))
-    captured_image_map = {item['user']: item['count'] for item in captured_image_counts}
-
-    # Aggregated counts per user for UploadedImage
-    uploaded_image_counts = UploadedImage.objects.values('user').annotate(count=Count('id'))
-    uploaded_image_map = {item['user']: item['count'] for item in uploaded_image_counts}
-
-    # Calculate user_stats efficiently without per-user queries
     user_stats = []
     for user in all_users:
-        uf_count = uploaded_file_map.get(user.id, 0)
-        ci_count = captured_image_map.get(user.id, 0)
-        ui_count = uploaded_image_map.get(user.id, 0)
-        total_files = uf_count + ci_count + ui_count
-
         user_stats.append({
             'name': user.get_full_name() or user.username,
-            'total_files': total_files,
+            'total_files': totals['users'].get(user.id, 0),
         })
 
-    # Department-wise stats using ORM annotation (to minimize queries)
-    # First, get user ids per department (cached)
-    dept_user_map = {}
-    for dept in departments:
-        dept_user_map[dept.id] = list(all_users.filter(department=dept).values_list('id', flat=True))
-
     department_stats = []
     sum_users = 0
     sum_images = 0
@@ -385,17 +361,14 @@ def configs(request):
     sum_total = 0
 
     for i, dept in enumerate(departments, start=1):
-        user_ids = dept_user_map.get(dept.id, [])
-
-        # Count files/images for users in this department using pre-aggregated counts
-        captured_count = CapturedImage.objects.filter(user_id__in=user_ids).count()
-        uploaded_image_count = UploadedImage.objects.filter(user_id__in=user_ids).count()
-        uploaded_file_count = UploadedFile.objects.filter(user_id__in=user_ids).count()
+        counts = totals['departments'].get(dept.id, {})
+        captured_count = counts.get('captured_image', 0)
+        uploaded_image_count = counts.get('uploaded_image', 0)
+        uploaded_file_count = counts.get('uploaded_file', 0)
         total_image_count = captured_count + uploaded_image_count
         total = total_image_count + uploaded_file_count
 
-        user_count = len(user_ids)
-        sum_users += user_count
+        sum_users += dept.user_count
         sum_images += total_image_count
         sum_files += uploaded_file_count
         sum_total += total
@@ -403,7 +376,7 @@ def configs(request):
         department_stats.append({
             'sno': i,
             'name': dept.name,
-            'user_count': user_count,
+            'user_count': dept.user_count,
             'image_count': total_image_count,
             'captured_count': captured_count,
             'uploaded_image_count': uploaded_image_count,
@@ -411,38 +384,25 @@ def configs(request):
             'total': total,
         })
 
-    # Overall counts computed once from cached querysets where possible
-    total_departments = departments.count()
-    total_users = all_users.count()
-
-    # For totals, use aggregated counts instead of multiple queries
-    total_uploaded_files = UploadedFile.objects.count()
-    total_captured_images = CapturedImage.objects.count()
-    total_uploaded_images = UploadedImage.objects.count()
+    total_uploaded_files = kinds['uploaded_file']
+    total_captured_images = kinds['captured_image']
+    total_uploaded_images = kinds['uploaded_image']
 
     total_image_files = total_captured_images + total_uploaded_images
     total_files = total_uploaded_files + total_image_files
 
-    total_tags = CustomTag.objects.filter(is_deleted=False).count()
-    tags = CustomTag.objects.filter(is_deleted=False)
-
-    # File/Image Querysets for Modals, ordered descending by timestamp
-    uploaded_files = UploadedFile.objects.order_by('-timestamp')
-    captured_images = CapturedImage.objects.order_by('-timestamp')
-    uploaded_images = UploadedImage.objects.order_by('-timestamp')
+    for tag in tags:
+        tag.file_count = totals['tags'].get(tag.id, 0)
 
     context = {
-        'total_departments': total_departments,
-        'total_users': total_users,
+        'total_departments': len(departments),
+        'total_users': len(all_users),
         'total_files': total_files,
         'total_uploaded_files': total_uploaded_files,
         'total_captured_images': total_captured_images,
         'total_uploaded_images': total_uploaded_images,
         'total_image_files': total_image_files,
-        'total_tags': total_tags,
-        'uploaded_files': uploaded_files,
-        'captured_images': captured_images,
-        'uploaded_images': uploaded_images,
+        'total_tags': len(tags),
         'department_stats': department_stats,
         'sum_users': sum_users,
         'sum_images': sum_images,
@@ -708,236 +668,41 @@ def profile(request):
 
 # Excel Upload views- User List, Department, Designation
 
+def stream_list_export(name):
+    """Stream one list (members/exports.py) as .xlsx."""
+    title, export_name, headers, _, rows = exports.list_export(name)
+    filename = f"{export_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    response = StreamingHttpResponse(
+        spreadsheet.stream_xlsx(title, headers, rows),
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
 @login_required
 @user_passes_test(is_super_user)
 def export_user_list_excel(request):
-    users = CustomUser.objects.select_related('approved_by').order_by('full_name')
-
-    # Create workbook and worksheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "User List"
-
-    # Add header row
-    headers = [
-    'Sl. No.', 'Full Name', 'Email', 'Employee ID',
-    'Designation', 'Department', 'Phone', 'Is Approved', 'Approved By', 'Approved At'
-    ]
-    ws.append(headers)
-
-    # Add data rows
-    for idx, user in enumerate(users, start=1):
-        designation = str(user.designation) if user.designation else '—'
-        if user.designation_other:
-            designation += f" ({user.designation_other})"
-
-        department = str(user.department) if user.department else '—'
-        if user.department_other:
-            department += f" ({user.department_other})"
-
-        approved_at_str = '—'
-        if user.approved_at:
-            # Convert to local time and format nicely
-            approved_at_str = localtime(user.approved_at).strftime('%d-%b-%Y %I:%M %p')
-
-        ws.append([
-            idx,
-            user.full_name,
-            user.email,
-            user.employee_id or '—',
-            designation,
-            department,
-            user.phone or '—',
-            'Yes' if user.is_approved else 'No',
-            user.approved_by.full_name if user.approved_by else '—',
-            approved_at_str,
-        ])
-
-    # Generate dynamic filename with current timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"user_list_{timestamp}.xlsx"
-
-    # Prepare HTTP response with Excel content
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    wb.save(response)
-
-    return response
+    return stream_list_export('users')
 
 @login_required
 @user_passes_test(is_super_user)
 def export_department_list_excel(request):
-    departments = Department.objects.select_related('created_by').order_by('name')
-
-    # Create workbook and worksheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Department List"
-
-    # Header row
-    headers = [
-        'Sl. No.',
-        'Department Name',
-        'Abbreviation',
-        'Is Active',
-        'Created At',
-        'Created By'
-    ]
-    ws.append(headers)
-
-    # Data rows
-    for idx, dept in enumerate(departments, start=1):
-        ws.append([
-            idx,
-            dept.name,
-            dept.abbreviation,
-            'Yes' if dept.is_active else 'No',
-            dept.created_at.strftime('%Y-%m-%d %H:%M:%S') if dept.created_at else '',
-            dept.created_by.full_name if dept.created_by else ''  # or dept.created_by.email
-        ])
-
-    # Filename with timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"department_list_{timestamp}.xlsx"
-
-    # Prepare Excel file for download
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    wb.save(response)
-
-    return response
+    return stream_list_export('departments')
 
 @login_required
 @user_passes_test(is_super_user)
 def export_ward_list_excel(request):
-    wards = Ward.objects.select_related('created_by').order_by('ward_name')
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Ward List"
-
-    headers = [
-        'Sl. No.',
-        'Ward Name',
-        'Abbreviation',
-        'Is Active',
-        'Created At',
-        'Created By'
-    ]
-    ws.append(headers)
-
-    for idx, ward in enumerate(wards, start=1):
-        ws.append([
-            idx,
-            ward.ward_name,
-            ward.ward_abbre,
-            'Yes' if ward.is_active else 'No',
-            ward.created_at.strftime('%Y-%m-%d %H:%M:%S') if ward.created_at else '',
-            ward.created_by.full_name if ward.created_by else ''
-        ])
-
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"ward_list_{timestamp}.xlsx"
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    wb.save(response)
-
-    return response
+    return stream_list_export('wards')
 
 @login_required
 @user_passes_test(is_super_user)
 def export_designation_list_excel(request):
-    designations = Designation.objects.select_related('created_by').order_by('title')
-
-    # Create workbook and worksheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Designation List"
-
-    # Add header row
-    headers = [
-        'Sl. No.',
-        'Designation Title',
-        'Abbreviation',
-        'Is Active',
-        'Created At',
-        'Created By'
-    ]
-    ws.append(headers)
-
-    # Add data rows
-    for idx, designation in enumerate(designations, start=1):
-        ws.append([
-            idx,
-            designation.title,
-            designation.abbreviation,
-            'Yes' if designation.is_active else 'No',
-            designation.created_at.strftime('%Y-%m-%d %H:%M:%S') if designation.created_at else '',
-            designation.created_by.full_name if designation.created_by else ''
-        ])
-
-    # Generate dynamic filename with current timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"designation_list_{timestamp}.xlsx"
-
-    # Prepare HTTP response with Excel content
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    wb.save(response)
-
-    return response
+    return stream_list_export('designations')
 
 @login_required
 @user_passes_test(is_super_user)
 def export_tag_list_excel(request):
-    tags = CustomTag.objects.order_by('name')
-
-    # Create workbook and worksheet
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Tag List"
-
-    # Header row
-    headers = [
-        'Sl. No.',
-        'Tag Name',
-        'Abbreviation',
-        'Value',
-        'Tag Type',
-        'Is Deleted'
-    ]
-    ws.append(headers)
-
-    # Data rows
-    for idx, tag in enumerate(tags, start=1):
-        ws.append([
-            idx,
-            tag.name,
-            tag.abbreviation,
-            tag.value,
-            tag.type,
-            'Yes' if tag.is_deleted else 'No'
-        ])
-
-    # Filename with timestamp
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f"tag_list_{timestamp}.xlsx"
-
-    # Prepare Excel file for download
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-    wb.save(response)
-
-    return response
+    return stream_list_export('tags')
 
 
 @login_required
@@ -967,7 +732,7 @@ def download_user_template(request):
 
     # 4. Valid Departments
     ws.append(['Valid Departments'])
-    for dept in Department.objects.filter(is_active=True).order_by('name'):
+    for dept in refdata.active(Department):
         ws.append([dept.name])
 
     # 5. Blank row
@@ -975,7 +740,7 @@ def download_user_template(request):
 
     # 6. Valid Designations
     ws.append(['Valid Designations'])
-    for des in Designation.objects.filter(is_active=True).order_by('title'):
+    for des in refdata.active(Designation):
         ws.append([des.title])
 
     # 7. Return as Excel file
@@ -993,124 +758,30 @@ def upload_user_template(request):
 
     if request.method == 'POST' and form.is_valid():
         file = form.cleaned_data['file']
+        dry_run = form.cleaned_data['dry_run']
 
         try:
-            wb = openpyxl.load_workbook(file)
-            ws = wb.active
+            rows = list(user_import.read_rows(file))
         except Exception as e:
             messages.error(request, f"Error reading file: {e}")
             return redirect('members:upload_user_template')
 
-        rows = list(ws.iter_rows(values_only=True))
-        results = []
-        updated_count = 0
-        skipped_count = 0
-
-        header = rows[0]
-        for row in rows[1:]:
-            if all((cell is None or str(cell).strip() == '') for cell in row):
-                break
-
-            label = str(row[0]).strip() if row[0] else ''
-            if label == 'Valid Departments':
-                break
-            if not label:
-                skipped_count += 1
-                results.append({
-                    'email': 'N/A',
-                    'symbol': '❌',
-                    'message': 'Missing Email',
-                    'changes': [],
-                    'success': False
-                })
-                continue
-
-            try:
-                user = CustomUser.objects.get(email__iexact=label)
-            except CustomUser.DoesNotExist:
-                skipped_count += 1
-                results.append({
-                    'email': label,
-                    'symbol': '❌',
-                    'message': 'User not found',
-                    'changes': [],
-                    'success': False
-                })
-                continue
-
-            changes = []
-            total_requests = 0
-            successful = 0
-
-            # Employee ID
-            proposed = str(row[3]).strip() if row[3] else ''
-            if proposed and proposed != (user.employee_id or ''):
-                user.employee_id = proposed
-                changes.append(f'ID: {user.employee_id} → {proposed}')
-                successful += 1
-                total_requests += 1
-
-            # Department
-            proposed = str(row[4]).strip() if row[4] else ''
-            current = user.department.name if user.department else ''
-            if proposed and proposed != current:
-                try:
-                    user.department = Department.objects.get(name__iexact=proposed)
-                    changes.append(f'Department: {current} → {proposed}')
-                    successful += 1
-                except Department.DoesNotExist:
-                    changes.append(f'Department: {current} → ❌ {proposed} (Invalid)')
-                total_requests += 1
-
-            # Designation
-            proposed = str(row[5]).strip() if row[5] else ''
-            current = user.designation.title if user.designation else ''
-            if proposed and proposed != current:
-                try:
-                    user.designation = Designation.objects.get(title__iexact=proposed)
-                    changes.append(f'Designation: {current} → {proposed}')
-                    successful += 1
-                except Designation.DoesNotExist:
-                    changes.append(f'Designation: {current} → ❌ {proposed} (Invalid)')
-                total_requests += 1
-
-            # Phone
-            proposed = str(row[6]).strip() if row[6] else ''
-            if proposed and proposed != (user.phone or ''):
-                user.phone = proposed
-                changes.append(f'Phone: {user.phone} → {proposed}')
-                successful += 1
-                total_requests += 1
-
-            if total_requests == 0:
-                continue
-
-            if successful > 0:
-                user.save()
-                updated_count += 1
-                symbol = '✅' if successful == total_requests else '⚠️'
-                message = 'Success' if successful == total_requests else 'Partial'
-                flag = successful == total_requests
-            else:
-                symbol, message, flag = '❌', 'Failed', False
-                skipped_count += 1
-
-            results.append({
-                'email': label,
-                'symbol': symbol,
-                'message': message,
-                'changes': changes,
-                'success': flag
-            })
+        results, updated_count, skipped_count = user_import.import_users(rows, dry_run=dry_run)
+        print(f"👥 User sheet {'previewed' if dry_run else 'imported'} by {request.user}: {len(rows)} rows, {updated_count} updated, {skipped_count} skipped")
 
         if not results:
             messages.info(request, "Nothing to update.")
             return render(request, 'members/upload_template.html', {'form': form})
 
+        if dry_run:
+            summary = f'Preview: {updated_count} would be updated, {skipped_count} skipped. Nothing was saved.'
+        else:
+            summary = f'{updated_count} updated, {skipped_count} skipped.'
         return render(request, 'members/upload_template.html', {
             'form': form,
             'results': results,
-            'summary': f'{updated_count} updated, {skipped_count} skipped.'
+            'summary': summary,
+            'dry_run': dry_run,
         })
 
     return render(request, 'members/upload_template.html', {'form': form})